@@ -3,12 +3,22 @@ import os
 from dotenv import load_dotenv
 from datetime import timedelta
 from .extensions import cors, talisman, limiter, jwt, bcrypt
+from .db import init_db, connect_db
+from .instrumentation import init_instrumentation
+from .serialization import init_serialization
+from .events import init_events
+from .lifecycle import init_lifecycle_scheduler
+from .passwords import init_password_hasher
+from .tag_catalogue import tag_catalogue
 
 from .controllers.auth import auth_bp
 from .controllers.follow_relationships import follow_rs_bp
 from .controllers.circles import circles_bp
 from .controllers.threads import threads_bp
 from .controllers.comments import comments_bp
+from .controllers.admin import admin_bp
+from .controllers.batch import batch_bp
+from .controllers.metrics import metrics_bp
 
 load_dotenv()
 
@@ -19,12 +29,69 @@ app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
 app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=30)
 
+# Database pool configurations
+app.config['DATABASE_URL'] = os.getenv('DATABASE_URL') or 'dbname=project4 user=db_user'
+app.config['DB_POOL_MIN_SIZE'] = int(os.getenv('DB_POOL_MIN_SIZE') or 2)
+app.config['DB_POOL_MAX_SIZE'] = int(os.getenv('DB_POOL_MAX_SIZE') or 10)
+app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT') or 5)
+app.config['DB_POOL_MAX_IDLE'] = float(os.getenv('DB_POOL_MAX_IDLE') or 600)
+# executions of a statement before it is prepared server side (0: on first use), 'none' to disable
+# when connecting through a transaction pooler such as pgbouncer
+prepare_threshold = os.getenv('DB_PREPARE_THRESHOLD') or '0'
+app.config['DB_PREPARE_THRESHOLD'] = None if prepare_threshold.lower() == 'none' else int(prepare_threshold)
+app.config['DB_PREPARED_MAX'] = int(os.getenv('DB_PREPARED_MAX') or 256)
+# pooled connections that parallel /batch sub-requests may hold at once, across all batches of a worker
+app.config['BATCH_MAX_CONNECTIONS'] = int(os.getenv('BATCH_MAX_CONNECTIONS') or app.config['DB_POOL_MAX_SIZE'] // 2)
+
+# Rate limiter storage, shared by all workers on the host by default
+app.config['RATELIMIT_STORAGE_URI'] = os.getenv('RATELIMIT_STORAGE_URI') or 'mmap:///tmp/project4-ratelimit'
+
+# Password hashing configurations
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS') or 12)
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS') or 2)
+app.config['PASSWORD_HASH_QUEUE_SIZE'] = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE') or 16)
+app.config['PASSWORD_HASH_QUEUE_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT') or 2)
+
+# Response encoding configurations (JSON_ENCODER: orjson or stdlib)
+app.config['JSON_ENCODER'] = os.getenv('JSON_ENCODER') or 'orjson'
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE') or 1024)
+app.config['COMPRESS_GZIP_LEVEL'] = int(os.getenv('COMPRESS_GZIP_LEVEL') or 6)
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY') or 4)
+
+# Circle event stream configurations
+app.config['EVENTS_QUEUE_SIZE'] = int(os.getenv('EVENTS_QUEUE_SIZE') or 100)
+app.config['EVENTS_HEARTBEAT_INTERVAL'] = float(os.getenv('EVENTS_HEARTBEAT_INTERVAL') or 15)
+
+# Circle lifecycle scheduler configurations
+app.config['LIFECYCLE_SCHEDULER_ENABLED'] = (os.getenv('LIFECYCLE_SCHEDULER_ENABLED') or 'true').lower() == 'true'
+app.config['LIFECYCLE_BATCH_SIZE'] = int(os.getenv('LIFECYCLE_BATCH_SIZE') or 500)
+app.config['LIFECYCLE_MAX_LIVE_HOURS'] = float(os.getenv('LIFECYCLE_MAX_LIVE_HOURS') or 6)
+app.config['LIFECYCLE_ARCHIVE_GRACE_HOURS'] = float(os.getenv('LIFECYCLE_ARCHIVE_GRACE_HOURS') or 24)
+app.config['LIFECYCLE_REFRESH_INTERVAL'] = float(os.getenv('LIFECYCLE_REFRESH_INTERVAL') or 30)
+
+# Moderation: circles with this many flags are hidden from public lists (0: never hidden)
+app.config['FLAG_HIDE_THRESHOLD'] = int(os.getenv('FLAG_HIDE_THRESHOLD') or 5)
+
+# Bearer token letting a Prometheus scraper read /metrics (unset: admins only)
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+
+# Slow query log configurations
+app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.getenv('SLOW_QUERY_THRESHOLD_MS') or 200)
+app.config['SLOW_QUERY_SAMPLE_RATE'] = float(os.getenv('SLOW_QUERY_SAMPLE_RATE') or 0.1)
+app.config['SLOW_QUERY_LOG_SIZE'] = int(os.getenv('SLOW_QUERY_LOG_SIZE') or 200)
+
 # Register extensions
+init_instrumentation(app)
+init_serialization(app)
 cors.init_app(app)
 talisman.init_app(app)
 limiter.init_app(app)
 jwt.init_app(app)
 bcrypt.init_app(app)
+init_db(app)
+init_password_hasher(app)
+init_events(app)
+init_lifecycle_scheduler(app)
 
 # Register blueprints
 app.register_blueprint(auth_bp)
@@ -32,6 +99,16 @@ app.register_blueprint(follow_rs_bp)
 app.register_blueprint(circles_bp)
 app.register_blueprint(threads_bp)
 app.register_blueprint(comments_bp)
+app.register_blueprint(admin_bp)
+app.register_blueprint(batch_bp)
+app.register_blueprint(metrics_bp)
+
+# Warm in-process caches
+with app.app_context():
+    try:
+        tag_catalogue.refresh(connect_db())
+    except Exception:
+        app.logger.warning('tag catalogue not loaded at startup, loading on first use')
 
 PORT = os.getenv('PORT') or 5000
 
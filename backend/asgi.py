@@ -0,0 +1,99 @@
+# ASGI entry point: python -m uvicorn backend.asgi:app --port 5000
+# The Flask app of app.py is wrapped with a2wsgi, so its routes, JWT checks and rate limiting are
+# unchanged and every handler still runs synchronously, on one of ASGI_WSGI_WORKERS threads and
+# against the sync connection pool; no request path is async. Only /circles/events is served
+# natively here, so long-lived event streams never hold a handler thread. It is checked against
+# the same rate limit counters as the route it replaces.
+import asyncio
+import json
+import os
+from urllib.parse import parse_qs
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import decode_token
+from limits import parse_many
+from .app import app as flask_app
+from .events import SSE_RETRY_MS, event_hub, render_events
+from .extensions import limiter, DEFAULT_LIMITS, get_endpoint_cost
+
+EVENTS_PATH = '/circles/events'
+EVENTS_ENDPOINT = 'circles.stream_circle_events'
+
+wsgi_app = WSGIMiddleware(flask_app, workers=int(os.getenv('ASGI_WSGI_WORKERS') or 10))
+
+# hits the counters flask-limiter keeps for the Flask route (remote address and endpoint), so both
+# paths share one budget per client
+def is_rate_limited(scope):
+    if not limiter.enabled:
+        return False
+
+    address = scope['client'][0] if scope.get('client') else '127.0.0.1'
+    cost = get_endpoint_cost(EVENTS_ENDPOINT)
+    allowed = [limiter.limiter.hit(limit, address, EVENTS_ENDPOINT, cost=cost)
+               for limit in parse_many(';'.join(DEFAULT_LIMITS))]
+    return not all(allowed)
+
+def get_access_claims(scope, query):
+    token = query.get('jwt', [None])[0]
+    for name, value in scope['headers']:
+        if name == b'authorization' and value.startswith(b'Bearer '):
+            token = value[len(b'Bearer '):].decode('latin-1')
+
+    if not token:
+        return None
+    try:
+        with flask_app.app_context():
+            claims = decode_token(token)
+    except Exception:
+        return None
+    return claims if claims.get('type') == 'access' else None
+
+async def send_json(send, status, body):
+    await send({ 'type': 'http.response.start', 'status': status,
+                 'headers': [(b'content-type', b'application/json')] })
+    await send({ 'type': 'http.response.body', 'body': json.dumps(body).encode('utf-8') })
+
+async def watch_disconnect(receive, subscription):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    subscription.close()
+
+async def stream_circle_events(scope, receive, send):
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+
+    if is_rate_limited(scope):
+        return await send_json(send, 429, { 'status': 'error', 'msg': 'too many requests' })
+
+    if get_access_claims(scope, query) is None:
+        return await send_json(send, 401, { 'status': 'error', 'msg': 'unauthorized' })
+
+    try:
+        circle_id = int(query['circle_id'][0])
+    except (KeyError, ValueError):
+        return await send_json(send, 400, { 'status': 'error', 'msg': 'circle_id required' })
+
+    subscription = event_hub.subscribe(circle_id, loop=asyncio.get_running_loop())
+    watcher = asyncio.create_task(watch_disconnect(receive, subscription))
+    try:
+        await send({ 'type': 'http.response.start', 'status': 200,
+                     'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                                 (b'x-accel-buffering', b'no')] })
+        await send({ 'type': 'http.response.body', 'body': f'retry: {SSE_RETRY_MS}\n\n'.encode('utf-8'),
+                     'more_body': True })
+        # a subscriber dropped before the first wait still gets its pending events and 'dropped'
+        while not subscription.closed:
+            events = await subscription.next(event_hub.heartbeat_interval)
+            if subscription.closed:
+                break
+            await send({ 'type': 'http.response.body', 'body': render_events(subscription, events).encode('utf-8'),
+                         'more_body': True })
+            if subscription.dropped:
+                break
+        await send({ 'type': 'http.response.body', 'body': b'' })
+    finally:
+        watcher.cancel()
+        event_hub.unsubscribe(subscription)
+
+async def app(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH and scope['method'] == 'GET':
+        return await stream_circle_events(scope, receive, send)
+    return await wsgi_app(scope, receive, send)
@@ -0,0 +1,151 @@
+# Fills a local Postgres database with synthetic data for load tests:
+# users, a power-law follow graph, circles, registrations, tags, flags, threads and comments.
+# Run against a migrated database: python -m backend.benchmarks.generate_data --users 10000
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+import bcrypt
+import psycopg
+from dotenv import load_dotenv
+from ..user_stats import reconcile_user_stats
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+TABLES = ['user_stats', 'comments', 'threads', 'flag_counts', 'flags', 'circle_tags', 'circles_registrations', 'home_feed',
+          'circles', 'follow_relationships', 'users']
+
+# Rank-based power law: a handful of users attract most follows, registrations and circles
+def power_law_weights(n, alpha):
+    return [1 / (rank ** alpha) for rank in range(1, n + 1)]
+
+def generate(conn, args):
+    rng = random.Random(args.seed)
+    now = datetime.now().replace(microsecond=0)
+    password_hash = bcrypt.hashpw(BENCHMARK_PASSWORD.encode('utf-8'), bcrypt.gensalt(args.bcrypt_rounds)).decode('utf-8')
+
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+        cur.execute("SELECT tag FROM tags")
+        tags = [row[0] for row in cur.fetchall()]
+
+        user_ids = list(range(1, args.users + 1))
+        popularity = power_law_weights(args.users, args.alpha)
+
+        with cur.copy("COPY users (id, username, email, hash, date_of_birth, bio, role) FROM STDIN") as copy:
+            for user_id in user_ids:
+                copy.write_row((user_id, f'user{user_id}', f'user{user_id}@example.com', password_hash,
+                                '1990-01-01', f'bio of user {user_id}', 'admin' if user_id == 1 else 'user'))
+
+        with cur.copy("COPY follow_relationships (user_id, follower_id) FROM STDIN") as copy:
+            for follower_id in user_ids:
+                follows = min(args.users - 1, int(rng.expovariate(1 / args.avg_follows)))
+                followed = set(rng.choices(user_ids, weights=popularity, k=follows))
+                followed.discard(follower_id)
+                for user_id in followed:
+                    copy.write_row((user_id, follower_id))
+
+        circle_count = int(args.users * args.circles_per_user)
+        hosts = rng.choices(user_ids, weights=popularity, k=circle_count)
+        circles = []
+        with cur.copy("COPY circles (id, host_id, title, description, is_live, is_ended, start_date) FROM STDIN") as copy:
+            for circle_id, host_id in enumerate(hosts, start=1):
+                start_date = now + timedelta(minutes=rng.randint(-60 * 24 * 60, 60 * 24 * 60))
+                is_ended = start_date < now and rng.random() < 0.9
+                is_live = not is_ended and start_date < now and rng.random() < 0.5
+                circles.append(circle_id)
+                copy.write_row((circle_id, host_id, f'circle {circle_id} by user{host_id}',
+                                f'description of circle {circle_id}', is_live, is_ended, start_date))
+
+        circle_popularity = power_law_weights(circle_count, args.alpha)
+        with cur.copy("COPY circles_registrations (user_id, circle_id) FROM STDIN") as copy:
+            for user_id in user_ids:
+                registrations = int(rng.expovariate(1 / args.avg_registrations))
+                for circle_id in set(rng.choices(circles, weights=circle_popularity, k=registrations)):
+                    copy.write_row((user_id, circle_id))
+
+        with cur.copy("COPY circle_tags (circle_id, tag) FROM STDIN") as copy:
+            for circle_id in circles:
+                for tag in rng.sample(tags, rng.randint(0, 3)):
+                    copy.write_row((circle_id, tag))
+
+        # popular circles are flagged more often, mostly by a few users each
+        flagged = set(rng.choices(circles, weights=circle_popularity, k=int(circle_count * args.flagged_circles)))
+        with cur.copy("COPY flags (circle_id, flag_user_id) FROM STDIN") as copy:
+            for circle_id in flagged:
+                for user_id in set(rng.choices(user_ids, k=1 + int(rng.expovariate(1 / 2)))):
+                    copy.write_row((circle_id, user_id))
+
+        thread_count = int(circle_count * args.threads_per_circle)
+        with cur.copy("COPY threads (id, circle_id, author_id, title) FROM STDIN") as copy:
+            for thread_id in range(1, thread_count + 1):
+                copy.write_row((thread_id, rng.choices(circles, weights=circle_popularity)[0],
+                                rng.choice(user_ids), f'thread {thread_id}'))
+
+        comment_count = int(thread_count * args.comments_per_thread)
+        thread_of_comment = {}
+        with cur.copy("COPY comments (id, thread_id, parent_id, author_id, comment, created_date) FROM STDIN") as copy:
+            for comment_id in range(1, comment_count + 1):
+                # about half of the comments reply to an earlier comment in the same thread
+                if thread_of_comment and rng.random() < 0.5:
+                    parent_id = rng.randint(max(1, comment_id - 1000), comment_id - 1)
+                    thread_id = thread_of_comment[parent_id]
+                else:
+                    parent_id = None
+                    thread_id = rng.randint(1, thread_count)
+                thread_of_comment[comment_id] = thread_id
+                copy.write_row((comment_id, thread_id, parent_id, rng.choice(user_ids),
+                                f'comment {comment_id}', now - timedelta(seconds=comment_count - comment_id)))
+
+        # derived data normally maintained by the controllers
+        cur.execute("""
+                    UPDATE circles
+                    SET registration_count = counts.registration_count
+                    FROM (
+                        SELECT circle_id, COUNT(*) AS registration_count FROM circles_registrations
+                        GROUP BY circle_id
+                    ) counts
+                    WHERE circles.id = counts.circle_id
+                    """)
+        cur.execute("""
+                    INSERT INTO flag_counts(circle_id, flag_count, last_flagged_date)
+                    SELECT circle_id, COUNT(*), MAX(flagged_date) FROM flags
+                    GROUP BY circle_id
+                    """)
+        cur.execute("""
+                    INSERT INTO home_feed(user_id, circle_id, host_id, start_date)
+                    SELECT follow_relationships.follower_id, circles.id, circles.host_id, circles.start_date FROM circles
+                    JOIN follow_relationships ON follow_relationships.user_id = circles.host_id
+                    """)
+
+        reconcile_user_stats(conn)
+
+        for table in ['users', 'circles', 'threads', 'comments']:
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}")
+
+    conn.commit()
+
+    with conn.cursor() as cur:
+        for table in TABLES:
+            cur.execute(f"ANALYZE {table}")
+    conn.commit()
+
+if __name__ == '__main__':
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Generate synthetic benchmark data')
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL') or 'dbname=project4 user=db_user')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--avg-follows', type=float, default=30)
+    parser.add_argument('--circles-per-user', type=float, default=2)
+    parser.add_argument('--avg-registrations', type=float, default=10)
+    parser.add_argument('--threads-per-circle', type=float, default=1)
+    parser.add_argument('--comments-per-thread', type=float, default=20)
+    parser.add_argument('--flagged-circles', type=float, default=0.05, help='share of circles drawn to be flagged')
+    parser.add_argument('--alpha', type=float, default=1.1, help='power-law exponent of the popularity distribution')
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with psycopg.connect(args.database_url) as conn:
+        generate(conn, args)
+    print(f'generated data for {args.users} users')
@@ -0,0 +1,192 @@
+# Replays a weighted mix of calls to every blueprint through the Flask app in-process and reports
+# throughput and p50/p95/p99 latency per endpoint. Run against data from generate_data:
+# python -m backend.benchmarks.load_test --duration 60 --output results.json [--compare previous.json]
+import argparse
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import psycopg
+from flask_jwt_extended import create_access_token
+from ..app import app
+from ..extensions import limiter
+from .generate_data import BENCHMARK_PASSWORD
+
+class Context:
+    def __init__(self, rng, user_id, sizes):
+        self.rng = rng
+        self.user_id = user_id
+        self.sizes = sizes
+
+    def random_id(self, table):
+        return self.rng.randint(1, max(self.sizes[table], 1))
+
+    def future_date(self):
+        return (datetime.now() + timedelta(days=self.rng.randint(1, 60))).strftime('%Y-%m-%d %H:%M:%S')
+
+# (name, weight, method, path, body factory)
+MIX = [
+    ('auth.login', 1, 'POST', '/auth/login',
+     lambda ctx: { 'username': f'user{ctx.random_id("users")}', 'password': BENCHMARK_PASSWORD }),
+    ('auth.get_user_details', 5, 'POST', '/auth/user',
+     lambda ctx: { 'user_id': ctx.random_id('users') }),
+    ('follow_rs.add_follow_rs', 1, 'PUT', '/user/follow',
+     lambda ctx: { 'user_id': ctx.random_id('users'), 'follower_id': ctx.user_id }),
+    ('follow_rs.delete_follow_rs', 1, 'DELETE', '/user/follow',
+     lambda ctx: { 'user_id': ctx.random_id('users'), 'follower_id': ctx.user_id }),
+    ('follow_rs.get_followers', 4, 'POST', '/user/followers',
+     lambda ctx: { 'user_id': ctx.random_id('users') }),
+    ('follow_rs.get_following', 4, 'POST', '/user/following',
+     lambda ctx: { 'follower_id': ctx.random_id('users') }),
+    ('follow_rs.get_profile_summary', 3, 'POST', '/user/profile-summary',
+     lambda ctx: { 'user_id': ctx.random_id('users') }),
+    ('circles.get_all_circles', 10, 'GET', '/circles/all', None),
+    ('circles.get_explore_circles', 8, 'GET', '/circles/explore', None),
+    ('circles.get_circle_by_id', 10, 'POST', '/circles/get',
+     lambda ctx: { 'circle_id': ctx.random_id('circles') }),
+    ('circles.get_following_circles', 15, 'GET', '/circles/following', None),
+    ('circles.search_circles', 3, 'GET', '/circles/search?q=circle%20description', None),
+    ('circles.get_circles_by_user', 5, 'POST', '/circles/user',
+     lambda ctx: { 'host_id': ctx.random_id('users') }),
+    ('circles.get_registered_circles', 8, 'GET', '/circles/registered', None),
+    ('circles.get_registered_users', 5, 'POST', '/circles/registrations',
+     lambda ctx: { 'circle_id': ctx.random_id('circles') }),
+    ('circles.get_tags_by_circle', 10, 'POST', '/circles/tags',
+     lambda ctx: { 'circle_id': ctx.random_id('circles') }),
+    ('circles.get_all_tags', 2, 'GET', '/circles/tags/all', None),
+    ('circles.get_circles_by_tag', 3, 'GET', '/circles/by-tag?tags=MUSIC,COMEDY', None),
+    ('circles.manage_registration', 2, 'PUT', '/circles/register',
+     lambda ctx: { 'circle_id': ctx.random_id('circles') }),
+    ('circles.add_circle', 1, 'PUT', '/circles/add',
+     lambda ctx: { 'host_id': ctx.user_id, 'title': 'benchmark circle', 'description': 'benchmark circle',
+                   'participants_limit': 100, 'start_date': ctx.future_date() }),
+    ('threads.get_threads_by_circle', 5, 'POST', '/threads/get',
+     lambda ctx: { 'circle_id': ctx.random_id('circles') }),
+    ('threads.add_thread', 1, 'PUT', '/threads/add',
+     lambda ctx: { 'circle_id': ctx.random_id('circles'), 'title': 'benchmark thread' }),
+    ('comments.get_comments_by_thread', 5, 'POST', '/comments/get',
+     lambda ctx: { 'thread_id': ctx.random_id('threads') }),
+    ('comments.get_comment_tree', 5, 'POST', '/comments/tree',
+     lambda ctx: { 'thread_id': ctx.random_id('threads') }),
+    ('comments.add_comment', 2, 'PUT', '/comments/add',
+     lambda ctx: { 'thread_id': ctx.random_id('threads'), 'comment': 'benchmark comment' }),
+]
+
+def get_table_sizes(conninfo):
+    with psycopg.connect(conninfo) as conn:
+        return { table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+                 for table in ['users', 'circles', 'threads', 'comments'] }
+
+def create_token(user_id):
+    with app.app_context():
+        return create_access_token(identity=f'user{user_id}',
+                                   additional_claims={ 'id': user_id, 'role': 'user', 'username': f'user{user_id}' })
+
+def run_worker(worker_id, args, sizes, deadline, results, lock):
+    rng = random.Random(args.seed + worker_id)
+    user_id = rng.randint(2, max(sizes['users'], 2))
+    ctx = Context(rng, user_id, sizes)
+    headers = { 'Authorization': f'Bearer {create_token(user_id)}' }
+    weights = [weight for _, weight, *_ in MIX]
+    client = app.test_client()
+    samples = defaultdict(list)
+
+    while time.perf_counter() < deadline:
+        name, _, method, path, body = rng.choices(MIX, weights=weights)[0]
+        started = time.perf_counter()
+        response = client.open(path, method=method, json=body(ctx) if body else None, headers=headers,
+                               base_url='https://localhost')
+        response.get_data()
+        samples[name].append((time.perf_counter() - started, response.status_code))
+
+    with lock:
+        for name, endpoint_samples in samples.items():
+            results[name].extend(endpoint_samples)
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def summarize(results, duration):
+    summary = {}
+    for name, samples in sorted(results.items()):
+        latencies = sorted(latency for latency, _ in samples)
+        statuses = defaultdict(int)
+        for _, status in samples:
+            statuses[str(status)] += 1
+        summary[name] = {
+            'requests': len(samples),
+            'throughput_rps': len(samples) / duration,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'statuses': dict(statuses),
+        }
+    return summary
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def print_report(summary, previous=None):
+    print(f'{"endpoint":40} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    for name, stats in summary.items():
+        line = f'{name:40} {stats["throughput_rps"]:9.1f} {stats["p50_ms"]:9.2f} {stats["p95_ms"]:9.2f} {stats["p99_ms"]:9.2f}'
+        if previous and name in previous:
+            change = (stats['p95_ms'] - previous[name]['p95_ms']) / previous[name]['p95_ms'] * 100
+            line += f'  p95 {change:+.1f}%'
+        print(line)
+
+def run(args):
+    # every simulated client comes from the same address, so per-IP limits would throttle the run
+    limiter.enabled = args.with_limiter
+    sizes = get_table_sizes(app.config['DATABASE_URL'])
+
+    results = defaultdict(list)
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    workers = [threading.Thread(target=run_worker, args=(worker_id, args, sizes, deadline, results, lock))
+               for worker_id in range(args.concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    duration = time.perf_counter() - started
+
+    return {
+        'commit': get_commit(),
+        'date': datetime.now().isoformat(),
+        'duration': duration,
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'total_throughput_rps': sum(len(samples) for samples in results.values()) / duration,
+        'endpoints': summarize(results, duration),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay a realistic request mix and report latencies')
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--with-limiter', action='store_true', help='keep flask-limiter enabled')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare p95 latencies against')
+    args = parser.parse_args()
+
+    report = run(args)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['endpoints']
+    print_report(report['endpoints'], previous)
+    print(f'total: {report["total_throughput_rps"]:.1f} req/s')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
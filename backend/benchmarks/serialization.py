@@ -0,0 +1,83 @@
+# Measures the cost of encoding a /circles/all page: Flask's default JSON provider (before) against
+# the stdlib and orjson encoders of the pluggable provider, MessagePack, and gzip/brotli on top.
+# Run against data from generate_data:
+# python -m backend.benchmarks.serialization --limit 200 --iterations 500
+import argparse
+import gzip
+import time
+import psycopg
+from psycopg.rows import dict_row
+from flask.json.provider import DefaultJSONProvider
+from ..app import app
+from ..pagination import encode_cursor
+from ..serialization import FastJSONProvider, encode_default, orjson, msgpack, brotli
+
+CIRCLES_ALL_QUERY = """
+                    SELECT circles.*, users.username FROM circles
+                    JOIN users ON circles.host_id = users.id
+                    ORDER BY circles.start_date, circles.id
+                    LIMIT %s
+                    """
+
+def load_payload(conninfo, limit):
+    with psycopg.connect(conninfo, row_factory=dict_row) as conn:
+        rows = conn.execute(CIRCLES_ALL_QUERY, (limit,)).fetchall()
+    next_cursor = encode_cursor(rows[-1]) if rows else None
+    return { 'status': 'ok', 'msg': 'successfully fetched all circles', 'data': rows, 'next_cursor': next_cursor }
+
+def get_encoders():
+    default_provider = DefaultJSONProvider(app)
+    encoders = {
+        'flask default json (before)': lambda obj: f'{default_provider.dumps(obj, separators=(",", ":"))}\n'.encode('utf-8'),
+    }
+    app.config['JSON_ENCODER'] = 'stdlib'
+    encoders['stdlib json'] = FastJSONProvider(app).encode
+    if orjson is not None:
+        app.config['JSON_ENCODER'] = 'orjson'
+        encoders['orjson'] = FastJSONProvider(app).encode
+    if msgpack is not None:
+        encoders['msgpack'] = lambda obj: msgpack.packb(obj, default=encode_default, datetime=False)
+    return encoders
+
+def get_compressors():
+    compressors = {
+        f'gzip level {app.config["COMPRESS_GZIP_LEVEL"]}':
+            lambda body: gzip.compress(body, compresslevel=app.config['COMPRESS_GZIP_LEVEL'], mtime=0),
+    }
+    if brotli is not None:
+        compressors[f'brotli quality {app.config["COMPRESS_BROTLI_QUALITY"]}'] = \
+            lambda body: brotli.compress(body, quality=app.config['COMPRESS_BROTLI_QUALITY'])
+    return compressors
+
+def time_per_call(fn, arg, iterations):
+    fn(arg)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = fn(arg)
+    return (time.perf_counter() - started) / iterations, result
+
+def run(args):
+    payload = load_payload(app.config['DATABASE_URL'], args.limit)
+    print(f'/circles/all page of {len(payload["data"])} rows, {args.iterations} iterations')
+    print(f'{"encoder":32} {"us/call":>10} {"bytes":>9}')
+
+    bodies = {}
+    baseline = None
+    for name, encode in get_encoders().items():
+        duration, body = time_per_call(encode, payload, args.iterations)
+        bodies[name] = body
+        baseline = baseline or duration
+        print(f'{name:32} {duration * 1e6:10.1f} {len(body):9d}  {baseline / duration:5.2f}x')
+
+    print()
+    print(f'{"compression":32} {"us/call":>10} {"bytes":>9}')
+    json_body = bodies.get('orjson') or bodies['stdlib json']
+    for name, compress in get_compressors().items():
+        duration, body = time_per_call(compress, json_body, args.iterations)
+        print(f'{name:32} {duration * 1e6:10.1f} {len(body):9d}  {len(body) / len(json_body) * 100:5.1f}% of json')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare response encoders on a /circles/all page')
+    parser.add_argument('--limit', type=int, default=200, help='rows in the page')
+    parser.add_argument('--iterations', type=int, default=500)
+    run(parser.parse_args())
@@ -0,0 +1,126 @@
+# Compares the threaded WSGI server (app.run / flask run --with-threads) against the ASGI entry point
+# (uvicorn backend.asgi:app) under the same load, while a number of slow clients trickle their
+# request headers and hold connections open. Each mode is started as a subprocess. Handlers are
+# synchronous in both: the ASGI mode only moves client connections onto the event loop and runs
+# the handlers on a2wsgi's thread pool.
+# python -m backend.benchmarks.serving_modes --duration 30 --concurrency 50 --slow-clients 500
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from .load_test import create_token, percentile
+
+MODES = {
+    'threaded': lambda port: [sys.executable, '-m', 'flask', '--app', 'backend.app', 'run', '--port', str(port), '--with-threads'],
+    'asgi': lambda port: [sys.executable, '-m', 'uvicorn', 'backend.asgi:app', '--port', str(port), '--log-level', 'warning'],
+}
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+def build_request(path, token):
+    # X-Forwarded-Proto keeps Talisman from redirecting the plain-http benchmark to https
+    return (f'GET {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n'
+            f'X-Forwarded-Proto: https\r\nConnection: close\r\n\r\n').encode('utf-8')
+
+async def send_request(port, request):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        return int(response.split(b' ', 2)[1])
+    finally:
+        writer.close()
+
+async def slow_client(port, request, deadline):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return
+    try:
+        # one byte per second, never finishing the request within the run
+        for byte in request[:-2]:
+            if time.monotonic() > deadline:
+                break
+            writer.write(bytes([byte]))
+            await writer.drain()
+            await asyncio.sleep(1)
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+async def worker(port, request, deadline, samples):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            status = await send_request(port, request)
+        except OSError:
+            status = 0
+        samples.append((time.perf_counter() - started, status))
+
+async def run_load(port, request, args):
+    deadline = time.monotonic() + args.duration
+    samples = []
+    slow_clients = [asyncio.create_task(slow_client(port, request, deadline)) for _ in range(args.slow_clients)]
+    # give the slow clients time to occupy the server before measuring
+    await asyncio.sleep(1)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(port, request, deadline, samples) for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+    for task in slow_clients:
+        task.cancel()
+    return samples, duration
+
+def run_mode(mode, args, request):
+    server = subprocess.Popen(MODES[mode](args.port), stdout=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.port)
+        samples, duration = asyncio.run(run_load(args.port, request, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = sorted(latency for latency, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, status in samples if status != 200),
+        'throughput_rps': len(samples) / duration,
+        'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+        'p95_ms': percentile(latencies, 0.95) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the threaded WSGI server and the ASGI entry point')
+    parser.add_argument('--path', default='/circles/explore')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per mode')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--slow-clients', type=int, default=200)
+    parser.add_argument('--user-id', type=int, default=2)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    request = build_request(args.path, create_token(args.user_id))
+    results = { mode: run_mode(mode, args, request) for mode in MODES }
+
+    print(f'{"mode":8} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>7}')
+    for mode, stats in results.items():
+        print(f'{mode:8} {stats["throughput_rps"]:9.1f} {stats["p50_ms"] or 0:9.2f} {stats["p95_ms"] or 0:9.2f} '
+              f'{stats["p99_ms"] or 0:9.2f} {stats["errors"]:7}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
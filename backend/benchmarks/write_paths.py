@@ -0,0 +1,84 @@
+# Compares the edit/delete paths of circles, threads and comments: the previous SELECT-then-write
+# (two round trips) against the single ownership-checked statement of backend/ownership.py.
+# Every operation is rolled back, so the data is left unchanged. The saving per operation is one
+# round trip, so point DATABASE_URL at a database across the network to see it at full size.
+# python -m backend.benchmarks.write_paths --iterations 2000
+import argparse
+import random
+import time
+import psycopg
+from psycopg.rows import dict_row
+from ..app import app
+from ..ownership import update_owned_row, delete_owned_row
+
+# (table, owner column, edited column)
+TABLES = [
+    ('circles', 'host_id', 'title'),
+    ('threads', 'author_id', 'title'),
+    ('comments', 'author_id', 'comment'),
+]
+
+def select_then_update(cur, table, owner_column, column, row):
+    cur.execute(f"SELECT * FROM {table} WHERE id = %s", (row['id'],))
+    current = cur.fetchone()
+    if current and current[owner_column] == row['owner_id']:
+        cur.execute(f"UPDATE {table} SET {column} = %s WHERE id = %s", ('benchmark edit', row['id']))
+
+def single_update(cur, table, owner_column, column, row):
+    update_owned_row(cur, table, row['id'], row['owner_id'], { column: 'benchmark edit' }, owner_column=owner_column)
+
+def select_then_delete(cur, table, owner_column, column, row):
+    cur.execute(f"SELECT * FROM {table} WHERE id = %s", (row['id'],))
+    current = cur.fetchone()
+    if current and current[owner_column] == row['owner_id']:
+        cur.execute(f"DELETE FROM {table} WHERE id = %s", (row['id'],))
+
+def single_delete(cur, table, owner_column, column, row):
+    delete_owned_row(cur, table, row['id'], row['owner_id'], owner_column=owner_column)
+
+VARIANTS = [
+    ('edit', 'select + update', 2, select_then_update),
+    ('edit', 'single statement', 1, single_update),
+    ('delete', 'select + delete', 2, select_then_delete),
+    ('delete', 'single statement', 1, single_delete),
+]
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def run(args):
+    rng = random.Random(args.seed)
+    print(f'{"table":10} {"op":7} {"variant":18} {"round trips":>11} {"mean ms":>9} {"p95 ms":>9}')
+
+    with psycopg.connect(app.config['DATABASE_URL'], row_factory=dict_row) as conn:
+        for table, owner_column, column in TABLES:
+            rows = conn.execute(f"""
+                                SELECT id, {owner_column} AS owner_id FROM {table}
+                                ORDER BY id DESC
+                                LIMIT %s
+                                """, (args.sample,)).fetchall()
+            conn.rollback()
+            if not rows:
+                continue
+
+            for op, variant, round_trips, fn in VARIANTS:
+                latencies = []
+                for _ in range(args.iterations):
+                    row = rng.choice(rows)
+                    with conn.cursor() as cur:
+                        started = time.perf_counter()
+                        fn(cur, table, owner_column, column, row)
+                        latencies.append(time.perf_counter() - started)
+                    conn.rollback()
+
+                latencies.sort()
+                mean = sum(latencies) / len(latencies)
+                print(f'{table:10} {op:7} {variant:18} {round_trips:11d} {mean * 1000:9.3f} '
+                      f'{percentile(latencies, 0.95) * 1000:9.3f}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare two-step and single-statement edit/delete paths')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--sample', type=int, default=1000, help='rows per table to pick targets from')
+    parser.add_argument('--seed', type=int, default=42)
+    run(parser.parse_args())
@@ -0,0 +1,53 @@
+import hashlib
+from functools import wraps
+from flask import request, jsonify, make_response
+from flask_jwt_extended import get_jwt
+from .db import connect_db
+from .queries import execute
+
+# ETag / Last-Modified for list endpoints, derived from the table_versions stamps of the tables the
+# response is built from. A matching If-None-Match (or an unchanged If-Modified-Since) on a GET is
+# answered with 304 before the handler runs, so the list query and JSON serialization are skipped.
+# Other methods (e.g. the POST form of /threads/get) are passed straight to the handler.
+def versioned_by(*tables):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+
+            conn = connect_db()
+
+            if not conn:
+                return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
+
+            with conn.cursor() as cur:
+                execute(cur, 'conditional.get_table_versions', (list(tables),))
+                versions = cur.fetchall()
+
+            # responses differ per user (e.g. /circles/registered, include=viewer) and per query string
+            key = '|'.join([request.endpoint, str(get_jwt().get('id')), request.query_string.decode('utf-8')]
+                           + [f"{row['table_name']}:{row['version']}" for row in versions])
+            etag = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+            last_modified = max((row['updated_date'] for row in versions), default=None)
+
+            # updated_date is a timestamptz and If-Modified-Since is parsed as an aware UTC datetime
+            if request.if_none_match:
+                is_fresh = request.if_none_match.contains_weak(etag)
+            else:
+                is_fresh = (last_modified is not None and request.if_modified_since is not None
+                            and last_modified.replace(microsecond=0) <= request.if_modified_since)
+            if is_fresh:
+                response = make_response('', 304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                if last_modified is not None:
+                    response.last_modified = last_modified
+                response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
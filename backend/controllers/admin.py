@@ -0,0 +1,35 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt
+from ..instrumentation import jwt_required
+from ..db import get_pool_stats
+from ..slow_queries import slow_query_log
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+@admin_bp.route('/db/pool')
+@jwt_required()
+def get_db_pool_stats():
+    try:
+        claims = get_jwt()
+
+        if claims['role'] != 'admin':
+            return jsonify({ 'status': 'error', 'msg': 'unauthorized operation' }), 403
+
+        data = get_pool_stats()
+        return jsonify({ 'status': 'ok', 'msg': 'successfully fetched db pool stats', 'data': data }), 200
+    except:
+        return jsonify({ 'status': 'error', 'msg': 'error getting db pool stats'}), 400
+
+@admin_bp.route('/db/slow-queries')
+@jwt_required()
+def get_slow_queries():
+    try:
+        claims = get_jwt()
+
+        if claims['role'] != 'admin':
+            return jsonify({ 'status': 'error', 'msg': 'unauthorized operation' }), 403
+
+        data = slow_query_log.get_entries(request.args.get('endpoint'))
+        return jsonify({ 'status': 'ok', 'msg': 'successfully fetched slow queries', 'data': data }), 200
+    except:
+        return jsonify({ 'status': 'error', 'msg': 'error getting slow queries'}), 400
@@ -1,7 +1,9 @@
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt_identity, jwt_required, get_jwt
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt_identity, get_jwt
+from ..instrumentation import jwt_required
 from ..db import connect_db
-from ..extensions import bcrypt
+from ..queries import execute
+from ..passwords import password_hasher, PasswordHasherBusy
 from ..validators.auth_validators import registration_middleware
 import datetime
 
@@ -21,10 +23,7 @@ def register_admin():
             
             with conn.cursor() as cur:
                 # check for existing user
-                cur.execute("""
-                            SELECT * FROM users
-                            WHERE username=%s OR email=%s
-                            """, (username, email))
+                execute(cur, 'auth.find_user', (username, email))
                 
                 if cur.fetchone():
                     return jsonify({ 'status': 'error', 'msg': 'duplicate username/email'}), 409
@@ -39,15 +38,14 @@ def register_admin():
                 if datetime.date.today().year - int(birth_year) < 18:
                     return jsonify({ 'status': 'error', 'msg': 'user is underaged'}), 403
 
-                hash = bcrypt.generate_password_hash(password).decode('utf-8')
+                hash = password_hasher.generate_password_hash(password)
 
-                cur.execute("""
-                            INSERT INTO users(username, email, hash, date_of_birth, bio, role)
-                            VALUES (%s, %s, %s, CAST(%s AS DATE), %s, 'admin')
-                            """, (username, email, hash, date_of_birth, bio))
+                execute(cur, 'auth.register_admin', (username, email, hash, date_of_birth, bio))
                 conn.commit()
 
             return jsonify({ 'status': 'ok', 'msg': 'admin created'}), 200
+    except PasswordHasherBusy:
+        return jsonify({ 'status': 'error', 'msg': 'server busy, please try again later' }), 503
     except Exception as error:
         return jsonify({ 'status': 'error', 'msg': error }), 400
 
@@ -66,10 +64,7 @@ def register():
             
             with conn.cursor() as cur:
                 # check for duplicate user
-                cur.execute("""
-                            SELECT * FROM users
-                            WHERE username=%s OR email=%s
-                            """, (username, email))
+                execute(cur, 'auth.find_user', (username, email))
                 
                 if cur.fetchone():
                     return jsonify({ 'status': 'error', 'msg': 'duplicate username/email'}), 409
@@ -84,15 +79,14 @@ def register():
                 if datetime.date.today().year - int(birth_year) < 18:
                     return jsonify({ 'status': 'error', 'msg': 'user is underaged'}), 403
 
-                hash = bcrypt.generate_password_hash(password).decode('utf-8')
+                hash = password_hasher.generate_password_hash(password)
 
-                cur.execute("""
-                            INSERT INTO users(username, email, hash, date_of_birth, bio)
-                            VALUES (%s, %s, %s, CAST(%s AS DATE), %s)
-                            """, (username, email, hash, date_of_birth, bio))
+                execute(cur, 'auth.register', (username, email, hash, date_of_birth, bio))
                 conn.commit()
 
             return jsonify({ 'status': 'ok', 'msg': 'user created'}), 200
+    except PasswordHasherBusy:
+        return jsonify({ 'status': 'error', 'msg': 'server busy, please try again later' }), 503
     except Exception as error:
         return jsonify({ 'status': 'error', 'msg': error }), 400
 
@@ -109,10 +103,7 @@ def login():
             
             with conn.cursor() as cur:
                 # check for existing user
-                cur.execute("""
-                            SELECT * FROM users
-                            WHERE username=%s OR email=%s
-                            """, (username, username))
+                execute(cur, 'auth.find_user', (username, username))
                 
                 existing_user = cur.fetchone()
                 if not existing_user:
@@ -120,11 +111,20 @@ def login():
                 
                 # compare hash using bcrypt
                 password = request.json.get('password')
-                is_valid = bcrypt.check_password_hash(existing_user['hash'], password)
+                is_valid = password_hasher.check_password_hash(existing_user['hash'], password)
 
                 if not is_valid:
                     return jsonify({ 'status': 'error', 'msg': 'invalid credentials'}), 401
                 
+                # upgrade hashes made with an outdated bcrypt cost now that the password is known;
+                # best effort, a busy hasher leaves it for a later login rather than failing this one
+                if password_hasher.needs_rehash(existing_user['hash']):
+                    try:
+                        execute(cur, 'auth.rehash_password', (password_hasher.generate_password_hash(password), existing_user['id']))
+                        conn.commit()
+                    except PasswordHasherBusy:
+                        current_app.logger.warning('password rehash skipped for user %s, hasher busy', existing_user['id'])
+                
                 additional_claims = {
                     'id': existing_user['id'],
                     'role': existing_user['role'],
@@ -133,6 +133,8 @@ def login():
                 access_token = create_access_token(identity=username, additional_claims=additional_claims, fresh=True)
                 refresh_token = create_refresh_token(identity=username, additional_claims=additional_claims)
                 return jsonify({ 'status': 'ok', 'msg': 'login success', 'data': { 'access_token': access_token, 'refresh_token': refresh_token } }), 200
+    except PasswordHasherBusy:
+        return jsonify({ 'status': 'error', 'msg': 'server busy, please try again later' }), 503
     except Exception as error:
         return jsonify({ 'status': 'error', 'msg': error }), 400
     
@@ -164,10 +166,7 @@ def get_user_details():
         
         with conn.cursor() as cur:
             user_id = request.json.get('user_id')
-            cur.execute("""
-                        SELECT username, email, date_of_birth, bio FROM users
-                        WHERE id = %s
-                        """, (user_id,))
+            execute(cur, 'auth.get_user_details', (user_id,))
             data = cur.fetchone()
 
             if not data:
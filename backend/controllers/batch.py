@@ -0,0 +1,138 @@
+from flask import Blueprint, jsonify, request, current_app, g
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import HTTPException
+from ..instrumentation import jwt_required
+from ..db import release_transaction
+
+batch_bp = Blueprint('batch', __name__)
+
+BATCH_MAX_SIZE = 200
+BATCH_MAX_WORKERS = 4
+# client and proxy headers passed on to sub-requests
+FORWARDED_HEADERS = ('X-Forwarded-Proto', 'X-Forwarded-For', 'X-Real-IP')
+
+# Pooled connections held by parallel sub-requests, shared by every batch of the process and capped at
+# BATCH_MAX_CONNECTIONS so that concurrent batches cannot exhaust the pool for other requests.
+# A batch that gets fewer than two runs its sub-requests one by one on its own single connection.
+class ConnectionBudget:
+    def __init__(self):
+        self.in_use = 0
+        self._lock = threading.Lock()
+
+    # takes up to wanted connections without waiting and returns how many were granted
+    def acquire(self, limit, wanted):
+        with self._lock:
+            granted = max(min(wanted, limit - self.in_use), 0)
+            self.in_use += granted
+            return granted
+
+    def release(self, granted):
+        with self._lock:
+            self.in_use -= granted
+
+batch_connections = ConnectionBudget()
+
+# Endpoints that only read, so their sub-requests can run concurrently on separate connections
+READ_ONLY_ENDPOINTS = {
+    'auth.get_user_details',
+    'follow_rs.get_followers',
+    'follow_rs.get_following',
+    'circles.get_all_circles',
+    'circles.get_circle_by_id',
+    'circles.get_explore_circles',
+    'circles.get_following_circles',
+    'circles.get_circles_by_user',
+    'circles.get_registered_users',
+    'circles.get_registered_circles',
+    'circles.get_tags_by_circle',
+    'circles.get_all_tags',
+    'circles.get_flags_by_circle',
+    'threads.get_threads_by_circle',
+    'comments.get_comments_by_thread',
+    'comments.get_comment_tree',
+}
+
+# Runs an array of sub-requests against the other blueprints in-process, e.g.
+# { "requests": [{ "method": "POST", "path": "/circles/tags", "body": { "circle_id": 1 } }] }
+# and returns their status codes and bodies in the same order.
+@batch_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def run_batch():
+    try:
+        sub_requests = request.json.get('requests')
+
+        if not isinstance(sub_requests, list) or not sub_requests:
+            return jsonify({ 'status': 'error', 'msg': 'requests must be a non-empty array' }), 400
+        elif len(sub_requests) > BATCH_MAX_SIZE:
+            return jsonify({ 'status': 'error', 'msg': f'batch size exceeds limit of {BATCH_MAX_SIZE}' }), 413
+
+        adapter = current_app.url_map.bind_to_environ(request.environ)
+        results = [None] * len(sub_requests)
+        runnable = []
+
+        for idx, sub_request in enumerate(sub_requests):
+            method = str(sub_request.get('method', 'GET')).upper()
+            path = sub_request.get('path', '')
+
+            try:
+                endpoint, _ = adapter.match(path.split('?')[0], method)
+            except HTTPException as error:
+                results[idx] = { 'status': error.code, 'body': { 'status': 'error', 'msg': error.description } }
+                continue
+
+            if endpoint == 'batch.run_batch':
+                results[idx] = { 'status': 400, 'body': { 'status': 'error', 'msg': 'nested batch not allowed' } }
+                continue
+
+            runnable.append((idx, endpoint, method, path, sub_request.get('body')))
+
+        headers = { 'Authorization': request.headers.get('Authorization', '') }
+        for header in FORWARDED_HEADERS:
+            if header in request.headers:
+                headers[header] = request.headers[header]
+
+        app = current_app._get_current_object()
+        base_url = request.host_url
+        # sub-requests are rate limited against the caller's own address, like the batch itself
+        environ_base = { 'REMOTE_ADDR': request.remote_addr }
+
+        workers = 0
+        if len(runnable) > 1 and all(endpoint in READ_ONLY_ENDPOINTS for _, endpoint, *_ in runnable):
+            workers = batch_connections.acquire(app.config['BATCH_MAX_CONNECTIONS'], min(len(runnable), BATCH_MAX_WORKERS))
+            if workers < 2:
+                batch_connections.release(workers)
+                workers = 0
+
+        if workers:
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [(idx, executor.submit(run_isolated_sub_request, app, method, path, body, headers, base_url, environ_base))
+                               for idx, _, method, path, body in runnable]
+                    for idx, future in futures:
+                        results[idx] = future.result()
+            finally:
+                batch_connections.release(workers)
+        else:
+            # sub-requests share this request's app context, and with it its pooled db connection
+            for idx, _, method, path, body in runnable:
+                results[idx] = run_sub_request(app, method, path, body, headers, base_url, environ_base)
+                if 'db_conn' in g:
+                    release_transaction(g.db_conn)
+
+        return jsonify({ 'status': 'ok', 'msg': 'batch completed', 'data': results }), 200
+    except:
+        return jsonify({ 'status': 'error', 'msg': 'error running batch'}), 400
+
+def run_sub_request(app, method, path, body, headers, base_url, environ_base):
+    with app.test_request_context(path, method=method, json=body, headers=headers, base_url=base_url,
+                                  environ_base=environ_base):
+        response = app.full_dispatch_request()
+        if response.is_json:
+            return { 'status': response.status_code, 'body': response.get_json() }
+        return { 'status': response.status_code, 'body': response.get_data(as_text=True) }
+
+# parallel sub-requests get their own app context, so each borrows (and returns) its own connection
+def run_isolated_sub_request(app, method, path, body, headers, base_url, environ_base):
+    with app.app_context():
+        return run_sub_request(app, method, path, body, headers, base_url, environ_base)
@@ -1,13 +1,44 @@
-from flask import Blueprint, jsonify, request
+from datetime import datetime
+from flask import Blueprint, Response, current_app, jsonify, request
 from ..db import connect_db
-from flask_jwt_extended import jwt_required, get_jwt
+from ..pagination import paginated_response, encode_keyset, decode_keyset, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE, FEED_KEY_COLUMNS
+from ..feed import add_pending_fanout, fan_out_circle, update_circle_start_date
+from ..cache import TTLCache
+from ..user_stats import adjust_user_stats
+from ..tag_catalogue import tag_catalogue
+from ..conditional import versioned_by
+from ..events import event_hub, publish_event, stream_events
+from ..ownership import update_owned_row, delete_owned_row
+from ..queries import execute, QUERIES, INCLUDE_COLUMNS, SEARCH_CONDITIONS, FLAG_QUEUE_KEYSET
+from flask_jwt_extended import get_jwt
+from ..instrumentation import jwt_required
 from ..validators.circles_validators import add_circle_middleware, update_circle_middleware
 
 circles_bp = Blueprint('circles', __name__, url_prefix='/circles')
 
+EXPLORE_POPULAR_LIMIT = 5
+EXPLORE_SECTION_LIMIT = 50
+EXPLORE_CACHE_TTL = 30
+explore_cache = TTLCache(EXPLORE_CACHE_TTL)
+
+def include_columns(query, params):
+    columns = ''
+    column_params = []
+
+    for field in dict.fromkeys(request.args.get('include', '').split(',')):
+        if field not in INCLUDE_COLUMNS:
+            continue
+        column, needs_viewer = INCLUDE_COLUMNS[field]
+        columns += column
+        if needs_viewer:
+            column_params.append(get_jwt()['id'])
+
+    return query.replace('{columns}', columns), (*column_params, *params)
+
 # Main circles endpoints
 @circles_bp.route('/all')
 @jwt_required()
+@versioned_by('circles', 'users', 'circle_tags', 'circles_registrations')
 def get_all_circles():
     try:
         conn = connect_db()
@@ -15,18 +46,24 @@ def get_all_circles():
         if not conn:
             return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
         
-        with conn.cursor() as cur:
-            cur.execute("""
-                        SELECT circles.*, users.username FROM circles
-	                    JOIN users ON circles.host_id = users.id
-	                    ORDER BY start_date
-                        """)
-            data = cur.fetchall()
-        
-        return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all circles', 'data': data }), 200
+        return paginated_response(conn, *include_columns(QUERIES['circles.get_all_circles'], ()), 'successfully fetched all circles')
     except:
         return jsonify({ 'status': 'error', 'msg': 'error getting all circles'}), 400
 
+# Server-sent events for one circle: 'circle' (state and edits), 'thread' and 'comment' (new posts).
+# EventSource cannot set headers, so the access token may also be passed as ?jwt=
+@circles_bp.route('/events')
+@jwt_required(locations=['headers', 'query_string'])
+def stream_circle_events():
+    circle_id = request.args.get('circle_id', type=int)
+
+    if circle_id is None:
+        return jsonify({ 'status': 'error', 'msg': 'circle_id required'}), 400
+
+    subscription = event_hub.subscribe(circle_id)
+    return Response(stream_events(subscription), mimetype='text/event-stream',
+                    headers={ 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no' })
+
 @circles_bp.route('/get', methods=['POST'])
 @jwt_required()
 def get_circle_by_id():
@@ -38,11 +75,7 @@ def get_circle_by_id():
         
         with conn.cursor() as cur:
             circle_id = request.json.get('circle_id')
-            cur.execute("""
-                        SELECT circles.*, users.username FROM circles
-	                    JOIN users ON circles.host_id = users.id
-                        WHERE circles.id = %s
-                        """, (circle_id,))
+            cur.execute(*include_columns(QUERIES['circles.get_circle_by_id'], (circle_id,)))
             data = cur.fetchone()
 
             if not data:
@@ -52,6 +85,82 @@ def get_circle_by_id():
     except:
         return jsonify({ 'status': 'error', 'msg': 'error getting circle details'}), 400
 
+@circles_bp.route('/explore')
+@jwt_required()
+def get_explore_circles():
+    try:
+        data = explore_cache.get('explore')
+
+        if data is None:
+            conn = connect_db()
+
+            if not conn:
+                return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
+            
+            with conn.cursor() as cur:
+                execute(cur, 'circles.explore_popular', (EXPLORE_POPULAR_LIMIT,))
+                popular = cur.fetchall()
+
+                execute(cur, 'circles.explore_live', (EXPLORE_SECTION_LIMIT,))
+                live = cur.fetchall()
+
+                execute(cur, 'circles.explore_upcoming', (EXPLORE_SECTION_LIMIT,))
+                upcoming = cur.fetchall()
+
+            data = { 'popular': popular, 'live': live, 'upcoming': upcoming }
+            explore_cache.set('explore', data)
+
+        response = jsonify({ 'status': 'ok', 'msg': 'successfully fetched explore circles', 'data': data })
+        response.headers['Cache-Control'] = f'private, max-age={EXPLORE_CACHE_TTL}'
+        return response, 200
+    except:
+        return jsonify({ 'status': 'error', 'msg': 'error getting explore circles'}), 400
+
+# Ranked full-text search on title, description and host username, e.g.
+# /circles/search?q=jazz piano&tags=MUSIC,EDUCATION&from=2024-05-01&to=2024-06-01&limit=20&cursor=...
+@circles_bp.route('/search')
+@jwt_required()
+def search_circles():
+    try:
+        conn = connect_db()
+
+        if not conn:
+            return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
+        
+        search_terms = request.args.get('q', '').strip()
+        if not search_terms:
+            return jsonify({ 'status': 'error', 'msg': 'search terms required'}), 400
+
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        conditions = []
+        params = { 'q': search_terms, 'limit': limit + 1 }
+
+        if request.args.get('tags'):
+            conditions.append(SEARCH_CONDITIONS['tags'])
+            params['tags'] = request.args.get('tags').split(',')
+        if request.args.get('from'):
+            conditions.append(SEARCH_CONDITIONS['from'])
+            params['from'] = request.args.get('from')
+        if request.args.get('to'):
+            conditions.append(SEARCH_CONDITIONS['to'])
+            params['to'] = request.args.get('to')
+        if request.args.get('cursor'):
+            conditions.append(SEARCH_CONDITIONS['cursor'])
+            params['rank'], params['id'] = decode_keyset(request.args.get('cursor'))
+
+        with conn.cursor() as cur:
+            execute(cur, 'circles.search_circles', params, conditions=' '.join(conditions))
+            data = cur.fetchall()
+
+        next_cursor = None
+        if len(data) > limit:
+            data = data[:limit]
+            next_cursor = encode_keyset(data[-1]['rank'], data[-1]['id'])
+
+        return jsonify({ 'status': 'ok', 'msg': 'successfully searched circles', 'data': data, 'next_cursor': next_cursor }), 200
+    except:
+        return jsonify({ 'status': 'error', 'msg': 'error searching circles'}), 400
+
 @circles_bp.route('/following', methods=['GET'])
 @jwt_required()
 def get_following_circles():
@@ -64,16 +173,8 @@ def get_following_circles():
         if not conn:
             return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
         
-        with conn.cursor() as cur:
-            cur.execute("""
-                        SELECT circles.*, users.username FROM circles
-	                    JOIN users ON circles.host_id = users.id
-                        JOIN follow_relationships ON follow_relationships.user_id = users.id
-                        WHERE follow_relationships.follower_id = %s
-                        ORDER BY circles.start_date
-                        """, (logged_in_user_id,))
-            data = cur.fetchall()
-        return jsonify({ 'status': 'ok', 'msg': 'successfully fetched following circles', 'data': data }), 200
+        return paginated_response(conn, *include_columns(QUERIES['circles.get_following_circles'], (logged_in_user_id,)),
+                                  'successfully fetched following circles', key_columns=FEED_KEY_COLUMNS)
     except:
         return jsonify({ 'status': 'error', 'msg': 'error getting following circles'}), 400
 
@@ -86,20 +187,8 @@ def get_circles_by_user():
         if not conn:
             return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
         
-        with conn.cursor() as cur:
-            host_id = request.json.get('host_id')
-            cur.execute("""
-                        SELECT circles.*, users.username FROM circles
-	                    JOIN users ON circles.host_id = users.id
-                        WHERE circles.host_id = %s
-                        ORDER BY circles.start_date
-                        """, (host_id,))
-            data = cur.fetchall()
-
-            if not data:
-                return jsonify({ 'status': 'ok', 'msg': 'user has no circles'}), 200
-        
-        return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all circles by user', 'data': data }), 200
+        host_id = request.json.get('host_id')
+        return paginated_response(conn, *include_columns(QUERIES['circles.get_circles_by_user'], (host_id,)), 'successfully fetched all circles by user')
     except:
         return jsonify({ 'status': 'error', 'msg': 'error getting circles by user'}), 400
 
@@ -124,16 +213,24 @@ def add_circle():
                 description = request.json.get('description')
                 participants_limit = request.json.get('participants_limit', 100)
                 start_date = request.json.get('start_date')
+                auto_start = bool(request.json.get('auto_start', False))
+                end_date = request.json.get('end_date') or None
 
-                cur.execute("""
-                            INSERT INTO circles(host_id, title, description, participants_limit, start_date)
-                            VALUES (%s, %s, %s, %s, %s)
-                            RETURNING *
-                            """, (host_id, title, description, participants_limit, start_date))
+                execute(cur, 'circles.add_circle', (host_id, title, description, participants_limit, start_date, auto_start, end_date))
                 
                 inserted_row = cur.fetchone()
+                adjust_user_stats(cur, host_id, circles_hosted=1)
+                add_pending_fanout(cur, inserted_row['id'])
 
-                conn.commit()  
+                conn.commit()
+
+            # the circle is committed at this point, so a failed fan-out must not be reported as a
+            # failed creation (the client would retry and create a duplicate); its pending fan-out
+            # stays recorded and is replayed by the lifecycle scheduler
+            try:
+                fan_out_circle(conn, inserted_row)
+            except Exception:
+                current_app.logger.warning('home feed fan-out failed for circle %s', inserted_row['id'], exc_info=True)
             return jsonify({ 'status': 'ok', 'msg': 'circle created', 'data': inserted_row }), 200
         else:
             return jsonify({ 'status': 'error', 'error': 'creation of new circle unauthorized' }), 403
@@ -155,30 +252,29 @@ def edit_circle():
         
         with conn.cursor() as cur:
             circle_id = request.json.get('circle_id')
-            cur.execute("""
-                        SELECT * FROM circles
-                        WHERE id = %s
-                        """, (circle_id,))
-            circle = cur.fetchone()
 
-            # check if logged_in_user is host
-            if not circle:
+            # only the host may edit; started_date records the first time the circle went live, see backend/lifecycle.py
+            found, circle = update_owned_row(cur, 'circles', circle_id, logged_in_user_id, {
+                'title': request.json.get('title') or None,
+                'description': request.json.get('description') or None,
+                'participants_limit': request.json.get('participants_limit') or None,
+                'start_date': request.json.get('start_date') or None,
+                'is_live': request.json.get('is_live'),
+                'is_ended': request.json.get('is_ended'),
+                'auto_start': request.json.get('auto_start'),
+                'end_date': request.json.get('end_date') or None,
+            }, owner_column='host_id', assignments=[
+                'started_date = CASE WHEN COALESCE(%(value_is_live)s, is_live) THEN COALESCE(started_date, NOW()) ELSE started_date END'
+            ])
+
+            if not found:
                 return jsonify({ 'status': 'error', 'msg': 'no circle found' }), 400
-            elif logged_in_user_id != circle['host_id']:
+            elif not circle:
                 return jsonify({ 'status': 'error', 'msg': 'edit circle unauthorized'}), 403
-            
-            title = request.json.get('title') or circle['title']
-            description = request.json.get('description') or circle['description']
-            participants_limit = request.json.get('participants_limit') or circle['participants_limit']
-            start_date = request.json.get('start_date') or circle['start_date']
-            is_live = request.json.get('is_live') or circle['is_live']
-            is_ended = request.json.get('is_ended') or circle['is_ended']
-
-            cur.execute("""
-                        UPDATE circles
-                        SET title = %s, description = %s, participants_limit = %s, start_date = %s, is_live = %s, is_ended = %s
-                        WHERE id = %s
-                        """, (title, description, participants_limit, start_date, is_live, is_ended, circle_id))
+
+            publish_event(cur, circle['id'], 'circle', circle)
+            if request.json.get('start_date'):
+                update_circle_start_date(cur, circle['id'], circle['start_date'])
             conn.commit()
         return jsonify({ 'status': 'ok', 'msg': 'successfully edited circle'}), 200
     except:
@@ -199,23 +295,17 @@ def delete_circle():
         
         with conn.cursor() as cur:
             circle_id = request.json.get('circle_id')
-            cur.execute("""
-                        SELECT host_id FROM circles
-                        WHERE id = %s
-                        """, (circle_id,))
-            circle = cur.fetchone()
 
-            # check if logged in user is circle host or admin
-            if not circle:
+            # only the circle host or an admin may delete
+            found, circle = delete_owned_row(cur, 'circles', circle_id, logged_in_user_id, owner_column='host_id',
+                                             is_admin=logged_in_user_role == 'admin')
+
+            if not found:
                 return jsonify({ 'status': 'error', 'msg': 'no circle found' }), 400
-            elif logged_in_user_id != circle['host_id'] and logged_in_user_role != 'admin':
+            elif not circle:
                 return jsonify({ 'status': 'error', 'msg': 'delete circle unauthorized'}), 403
-            
-            cur.execute("""
-                        DELETE FROM circles
-                        WHERE id = %s
-                        """, (circle_id,))
-            
+
+            adjust_user_stats(cur, circle['host_id'], circles_hosted=-1)
             conn.commit()
         return jsonify({ 'status': 'ok', 'msg': 'circle deleted'}), 200
     except:
@@ -237,22 +327,55 @@ def manage_registration():
             circle_id = request.json.get('circle_id')
 
             if request.method == 'PUT':
-                cur.execute("""
-                            INSERT INTO circles_registrations(circle_id, user_id)
-                            VALUES (%s, %s)
-                            """, (circle_id, logged_in_user_id))
-                conn.commit()
+                # insert, count and commit in a single round trip
+                with conn.pipeline():
+                    execute(cur, 'circles.register', (circle_id, logged_in_user_id))
+                    execute(cur, 'circles.increment_registration_count', (circle_id,))
+                    conn.commit()
                 return jsonify({ 'status': 'ok', 'msg': 'successfully registered for circle' }), 200
             elif request.method == 'DELETE':
-                cur.execute("""
-                            DELETE FROM circles_registrations
-                            WHERE circle_id = %s AND user_id = %s
-                            """, (circle_id, logged_in_user_id))
+                execute(cur, 'circles.deregister', (circle_id, logged_in_user_id))
+
+                if cur.rowcount:
+                    execute(cur, 'circles.decrement_registration_count', (circle_id,))
                 conn.commit()
                 return jsonify({ 'status': 'ok', 'msg': 'successfully deregistered for circle' }), 200
     except:
         return jsonify({ 'status': 'error', 'msg': 'unable to manage registration'}), 400
 
+# Register a list of users at once (e.g. hosts importing attendees)
+@circles_bp.route('/registrations/bulk', methods=['PUT'])
+@jwt_required()
+def bulk_register_users():
+    try:
+        claims = get_jwt()
+        logged_in_user_id = claims['id']
+
+        conn = connect_db()
+
+        if not conn:
+            return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
+        
+        with conn.cursor() as cur:
+            circle_id = request.json.get('circle_id')
+            user_ids = [int(user_id) for user_id in request.json.get('user_ids', [])]
+
+            execute(cur, 'circles.get_circle_host', (circle_id,))
+            circle = cur.fetchone()
+
+            # check if logged_in_user is host
+            if not circle:
+                return jsonify({ 'status': 'error', 'msg': 'no circle found' }), 400
+            elif logged_in_user_id != circle['host_id']:
+                return jsonify({ 'status': 'error', 'msg': 'bulk registration unauthorized'}), 403
+
+            execute(cur, 'circles.bulk_register_users', (circle_id, user_ids, circle_id))
+            data = cur.fetchone()
+            conn.commit()
+        return jsonify({ 'status': 'ok', 'msg': 'successfully registered users for circle', 'data': data }), 200
+    except:
+        return jsonify({ 'status': 'error', 'msg': 'unable to register users'}), 400
+
 @circles_bp.route('/registrations', methods=['POST'])
 @jwt_required()
 def get_registered_users():
@@ -265,11 +388,7 @@ def get_registered_users():
         with conn.cursor() as cur:
             circle_id = request.json.get('circle_id')
 
-            cur.execute("""
-                        SELECT users.id, users.username FROM circles_registrations
-                        JOIN users ON circles_registrations.user_id = users.id
-                        WHERE circles_registrations.circle_id = %s
-                        """, (circle_id,))
+            execute(cur, 'circles.get_registered_users', (circle_id,))
             data = cur.fetchall()
         return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all registrations', 'data': data }), 200
     except:
@@ -277,6 +396,7 @@ def get_registered_users():
 
 @circles_bp.route('/registered', methods=['GET'])
 @jwt_required()
+@versioned_by('circles_registrations', 'circles', 'users', 'circle_tags')
 def get_registered_circles():
     try:
         claims = get_jwt()
@@ -287,16 +407,7 @@ def get_registered_circles():
         if not conn:
             return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
         
-        with conn.cursor() as cur:
-            cur.execute("""
-                        SELECT circles.*, users.username FROM circles_registrations
-                        JOIN circles ON circles_registrations.circle_id = circles.id
-                        JOIN users ON circles.host_id = users.id
-                        WHERE circles_registrations.user_id = %s
-                        ORDER BY circles.start_date
-                        """, (logged_in_user_id,))
-            data = cur.fetchall()
-        return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all circles registered for', 'data': data }), 200
+        return paginated_response(conn, *include_columns(QUERIES['circles.get_registered_circles'], (logged_in_user_id,)), 'successfully fetched all circles registered for')
     except:
         return jsonify({ 'status': 'error', 'msg': 'unable to get circles registered for'}), 400
 
@@ -313,10 +424,7 @@ def get_tags_by_circle():
 
             with conn.cursor() as cur:
                 circle_id = request.json.get('circle_id')
-                cur.execute("""
-                            SELECT tag FROM circle_tags
-                            WHERE circle_id = %s
-                            """, (circle_id,))
+                execute(cur, 'circles.get_tags_by_circle', (circle_id,))
                 results = cur.fetchall()
                 data = []
                 for tag in results:
@@ -329,20 +437,36 @@ def get_tags_by_circle():
 @jwt_required()
 def get_all_tags():
     try:
+        data = tag_catalogue.get(connect_db)
+        return jsonify({ 'status': 'ok', 'msg': 'succesfully fetched all tags', 'data': data }), 200
+    except:
+        return jsonify({ 'status': 'error', 'msg': 'unable to get all tags'}), 400
+
+# Circles with the given tags, e.g. /circles/by-tag?tags=MUSIC,COMEDY&match=all (default: any)
+@circles_bp.route('/by-tag')
+@jwt_required()
+def get_circles_by_tag():
+    try:
+        tags = [tag for tag in request.args.get('tags', '').split(',') if tag]
+        match_all = request.args.get('match') == 'all'
+
+        if not tags:
+            return jsonify({ 'status': 'error', 'msg': 'tags required'}), 400
+        elif set(tags) - set(tag_catalogue.get(connect_db)):
+            return jsonify({ 'status': 'error', 'msg': 'unknown tag(s)'}), 400
+
         conn = connect_db()
 
         if not conn:
             return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
-
-        with conn.cursor() as cur:
-            cur.execute("SELECT * FROM tags")
-            results = cur.fetchall()
-            data = []
-            for tag in results:
-                data.append(tag['tag'])
-        return jsonify({ 'status': 'ok', 'msg': 'succesfully fetched all tags', 'data': data }), 200
+        
+        if match_all:
+            query, params = QUERIES['circles.get_circles_by_all_tags'], (tags, len(set(tags)))
+        else:
+            query, params = QUERIES['circles.get_circles_by_any_tag'], (tags,)
+        return paginated_response(conn, *include_columns(query, params), 'successfully fetched circles by tag')
     except:
-        return jsonify({ 'status': 'error', 'msg': 'unable to get all tags'}), 400
+        return jsonify({ 'status': 'error', 'msg': 'unable to get circles by tag'}), 400
 
 @circles_bp.route('/tags', methods=['PUT', 'DELETE'])
 @jwt_required()
@@ -356,41 +480,39 @@ def manage_tags():
         if not conn:
             return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
         
-        with conn.cursor() as cur:
-            circle_id = request.json.get('circle_id')
-            cur.execute("""
-                        SELECT host_id FROM circles
-                        WHERE id = %s
-                        """, (circle_id,))
+        circle_id = request.json.get('circle_id')
+        # accepts either a single 'tag' or an array of 'tags'
+        tags = request.json.get('tags') or [request.json.get('tag')]
+
+        # the host lookup, the write (which only applies when the logged in user is host) and the
+        # commit go out in a single round trip
+        with conn.pipeline(), conn.cursor() as cur, conn.cursor() as write_cur:
+            execute(cur, 'circles.get_circle_host', (circle_id,))
+            if request.method == 'PUT':
+                execute(write_cur, 'circles.add_tags', (tags, circle_id, logged_in_user_id))
+            elif request.method == 'DELETE':
+                execute(write_cur, 'circles.delete_tags', (circle_id, tags, logged_in_user_id))
+            conn.commit()
             circle = cur.fetchone()
 
-            # check if logged_in_user is host
-            if not circle:
-                return jsonify({ 'status': 'error', 'msg': 'no circle found' }), 400
-            elif logged_in_user_id != circle['host_id']:
-                return jsonify({ 'status': 'error', 'msg': 'manage tag unauthorized'}), 403
-
-            tag = request.json.get('tag')
+        # check if logged_in_user is host
+        if not circle:
+            return jsonify({ 'status': 'error', 'msg': 'no circle found' }), 400
+        elif logged_in_user_id != circle['host_id']:
+            return jsonify({ 'status': 'error', 'msg': 'manage tag unauthorized'}), 403
 
-            if request.method == 'PUT':
-                # refactor to loop through an array for future enhancement
-                cur.execute("""
-                            INSERT INTO circle_tags(circle_id, tag)
-                            VALUES (%s, %s)
-                            """, (circle_id, tag))
-                conn.commit()
-                return jsonify({ 'status': 'ok', 'msg': 'tag(s) added' }), 200
-            elif request.method == 'DELETE':
-                cur.execute("""
-                            DELETE FROM circle_tags
-                            WHERE circle_id = %s AND tag = %s
-                            """, (circle_id, tag))
-                conn.commit()
-                return jsonify({ 'status': 'ok', 'msg': 'tag deleted'}), 200
+        if request.method == 'PUT':
+            return jsonify({ 'status': 'ok', 'msg': 'tag(s) added' }), 200
+        elif request.method == 'DELETE':
+            return jsonify({ 'status': 'ok', 'msg': 'tag(s) deleted'}), 200
     except:
         return jsonify({ 'status': 'error', 'msg': 'manage tag error'}), 400
 
 # Flags endpoints
+# circles reaching FLAG_HIDE_THRESHOLD flags are hidden from the public lists (0: never hidden)
+def get_flag_hide_threshold():
+    return current_app.config['FLAG_HIDE_THRESHOLD'] or None
+
 @circles_bp.route('/flags', methods=['PUT'])
 @jwt_required()
 def add_flag():
@@ -407,10 +529,8 @@ def add_flag():
             with conn.cursor() as cur:
                 circle_id = request.json.get('circle_id')
 
-                cur.execute("""
-                            INSERT INTO flags(circle_id, flag_user_id)
-                            VALUES (%s, %s)
-                            """, (circle_id, logged_in_user_id))
+                execute(cur, 'circles.add_flag', { 'circle_id': circle_id, 'user_id': logged_in_user_id,
+                                                   'threshold': get_flag_hide_threshold() })
                 conn.commit()
             return jsonify({ 'status': 'ok', 'msg': 'flag successfully created'}), 200
     except:
@@ -428,10 +548,7 @@ def get_flags_by_circle():
         with conn.cursor() as cur:
             circle_id = request.json.get('circle_id')
 
-            cur.execute("""
-                        SELECT * FROM flags
-                        WHERE circle_id = %s
-                        """, (circle_id,))
+            execute(cur, 'circles.get_flags_by_circle', (circle_id,))
             data = cur.fetchall()
         return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all flags', 'data': data }), 200
     except:
@@ -451,10 +568,8 @@ def delete_flag_by_user():
         
         with conn.cursor() as cur:
             circle_id = request.json.get('circle_id')
-            cur.execute("""
-                        DELETE FROM flags
-                        WHERE circle_id = %s AND flag_user_id = %s
-                        """, (circle_id,logged_in_user_id))
+            execute(cur, 'circles.delete_flag_by_user', { 'circle_id': circle_id, 'user_id': logged_in_user_id,
+                                                          'threshold': get_flag_hide_threshold() })
             conn.commit()
             return jsonify({ 'status': 'ok', 'msg': 'successfully deleted flag' }), 200
     except:
@@ -464,6 +579,12 @@ def delete_flag_by_user():
 @jwt_required()
 def manage_flags():
     try:
+        claims = get_jwt()
+
+        # the moderation queue and marking circles safe are admin only
+        if claims['role'] != 'admin':
+            return jsonify({ 'status': 'error', 'msg': 'unauthorized operation' }), 403
+
         conn = connect_db()
 
         if not conn:
@@ -471,21 +592,28 @@ def manage_flags():
         
         with conn.cursor() as cur:
             if request.method == 'GET':
-                cur.execute("""
-                            SELECT circles.*, users.username, COUNT(circles.id) AS flag_count FROM circles
-	                        JOIN flags ON flags.circle_id = circles.id
-                            JOIN users ON circles.host_id = users.id
-                            GROUP BY circles.id, users.username
-                            ORDER BY flag_count DESC
-                            """)
+                # moderation queue, most flagged and most recently flagged first, e.g. /circles/flags?limit=20&cursor=...
+                limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+                keyset = ''
+                params = { 'limit': limit + 1 }
+
+                if request.args.get('cursor'):
+                    keyset = FLAG_QUEUE_KEYSET
+                    params['flag_count'], last_flagged_date, params['id'] = decode_keyset(request.args.get('cursor'))
+                    params['last_flagged_date'] = datetime.fromisoformat(last_flagged_date)
+
+                execute(cur, 'circles.get_flagged_circles', params, keyset=keyset)
                 data = cur.fetchall()
-                return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all flagged circles', 'data': data }), 200
+
+                next_cursor = None
+                if len(data) > limit:
+                    data = data[:limit]
+                    next_cursor = encode_keyset(data[-1]['flag_count'], data[-1]['last_flagged_date'].isoformat(), data[-1]['id'])
+
+                return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all flagged circles', 'data': data, 'next_cursor': next_cursor }), 200
             elif request.method == 'DELETE':
                 circle_id = request.json.get('circle_id')
-                cur.execute("""
-                            DELETE FROM flags
-                            WHERE circle_id = %s
-                            """, (circle_id,))
+                execute(cur, 'circles.clear_flags', { 'circle_id': circle_id })
                 conn.commit()
                 return jsonify({ 'status': 'ok', 'msg': 'successfully deleted all flags relating to a circle' }), 200
     except:
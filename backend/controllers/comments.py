@@ -1,11 +1,20 @@
 from flask import Blueprint, jsonify, request
 from ..db import connect_db
-from flask_jwt_extended import jwt_required, get_jwt
+from ..pagination import encode_cursor, decode_cursor
+from ..events import publish_event
+from ..ownership import get_owned_row_result, update_owned_row, send_delete_owned_row
+from ..queries import execute, TREE_ANCHORS
+from flask_jwt_extended import get_jwt
+from ..instrumentation import jwt_required
 from ..validators.comments_validators import validate_comment_middleware
-from datetime import datetime
 
 comments_bp = Blueprint('comments', __name__, url_prefix='/comments')
 
+TREE_DEFAULT_DEPTH = 3
+TREE_MAX_DEPTH = 10
+TREE_DEFAULT_LIMIT = 20
+TREE_MAX_LIMIT = 100
+
 @comments_bp.route('/get', methods=['POST'])
 @jwt_required()
 def get_comments_by_thread():
@@ -17,16 +26,77 @@ def get_comments_by_thread():
         
         with conn.cursor() as cur:
             thread_id = request.json.get('thread_id')
-            cur.execute("""
-                        SELECT * FROM comments
-                        WHERE thread_id = %s
-                        ORDER BY parent_id, created_date;
-                        """, (thread_id,))
+            execute(cur, 'comments.get_comments_by_thread', (thread_id,))
             data = cur.fetchall()
         return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all comments by thread', 'data': data }), 200
     except:
         return jsonify({ 'status': 'error', 'msg': 'error fetching comments'}), 400
 
+# Nested comments: top-level comments of a thread (thread_id), replies to a comment (parent_id)
+# or a single comment's subtree (comment_id). Each level returns at most `limit` comments per parent,
+# down to `depth` levels, with a next_cursor per parent for loading more replies.
+@comments_bp.route('/tree', methods=['POST'])
+@jwt_required()
+def get_comment_tree():
+    try:
+        conn = connect_db()
+
+        if not conn:
+            return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
+        
+        thread_id = request.json.get('thread_id')
+        parent_id = request.json.get('parent_id')
+        comment_id = request.json.get('comment_id')
+        cursor = request.json.get('cursor')
+        depth = min(max(int(request.json.get('depth', TREE_DEFAULT_DEPTH)), 1), TREE_MAX_DEPTH)
+        limit = min(max(int(request.json.get('limit', TREE_DEFAULT_LIMIT)), 1), TREE_MAX_LIMIT)
+
+        if comment_id:
+            anchor, anchor_params = TREE_ANCHORS['comment'], [comment_id]
+        elif parent_id:
+            anchor, anchor_params = TREE_ANCHORS['parent'], [parent_id]
+        else:
+            anchor, anchor_params = TREE_ANCHORS['thread'], [thread_id]
+
+        if cursor and not comment_id:
+            anchor += TREE_ANCHORS['cursor']
+            anchor_params.extend(decode_cursor(cursor))
+
+        with conn.cursor() as cur:
+            # one extra comment is fetched per parent to detect more replies, but is never expanded
+            execute(cur, 'comments.get_comment_tree', (*anchor_params, limit + 1, limit + 1, depth, limit), anchor=anchor)
+            rows = cur.fetchall()
+
+        data, next_cursor = build_comment_tree(rows, limit)
+        return jsonify({ 'status': 'ok', 'msg': 'successfully fetched comment tree', 'data': data, 'next_cursor': next_cursor }), 200
+    except:
+        return jsonify({ 'status': 'error', 'msg': 'error fetching comment tree'}), 400
+
+def build_comment_tree(rows, limit):
+    roots = []
+    root_cursor = None
+    nodes = {}
+
+    for row in rows:
+        parent = nodes.get(row['parent_id']) if row['depth'] > 1 else None
+        siblings = parent['replies'] if parent else roots
+
+        # the extra sibling only signals that the parent has more replies to load
+        if row['sibling_rank'] > limit:
+            cursor = encode_cursor(siblings[-1], 'created_date')
+            if parent:
+                parent['next_cursor'] = cursor
+            else:
+                root_cursor = cursor
+            continue
+
+        del row['sibling_rank']
+        node = { **row, 'replies': [], 'next_cursor': None }
+        nodes[node['id']] = node
+        siblings.append(node)
+
+    return roots, root_cursor
+
 @comments_bp.route('/add', methods=['PUT'])
 @jwt_required()
 @validate_comment_middleware
@@ -44,10 +114,11 @@ def add_comment():
             author_id = claims['id']
             comment = request.json.get('comment')
 
-            cur.execute("""
-                        INSERT INTO comments(thread_id, parent_id, author_id, comment)
-                        VALUES (%s, %s, %s, %s)
-                        """, (thread_id, parent_id, author_id, comment))
+            execute(cur, 'comments.add_comment', (thread_id, parent_id, author_id, comment))
+            new_comment = cur.fetchone()
+
+            if new_comment:
+                publish_event(cur, new_comment['circle_id'], 'comment', new_comment)
             conn.commit()
         return jsonify({ 'status': 'ok', 'msg': 'comment added' }), 200
     except:
@@ -69,27 +140,16 @@ def edit_comment():
         with conn.cursor() as cur:
             comment_id = request.json.get('comment_id')
 
-            # check if thread exists
-            cur.execute("""
-                        SELECT * FROM comments
-                        WHERE id = %s
-                        """, (comment_id,))
-            comment_result = cur.fetchone()
+            # only the comment author or an admin may edit
+            found, comment = update_owned_row(cur, 'comments', comment_id, logged_in_user_id, {
+                'comment': request.json.get('comment') or None,
+            }, is_admin=logged_in_user_role == 'admin', assignments=['updated_date = NOW()'])
 
-            if not comment_result:
+            if not found:
                 return jsonify({ 'status': 'error', 'msg': 'comment does not exist' }), 404
-            
-            # check if logged in user is admin or thread author
-            if logged_in_user_id != comment_result['author_id'] and logged_in_user_role != 'admin':
+            elif not comment:
                 return jsonify({ 'status': 'error', 'msg': 'unauthorized operation' }), 404
-            
-            comment = request.json.get('comment') or comment_result['comment']
-            updated_date = datetime.now().strftime(f'%Y-%m-%d %H:%M:%S')
-            cur.execute("""
-                        UPDATE comments
-                        SET comment = %s, updated_date = %s
-                        WHERE id = %s
-                        """, (comment, updated_date, comment_id))
+
             conn.commit()
         return jsonify({ 'status': 'ok', 'msg': 'comment updated' }), 200
     except:
@@ -110,25 +170,18 @@ def delete_comment():
         with conn.cursor() as cur:
             comment_id = request.json.get('comment_id')
 
-            # check if thread exists
-            cur.execute("""
-                        SELECT * FROM comments
-                        WHERE id = %s
-                        """, (comment_id,))
-            comment = cur.fetchone()
+            # only the comment author or an admin may delete, so the delete is committed in the same
+            # round trip and the result checked afterwards
+            with conn.pipeline():
+                send_delete_owned_row(cur, 'comments', comment_id, logged_in_user_id,
+                                      is_admin=logged_in_user_role == 'admin')
+                conn.commit()
+                found, comment = get_owned_row_result(cur)
 
-            if not comment:
+            if not found:
                 return jsonify({ 'status': 'error', 'msg': 'comment does not exist' }), 404
-            
-            # check if logged in user is admin or thread author
-            if logged_in_user_id != comment['author_id'] and logged_in_user_role != 'admin':
+            elif not comment:
                 return jsonify({ 'status': 'error', 'msg': 'unauthorized operation' }), 404
-            
-            cur.execute("""
-                        DELETE FROM comments
-                        WHERE id = %s
-                        """, (comment_id,))
-            conn.commit()
         return jsonify({ 'status': 'ok', 'msg': 'comment deleted' }), 200
     except:
         return jsonify({ 'status': 'error', 'msg': 'error deleting comment'}), 400
\ No newline at end of file
@@ -1,6 +1,10 @@
 from flask import Blueprint, jsonify, request
 from ..db import connect_db
-from flask_jwt_extended import jwt_required, get_jwt
+from ..queries import execute
+from ..feed import backfill_follow, prune_follow
+from ..user_stats import adjust_user_stats
+from flask_jwt_extended import get_jwt
+from ..instrumentation import jwt_required
 
 follow_rs_bp = Blueprint('follow_rs', __name__, url_prefix='/user')
 
@@ -21,10 +25,10 @@ def add_follow_rs():
                 raise Exception('unable to connect to db')
             
             with conn.cursor() as cur:
-                cur.execute("""
-                            INSERT INTO follow_relationships(user_id, follower_id)
-                            VALUES (CAST(%s AS INTEGER), CAST(%s AS INTEGER))
-                            """, (user_id, follower_id))
+                execute(cur, 'follow_rs.add_follow', (user_id, follower_id))
+                backfill_follow(cur, user_id, follower_id)
+                adjust_user_stats(cur, user_id, followers=1)
+                adjust_user_stats(cur, follower_id, following=1)
                 conn.commit()
 
             return jsonify({ 'status': 'ok', 'msg': 'user follow relationship created'}), 200
@@ -51,10 +55,12 @@ def delete_follow_rs():
                 raise Exception('unable to connect to db')
             
             with conn.cursor() as cur:
-                cur.execute("""
-                            DELETE FROM follow_relationships
-                            WHERE user_id=CAST(%s AS INTEGER) AND follower_id=CAST(%s AS INTEGER)
-                            """, (user_id, follower_id))
+                execute(cur, 'follow_rs.delete_follow', (user_id, follower_id))
+
+                if cur.rowcount:
+                    prune_follow(cur, user_id, follower_id)
+                    adjust_user_stats(cur, user_id, followers=-1)
+                    adjust_user_stats(cur, follower_id, following=-1)
                 conn.commit()
 
             return jsonify({ 'status': 'ok', 'msg': 'user follow relationship deleted'}), 200
@@ -76,11 +82,7 @@ def get_followers():
                 raise Exception('unable to connect to db')
             
             with conn.cursor() as cur:
-                cur.execute("""
-                            SELECT users.id, users.username FROM users
-                            JOIN follow_relationships ON users.id = follow_relationships.follower_id
-                            WHERE follow_relationships.user_id = %s;
-                            """, (user_id,))
+                execute(cur, 'follow_rs.get_followers', (user_id,))
                 data = cur.fetchall()
 
             return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all followers', 'data': data }), 200
@@ -100,13 +102,32 @@ def get_following():
                 raise Exception('unable to connect to db')
             
             with conn.cursor() as cur:
-                cur.execute("""
-                            SELECT users.id, users.username FROM users
-                            JOIN follow_relationships ON users.id = follow_relationships.user_id
-                            WHERE follow_relationships.follower_id = %s;
-                            """, (follower_id,))
+                execute(cur, 'follow_rs.get_following', (follower_id,))
                 data = cur.fetchall()
 
             return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all accounts followed by user', 'data': data }), 200
     except:
-        return jsonify({ 'status': 'error', 'msg': 'error fetching all accounts followed by user' }), 400
\ No newline at end of file
+        return jsonify({ 'status': 'error', 'msg': 'error fetching all accounts followed by user' }), 400
+
+@follow_rs_bp.route('/profile-summary', methods=['POST'])
+@jwt_required()
+def get_profile_summary():
+    try:
+        if request.method == 'POST':
+            user_id = request.json.get('user_id')
+            
+            conn = connect_db()
+
+            if not conn:
+                raise Exception('unable to connect to db')
+            
+            with conn.cursor() as cur:
+                execute(cur, 'follow_rs.get_profile_summary', (user_id,))
+                data = cur.fetchone()
+
+                if not data:
+                    return jsonify({ 'status': 'error', 'msg': 'user does not exist' }), 404
+
+            return jsonify({ 'status': 'ok', 'msg': 'successfully fetched profile summary', 'data': data }), 200
+    except:
+        return jsonify({ 'status': 'error', 'msg': 'error fetching profile summary' }), 400
\ No newline at end of file
@@ -0,0 +1,39 @@
+import hmac
+from flask import Blueprint, Response, current_app, jsonify, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from ..db import get_pool_stats
+from ..instrumentation import request_metrics
+from ..events import event_hub
+from ..queries import prepared_statement_stats
+
+metrics_bp = Blueprint('metrics', __name__)
+
+def is_scraper():
+    token = current_app.config['METRICS_TOKEN']
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'),
+                                               f'Bearer {token}'.encode('utf-8'))
+
+# Prometheus scrape endpoint, per worker process. Open to admins, and to scrapers sending
+# METRICS_TOKEN as a bearer token when it is set.
+@metrics_bp.route('/metrics')
+def get_metrics():
+    if not is_scraper():
+        verify_jwt_in_request()
+        if get_jwt()['role'] != 'admin':
+            return jsonify({ 'status': 'error', 'msg': 'unauthorized operation' }), 403
+
+    lines = request_metrics.render()
+
+    lines.append('# HELP project4_db_pool Connection pool statistics')
+    lines.append('# TYPE project4_db_pool gauge')
+    for stat, value in sorted(get_pool_stats().items()):
+        lines.append(f'project4_db_pool{{stat="{stat}"}} {value}')
+
+    lines.append('# HELP project4_events Circle event stream subscribers and deliveries')
+    lines.append('# TYPE project4_events gauge')
+    for stat, value in sorted(event_hub.get_stats().items()):
+        lines.append(f'project4_events{{stat="{stat}"}} {value}')
+
+    lines.extend(prepared_statement_stats.render())
+
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
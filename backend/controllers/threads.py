@@ -1,13 +1,18 @@
 from flask import Blueprint, jsonify, request
 from ..db import connect_db
-from flask_jwt_extended import jwt_required, get_jwt
+from ..conditional import versioned_by
+from ..events import publish_event
+from ..queries import execute
+from ..ownership import get_owned_row_result, update_owned_row, send_delete_owned_row
+from flask_jwt_extended import get_jwt
+from ..instrumentation import jwt_required
 from ..validators.threads_validators import validate_thread_middleware
-from datetime import datetime
 
 threads_bp = Blueprint('threads', __name__, url_prefix='/threads')
 
-@threads_bp.route('/get', methods=['POST'])
+@threads_bp.route('/get', methods=['GET', 'POST'])
 @jwt_required()
+@versioned_by('threads')
 def get_threads_by_circle():
     try:
         conn = connect_db()
@@ -16,11 +21,9 @@ def get_threads_by_circle():
             return jsonify({ 'status': 'error', 'msg': 'cannot access db'}), 404
         
         with conn.cursor() as cur:
-            circle_id = request.json.get('circle_id')
-            cur.execute("""
-                        SELECT * FROM threads
-                        WHERE circle_id = %s
-                        """, (circle_id,))
+            # GET /threads/get?circle_id= supports conditional requests
+            circle_id = request.args.get('circle_id') if request.method == 'GET' else request.json.get('circle_id')
+            execute(cur, 'threads.get_threads_by_circle', (circle_id,))
             data = cur.fetchall()
         return jsonify({ 'status': 'ok', 'msg': 'successfully fetched all threads by circle', 'data': data }), 200
     except:
@@ -42,10 +45,8 @@ def add_thread():
             author_id = claims['id']
             title = request.json.get('title')
             
-            cur.execute("""
-                        INSERT INTO threads(circle_id, author_id, title)
-                        VALUES (%s, %s, %s)
-                        """, (circle_id, author_id, title))
+            execute(cur, 'threads.add_thread', (circle_id, author_id, title))
+            publish_event(cur, circle_id, 'thread', cur.fetchone())
             conn.commit()
         return jsonify({ 'status': 'ok', 'msg': 'thread added' }), 200
     except:
@@ -66,25 +67,18 @@ def delete_thread():
         with conn.cursor() as cur:
             thread_id = request.json.get('thread_id')
 
-            # check if thread exists
-            cur.execute("""
-                        SELECT * FROM threads
-                        WHERE id = %s
-                        """, (thread_id,))
-            thread = cur.fetchone()
+            # only the thread author or an admin may delete, so the delete is committed in the same
+            # round trip and the result checked afterwards
+            with conn.pipeline():
+                send_delete_owned_row(cur, 'threads', thread_id, logged_in_user_id,
+                                      is_admin=logged_in_user_role == 'admin')
+                conn.commit()
+                found, thread = get_owned_row_result(cur)
 
-            if not thread:
+            if not found:
                 return jsonify({ 'status': 'error', 'msg': 'thread does not exist' }), 404
-            
-            # check if logged in user is admin or thread author
-            if logged_in_user_id != thread['author_id'] and logged_in_user_role != 'admin':
+            elif not thread:
                 return jsonify({ 'status': 'error', 'msg': 'unauthorized operation' }), 404
-            
-            cur.execute("""
-                        DELETE FROM threads
-                        WHERE id = %s
-                        """, (thread_id,))
-            conn.commit()
         return jsonify({ 'status': 'ok', 'msg': 'thread deleted' }), 200
     except:
         return jsonify({ 'status': 'error', 'msg': 'error deleting thread'}), 400
@@ -105,27 +99,16 @@ def edit_thread():
         with conn.cursor() as cur:
             thread_id = request.json.get('thread_id')
 
-            # check if thread exists
-            cur.execute("""
-                        SELECT * FROM threads
-                        WHERE id = %s
-                        """, (thread_id,))
-            thread = cur.fetchone()
+            # only the thread author or an admin may edit
+            found, thread = update_owned_row(cur, 'threads', thread_id, logged_in_user_id, {
+                'title': request.json.get('title') or None,
+            }, is_admin=logged_in_user_role == 'admin', assignments=['updated_date = NOW()'])
 
-            if not thread:
+            if not found:
                 return jsonify({ 'status': 'error', 'msg': 'thread does not exist' }), 404
-            
-            # check if logged in user is admin or thread author
-            if logged_in_user_id != thread['author_id'] and logged_in_user_role != 'admin':
+            elif not thread:
                 return jsonify({ 'status': 'error', 'msg': 'unauthorized operation' }), 404
-            
-            title = request.json.get('title') or thread['title']
-            updated_date = datetime.now().strftime(f'%Y-%m-%d %H:%M:%S')
-            cur.execute("""
-                        UPDATE threads
-                        SET title = %s, updated_date = %s
-                        WHERE id = %s
-                        """, (title, updated_date, thread_id))
+
             conn.commit()
         return jsonify({ 'status': 'ok', 'msg': 'thread updated' }), 200
     except:
@@ -1,5 +1,65 @@
 import psycopg
 from psycopg.rows import dict_row
+from psycopg.pq import TransactionStatus
+from psycopg_pool import ConnectionPool, PoolTimeout
+from flask import g
+from .instrumentation import InstrumentedCursor, timed_phase
+from .slow_queries import init_slow_query_log
+from .queries import prepared_statement_stats
+
+pool = None
+
+def init_db(app):
+    global pool
+
+    prepare_threshold = app.config['DB_PREPARE_THRESHOLD']
+    prepared_max = app.config['DB_PREPARED_MAX']
+    prepared_statement_stats.configure(prepare_threshold, prepared_max)
+
+    # statements are prepared per connection, so each pooled connection keeps its own cache
+    def configure_connection(conn):
+        conn.prepared_max = prepared_max
+
+    pool = ConnectionPool(
+        app.config['DATABASE_URL'],
+        min_size=app.config['DB_POOL_MIN_SIZE'],
+        max_size=app.config['DB_POOL_MAX_SIZE'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        max_idle=app.config['DB_POOL_MAX_IDLE'],
+        kwargs={ 'row_factory': dict_row, 'cursor_factory': InstrumentedCursor, 'prepare_threshold': prepare_threshold },
+        configure=configure_connection,
+        check=ConnectionPool.check_connection,
+        name='project4'
+    )
+
+    init_slow_query_log(app, pool)
+
+    # return the borrowed connection to the pool at the end of every request
+    app.teardown_appcontext(close_db)
 
 def connect_db():
-    return psycopg.connect("dbname=project4 user=db_user", row_factory=dict_row)
\ No newline at end of file
+    # each request borrows at most one connection, reused by every call within the request
+    if 'db_conn' not in g:
+        try:
+            with timed_phase('connect'):
+                g.db_conn = pool.getconn()
+        except PoolTimeout:
+            return None
+    return g.db_conn
+
+def close_db(exception=None):
+    conn = g.pop('db_conn', None)
+
+    if conn is None:
+        return
+
+    release_transaction(conn)
+    pool.putconn(conn)
+
+# discard any transaction left open (or failed) by a handler so the connection can be reused
+def release_transaction(conn):
+    if conn.info.transaction_status != TransactionStatus.IDLE:
+        conn.rollback()
+
+def get_pool_stats():
+    return pool.get_stats()
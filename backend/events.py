@@ -0,0 +1,220 @@
+# Push channel for live circle state: writers queue events with pg_notify inside their transaction,
+# each worker's hub LISTENs once and fans events out to per-circle subscribers streamed over SSE.
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+import psycopg
+from .queries import execute
+from .serialization import encode_default
+
+EVENTS_CHANNEL = 'circle_events'
+EVENTS_RECONNECT_DELAY = 2
+SSE_RETRY_MS = 3000
+
+logger = logging.getLogger(__name__)
+
+# Events carry ids and small scalar state only: NOTIFY payloads must stay under 8000 bytes, while
+# titles, descriptions and comment bodies are unbounded. Clients refetch the row for the rest.
+EVENT_FIELDS = {
+    'circle': ['id', 'participants_limit', 'start_date', 'is_live', 'is_ended', 'auto_start', 'end_date',
+               'started_date', 'lifecycle'],
+    'thread': ['id', 'circle_id', 'author_id', 'created_date'],
+    'comment': ['id', 'thread_id', 'parent_id', 'author_id', 'created_date'],
+}
+
+# Queued from inside the writer's transaction: Postgres delivers it to the listener of every worker
+# only once the transaction commits, and drops it if it rolls back.
+def publish_event(cur, circle_id, event_type, data):
+    data = { field: data[field] for field in EVENT_FIELDS[event_type] if field in data }
+    payload = json.dumps({ 'circle_id': circle_id, 'type': event_type, 'data': data }, default=encode_default)
+    execute(cur, 'events.publish_event', (EVENTS_CHANNEL, payload))
+
+# Circle state events carry the whole state, so only the latest one per circle needs delivering;
+# thread and comment events are keyed by their id.
+def get_event_key(event):
+    if event['type'] == 'circle':
+        return 'circle'
+    return f"{event['type']}:{event['data'].get('id')}"
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], separators=(',', ':'))}\n\n"
+
+# Next chunk of the event stream: the pending events, a comment line to keep idle proxies from
+# closing the connection, and a final 'dropped' event once the subscriber has fallen behind
+def render_events(subscription, events):
+    chunk = ''.join(format_sse(event) for event in events) or ': keep-alive\n\n'
+    if subscription.dropped:
+        chunk += format_sse({ 'type': 'dropped', 'data': {} })
+    return chunk
+
+# One subscriber's queue of pending events. A new event for a key that is still pending replaces
+# it, and a subscriber with queue_size distinct keys pending is too slow and is dropped.
+class Subscription:
+    def __init__(self, circle_id, queue_size):
+        self.circle_id = circle_id
+        self.queue_size = queue_size
+        self.pending = OrderedDict()
+        self.dropped = False
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def offer(self, event):
+        key = get_event_key(event)
+        with self._condition:
+            if key in self.pending or len(self.pending) < self.queue_size:
+                self.pending[key] = event
+            else:
+                self.dropped = True
+            self._condition.notify()
+        self.wake()
+        return not self.dropped
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+        self.wake()
+
+    def wake(self):
+        pass
+
+    def drain(self):
+        with self._condition:
+            events = list(self.pending.values())
+            self.pending.clear()
+            return events
+
+    # blocks a worker thread until events arrive or timeout passes (WSGI streaming)
+    def wait(self, timeout):
+        with self._condition:
+            if not self.pending and not self.dropped and not self.closed:
+                self._condition.wait(timeout)
+        return self.drain()
+
+# Same queue, awaited on an event loop instead of holding a thread per subscriber (ASGI streaming)
+class AsyncSubscription(Subscription):
+    def __init__(self, circle_id, queue_size, loop):
+        super().__init__(circle_id, queue_size)
+        self.loop = loop
+        self._ready = asyncio.Event()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self._ready.set)
+
+    async def next(self, timeout):
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._ready.clear()
+        return self.drain()
+
+# Per-process fan-out of circle events. A single LISTEN connection per worker receives every
+# event and hands it to the subscribers of that circle's topic.
+class EventHub:
+    def __init__(self):
+        self.conninfo = None
+        self.queue_size = 100
+        self.heartbeat_interval = 15
+        self.topics = {}
+        self.delivered = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def configure(self, conninfo, queue_size, heartbeat_interval):
+        self.conninfo = conninfo
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+
+    def subscribe(self, circle_id, loop=None):
+        self.start()
+        if loop is None:
+            subscription = Subscription(circle_id, self.queue_size)
+        else:
+            subscription = AsyncSubscription(circle_id, self.queue_size, loop)
+
+        with self._lock:
+            self.topics.setdefault(circle_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self.topics.get(subscription.circle_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.topics[subscription.circle_id]
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self.topics.get(event['circle_id'], ()))
+
+        delivered, dropped = 0, []
+        for subscription in subscribers:
+            if subscription.offer(event):
+                delivered += 1
+            else:
+                dropped.append(subscription)
+
+        for subscription in dropped:
+            self.unsubscribe(subscription)
+        with self._lock:
+            self.delivered += delivered
+            self.dropped += len(dropped)
+
+    # events published while the listener was reconnecting are lost, so clients are told to refetch
+    def resync(self):
+        with self._lock:
+            circle_ids = list(self.topics)
+        for circle_id in circle_ids:
+            self.dispatch({ 'circle_id': circle_id, 'type': 'resync', 'data': {} })
+
+    def get_stats(self):
+        with self._lock:
+            subscribers = sum(len(subscribers) for subscribers in self.topics.values())
+            return { 'topics': len(self.topics), 'subscribers': subscribers,
+                     'delivered': self.delivered, 'dropped': self.dropped }
+
+    # the listener thread is started by the first subscriber, so scripts importing the app don't
+    # open a LISTEN connection
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self.listen, name='event-hub-listener', daemon=True)
+                self._listener.start()
+
+    def listen(self):
+        reconnecting = False
+        while True:
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True) as conn:
+                    conn.execute(f'LISTEN {EVENTS_CHANNEL}')
+                    if reconnecting:
+                        self.resync()
+                    for notify in conn.notifies():
+                        self.dispatch(json.loads(notify.payload))
+            except Exception:
+                logger.warning('event listener disconnected, reconnecting', exc_info=True)
+            reconnecting = True
+            time.sleep(EVENTS_RECONNECT_DELAY)
+
+event_hub = EventHub()
+
+def stream_events(subscription):
+    try:
+        yield f'retry: {SSE_RETRY_MS}\n\n'
+        # the last chunk of a dropped subscriber carries its pending events and the 'dropped' event
+        while not subscription.closed:
+            yield render_events(subscription, subscription.wait(event_hub.heartbeat_interval))
+            if subscription.dropped:
+                break
+    finally:
+        event_hub.unsubscribe(subscription)
+
+def init_events(app):
+    event_hub.configure(app.config['DATABASE_URL'], app.config['EVENTS_QUEUE_SIZE'],
+                        app.config['EVENTS_HEARTBEAT_INTERVAL'])
@@ -4,6 +4,27 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
+from flask import request
+# registers the mmap:// rate limit storage scheme
+from . import limiter_storage
+
+DEFAULT_LIMITS = ['1000 per 15 minutes']
+
+# Expensive routes use up the rate limit budget faster
+ENDPOINT_COSTS = {
+    'auth.login': 10,
+    'auth.register': 10,
+    'auth.register_admin': 10,
+    'circles.get_all_circles': 5,
+    'circles.search_circles': 3,
+    'batch.run_batch': 5,
+}
+
+def get_request_cost():
+    return get_endpoint_cost(request.endpoint)
+
+def get_endpoint_cost(endpoint):
+    return ENDPOINT_COSTS.get(endpoint, 1)
 
 cors = CORS(resources={r"/*": {
         "origins": "*",
@@ -16,8 +37,8 @@ cors = CORS(resources={r"/*": {
 talisman = Talisman()
 limiter = Limiter(
     get_remote_address,
-    default_limits=['1000 per 15 minutes'],
-    storage_uri='memory://'
+    default_limits=DEFAULT_LIMITS,
+    default_limits_cost=get_request_cost
 )
 jwt = JWTManager()
 bcrypt = Bcrypt()
\ No newline at end of file
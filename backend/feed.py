@@ -0,0 +1,95 @@
+# Fan-out-on-write for the "Following" feed: every circle is copied into the home_feed
+# of each follower of its host, so reading a feed is a single range scan on home_feed.
+import logging
+import os
+from datetime import timedelta
+import psycopg
+from psycopg.rows import dict_row
+from dotenv import load_dotenv
+from .queries import execute
+
+FANOUT_BATCH_SIZE = 1000
+# a fan-out still pending after this long is assumed to have failed rather than to be running
+FANOUT_RETRY_DELAY = timedelta(minutes=5)
+
+logger = logging.getLogger(__name__)
+
+# Claims the oldest stale pending fan-out not yet tried in this pass, so concurrent replays never
+# take the same circle and a failing one is not retried in a loop
+CLAIM_PENDING_FANOUT_QUERY = """
+    UPDATE pending_fanouts
+    SET attempts = attempts + 1, updated_date = CURRENT_TIMESTAMP
+    FROM circles
+    WHERE pending_fanouts.circle_id = (
+        SELECT circle_id FROM pending_fanouts
+        WHERE updated_date <= CURRENT_TIMESTAMP - %s AND circle_id <> ALL(%s)
+        ORDER BY updated_date
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ) AND circles.id = pending_fanouts.circle_id
+    RETURNING circles.id, circles.host_id, circles.start_date, pending_fanouts.last_follower_id
+"""
+
+# Runs in the transaction creating the circle, so the fan-out is on record before it starts
+def add_pending_fanout(cur, circle_id):
+    execute(cur, 'feed.add_pending_fanout', (circle_id,))
+
+# Called after the circle itself is committed. Followers are processed in batches keyed on
+# follower_id, committing between batches so hosts with many followers never hold a long
+# transaction. A follow made in the meantime is covered by backfill_follow(). The pending
+# fan-out row is advanced with each batch and removed with the last one.
+def fan_out_circle(conn, circle, last_follower_id=0):
+    while True:
+        with conn.cursor() as cur:
+            execute(cur, 'feed.fan_out_circle', (circle['host_id'], last_follower_id, FANOUT_BATCH_SIZE,
+                                                 circle['id'], circle['host_id'], circle['start_date']))
+            result = cur.fetchone()
+
+            done = result['batch_size'] < FANOUT_BATCH_SIZE
+            if done:
+                execute(cur, 'feed.delete_pending_fanout', (circle['id'],))
+            else:
+                last_follower_id = result['last_follower_id']
+                execute(cur, 'feed.advance_pending_fanout', (last_follower_id, circle['id']))
+        conn.commit()
+
+        if done:
+            break
+
+# Resumes fan-outs that failed or were interrupted, from the last follower they reached
+def replay_pending_fanouts(conn, retry_delay=FANOUT_RETRY_DELAY):
+    replayed = 0
+    tried = []
+
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(CLAIM_PENDING_FANOUT_QUERY, (retry_delay, tried))
+            pending = cur.fetchone()
+        conn.commit()
+
+        if pending is None:
+            return replayed
+        tried.append(pending['id'])
+
+        try:
+            fan_out_circle(conn, pending, pending['last_follower_id'])
+            replayed += 1
+        except Exception:
+            conn.rollback()
+            logger.warning('home feed fan-out replay failed for circle %s', pending['id'], exc_info=True)
+
+# Both run in the caller's transaction, alongside the follow_relationships change
+def backfill_follow(cur, user_id, follower_id):
+    execute(cur, 'feed.backfill_follow', (follower_id, user_id))
+
+def prune_follow(cur, user_id, follower_id):
+    execute(cur, 'feed.prune_follow', (follower_id, user_id))
+
+def update_circle_start_date(cur, circle_id, start_date):
+    execute(cur, 'feed.update_circle_start_date', (start_date, circle_id, start_date))
+
+if __name__ == '__main__':
+    load_dotenv()
+    with psycopg.connect(os.getenv('DATABASE_URL') or 'dbname=project4 user=db_user', row_factory=dict_row) as conn:
+        replayed = replay_pending_fanouts(conn, timedelta(0))
+    print(f'replayed home feed fan-out for {replayed} circles')
@@ -0,0 +1,145 @@
+# Per-request timing instrumentation: phase timings (jwt, validation, connect, sql, serialize, compress),
+# per-query durations and row counts, a Server-Timing header on every response and in-process
+# latency histograms per endpoint rendered in Prometheus text format by /metrics.
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+import psycopg
+from flask import current_app, has_request_context, request
+from flask_jwt_extended import verify_jwt_in_request
+from .slow_queries import slow_query_log
+from .queries import prepared_statement_stats
+
+PHASES = ['jwt', 'validation', 'connect', 'sql', 'serialize', 'compress']
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+# Stored on the WSGI environ rather than flask.g, since /batch sub-requests share the app context
+def get_request_timings():
+    if not has_request_context():
+        return None
+    return request.environ.setdefault('project4.timings', { 'phases': dict.fromkeys(PHASES, 0.0), 'queries': [] })
+
+@contextmanager
+def timed_phase(phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = get_request_timings()
+        if timings is not None:
+            timings['phases'][phase] += time.perf_counter() - started
+
+# flask_jwt_extended.jwt_required, with the token verification timed as the request's 'jwt' phase.
+# Takes the same options, e.g. @jwt_required(refresh=True)
+def jwt_required(**options):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            with timed_phase('jwt'):
+                verify_jwt_in_request(**options)
+            return current_app.ensure_sync(f)(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+# Cursor used by pooled connections: times every execute, records its row count and whether it
+# reused a prepared statement
+class InstrumentedCursor(psycopg.Cursor):
+    def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            duration = time.perf_counter() - started
+            timings = get_request_timings()
+            if timings is not None:
+                timings['phases']['sql'] += duration
+                timings['queries'].append({ 'duration': duration, 'rows': self.rowcount })
+                slow_query_log.observe(self, query, params, duration, request.endpoint)
+                prepared_statement_stats.observe(self.connection, query, request.endpoint)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.phases = {}
+        self.queries = {}
+        self.rows = {}
+
+    def observe(self, endpoint, status, duration, timings):
+        with self._lock:
+            key = (endpoint, status)
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.latency[key].observe(duration)
+
+            for phase, phase_duration in timings['phases'].items():
+                self.phases[(endpoint, phase)] = self.phases.get((endpoint, phase), 0.0) + phase_duration
+            self.queries[endpoint] = self.queries.get(endpoint, 0) + len(timings['queries'])
+            self.rows[endpoint] = self.rows.get(endpoint, 0) + sum(max(query['rows'], 0) for query in timings['queries'])
+
+    def render(self):
+        lines = [
+            '# HELP project4_request_duration_seconds Request latency by endpoint',
+            '# TYPE project4_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            for (endpoint, status), histogram in sorted(self.latency.items()):
+                labels = f'endpoint="{endpoint}",status="{status}"'
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'project4_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'project4_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'project4_request_duration_seconds_sum{{{labels}}} {histogram.sum}')
+                lines.append(f'project4_request_duration_seconds_count{{{labels}}} {histogram.count}')
+
+            lines.append('# HELP project4_request_phase_seconds_total Time spent per request phase by endpoint')
+            lines.append('# TYPE project4_request_phase_seconds_total counter')
+            for (endpoint, phase), total in sorted(self.phases.items()):
+                lines.append(f'project4_request_phase_seconds_total{{endpoint="{endpoint}",phase="{phase}"}} {total}')
+
+            lines.append('# HELP project4_db_queries_total Queries executed by endpoint')
+            lines.append('# TYPE project4_db_queries_total counter')
+            for endpoint, total in sorted(self.queries.items()):
+                lines.append(f'project4_db_queries_total{{endpoint="{endpoint}"}} {total}')
+
+            lines.append('# HELP project4_db_rows_total Rows returned or affected by endpoint')
+            lines.append('# TYPE project4_db_rows_total counter')
+            for endpoint, total in sorted(self.rows.items()):
+                lines.append(f'project4_db_rows_total{{endpoint="{endpoint}"}} {total}')
+        return lines
+
+request_metrics = RequestMetrics()
+
+def before_request():
+    request.environ['project4.started'] = time.perf_counter()
+    get_request_timings()
+
+def after_request(response):
+    timings = get_request_timings()
+    duration = time.perf_counter() - request.environ.get('project4.started', time.perf_counter())
+
+    server_timing = [f'{phase};dur={timings["phases"][phase] * 1000:.2f}' for phase in PHASES]
+    server_timing.append(f'queries;desc="{len(timings["queries"])}"')
+    server_timing.append(f'total;dur={duration * 1000:.2f}')
+    response.headers['Server-Timing'] = ', '.join(server_timing)
+
+    request_metrics.observe(request.endpoint or 'unmatched', response.status_code, duration, timings)
+    return response
+
+def init_instrumentation(app):
+    app.before_request(before_request)
+    app.after_request(after_request)
@@ -0,0 +1,211 @@
+# Scheduled circle lifecycle. Every worker keeps a heap of upcoming due times (start dates of
+# auto_start circles, end dates of live circles, archive deadlines of circles that never started)
+# and sleeps until the earliest one. When it is due, the transitions are applied set-based in
+# batches under a transaction-level advisory lock, so with several workers one applies them and
+# the others skip, and each changed circle is pushed to its subscribers as a 'circle' event.
+# Every refresh also replays pending home feed fan-outs (see feed.py).
+# One pass can also be run from cron: python -m backend.lifecycle
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+import psycopg
+from psycopg.rows import dict_row
+from dotenv import load_dotenv
+from . import db
+from .events import publish_event
+from .feed import replay_pending_fanouts
+
+LIFECYCLE_LOCK_ID = 40220001
+LIFECYCLE_COLUMNS = 'id, start_date, is_live, is_ended, auto_start, end_date, started_date'
+
+logger = logging.getLogger(__name__)
+
+# Circles due for each transition
+LIFECYCLE_CONDITIONS = {
+    'live': "NOT is_live AND NOT is_ended AND auto_start AND start_date <= NOW()",
+    'ended': "is_live AND NOT is_ended AND COALESCE(end_date, COALESCE(started_date, start_date) + %(max_live)s) <= NOW()",
+    'archived': "NOT is_live AND NOT is_ended AND started_date IS NULL AND start_date <= NOW() - %(grace)s",
+}
+
+LIFECYCLE_UPDATES = {
+    'live': "SET is_live = true, started_date = COALESCE(started_date, NOW())",
+    'ended': "SET is_live = false, is_ended = true",
+    'archived': "SET is_ended = true",
+}
+
+LIFECYCLE_TRANSITIONS = {
+    lifecycle: f"""
+                UPDATE circles
+                {LIFECYCLE_UPDATES[lifecycle]}
+                WHERE id IN (
+                    SELECT id FROM circles
+                    WHERE {condition}
+                    ORDER BY start_date, id
+                    LIMIT %(batch_size)s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {LIFECYCLE_COLUMNS}
+                """
+    for lifecycle, condition in LIFECYCLE_CONDITIONS.items()
+}
+
+# Which transitions have due circles, checked before taking the lock so that a pass with nothing
+# due only reads (the UPDATEs would take row locks and write circles even when matching no rows)
+LIFECYCLE_PENDING_QUERY = 'SELECT ' + ', '.join(f"EXISTS (SELECT 1 FROM circles WHERE {condition}) AS {lifecycle}"
+                                                for lifecycle, condition in LIFECYCLE_CONDITIONS.items())
+
+# Seconds from now until each upcoming transition within the horizon, computed by the database
+# so the heap does not depend on the worker's clock or timezone
+LIFECYCLE_DUE_QUERY = """
+                      SELECT EXTRACT(EPOCH FROM due - NOW()) AS delay FROM (
+                          SELECT start_date AS due FROM circles
+                          WHERE NOT is_live AND NOT is_ended AND auto_start AND start_date <= NOW() + %(horizon)s
+                          UNION
+                          SELECT start_date + %(grace)s FROM circles
+                          WHERE NOT is_live AND NOT is_ended AND NOT auto_start AND started_date IS NULL
+                                AND start_date <= NOW() + %(horizon)s - %(grace)s
+                          UNION
+                          SELECT COALESCE(end_date, COALESCE(started_date, start_date) + %(max_live)s) FROM circles
+                          WHERE is_live AND NOT is_ended
+                      ) due_dates
+                      WHERE due <= NOW() + %(horizon)s
+                      ORDER BY due
+                      LIMIT %(heap_size)s
+                      """
+
+# Applies every due transition in batches of batch_size. Returns the number of circles changed,
+# or None when another worker holds the lock.
+def apply_transitions(conn, batch_size, max_live, grace):
+    params = { 'batch_size': batch_size, 'max_live': max_live, 'grace': grace }
+    changed = 0
+
+    with conn.cursor() as cur:
+        cur.execute(LIFECYCLE_PENDING_QUERY, params)
+        pending = cur.fetchone()
+    conn.commit()
+
+    for lifecycle, query in LIFECYCLE_TRANSITIONS.items():
+        if not pending[lifecycle]:
+            continue
+
+        while True:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_xact_lock(%s) AS acquired", (LIFECYCLE_LOCK_ID,))
+                if not cur.fetchone()['acquired']:
+                    conn.rollback()
+                    return None
+
+                cur.execute(query, params)
+                circles = cur.fetchall()
+                for circle in circles:
+                    # a failed notify only loses that event, never the batch of transitions
+                    try:
+                        with conn.transaction():
+                            publish_event(cur, circle['id'], 'circle', { **circle, 'lifecycle': lifecycle })
+                    except Exception:
+                        logger.warning('circle lifecycle: %s event for circle %s not published', lifecycle,
+                                       circle['id'], exc_info=True)
+            conn.commit()
+
+            changed += len(circles)
+            if len(circles) < batch_size:
+                break
+    return changed
+
+class LifecycleScheduler:
+    def __init__(self):
+        self.get_conn = None
+        self.batch_size = 500
+        self.max_live = timedelta(hours=6)
+        self.grace = timedelta(hours=24)
+        self.refresh_interval = 30
+        self.heap_size = 1000
+        self.due = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def configure(self, get_conn, batch_size, max_live, grace, refresh_interval):
+        self.get_conn = get_conn
+        self.batch_size = batch_size
+        self.max_live = max_live
+        self.grace = grace
+        self.refresh_interval = refresh_interval
+
+    # due times are reloaded every refresh_interval, so a circle created or rescheduled to start
+    # sooner than that is picked up at most refresh_interval late
+    def refresh(self, conn):
+        with conn.cursor() as cur:
+            cur.execute(LIFECYCLE_DUE_QUERY, { 'horizon': timedelta(seconds=self.refresh_interval * 2),
+                                               'grace': self.grace, 'max_live': self.max_live,
+                                               'heap_size': self.heap_size })
+            now = time.monotonic()
+            due = [now + max(float(row['delay']), 0) for row in cur.fetchall()]
+        conn.commit()
+
+        heapq.heapify(due)
+        self.due = due
+
+    def run_due(self, conn):
+        now = time.monotonic()
+        if not self.due or self.due[0] > now:
+            return
+        while self.due and self.due[0] <= now:
+            heapq.heappop(self.due)
+
+        changed = apply_transitions(conn, self.batch_size, self.max_live, self.grace)
+        if changed:
+            logger.info('circle lifecycle: %s circles changed', changed)
+
+    def run(self):
+        next_refresh = 0
+        while True:
+            try:
+                with self.get_conn() as conn:
+                    if time.monotonic() >= next_refresh:
+                        # applies anything that fell due while no worker was running
+                        self.refresh(conn)
+                        heapq.heappush(self.due, time.monotonic())
+                        replayed = replay_pending_fanouts(conn)
+                        if replayed:
+                            logger.info('home feed: replayed fan-out for %s circles', replayed)
+                        next_refresh = time.monotonic() + self.refresh_interval
+                    self.run_due(conn)
+            except Exception:
+                logger.warning('circle lifecycle pass failed', exc_info=True)
+
+            next_due = self.due[0] if self.due else next_refresh
+            time.sleep(max(min(next_due, next_refresh) - time.monotonic(), 0))
+
+    # started by the first request, so scripts importing the app don't run the scheduler
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='circle-lifecycle', daemon=True)
+                self._thread.start()
+
+lifecycle_scheduler = LifecycleScheduler()
+
+def init_lifecycle_scheduler(app):
+    lifecycle_scheduler.configure(lambda: db.pool.connection(), app.config['LIFECYCLE_BATCH_SIZE'],
+                                  timedelta(hours=app.config['LIFECYCLE_MAX_LIVE_HOURS']),
+                                  timedelta(hours=app.config['LIFECYCLE_ARCHIVE_GRACE_HOURS']),
+                                  app.config['LIFECYCLE_REFRESH_INTERVAL'])
+
+    if app.config['LIFECYCLE_SCHEDULER_ENABLED']:
+        app.before_request(lifecycle_scheduler.start)
+
+if __name__ == '__main__':
+    load_dotenv()
+    with psycopg.connect(os.getenv('DATABASE_URL') or 'dbname=project4 user=db_user', row_factory=dict_row) as conn:
+        changed = apply_transitions(conn, int(os.getenv('LIFECYCLE_BATCH_SIZE') or 500),
+                                    timedelta(hours=float(os.getenv('LIFECYCLE_MAX_LIVE_HOURS') or 6)),
+                                    timedelta(hours=float(os.getenv('LIFECYCLE_ARCHIVE_GRACE_HOURS') or 24)))
+    if changed is None:
+        print('another worker is applying circle lifecycle transitions')
+    else:
+        print(f'circle lifecycle: {changed} circles changed')
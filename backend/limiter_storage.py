@@ -0,0 +1,135 @@
+# flask-limiter storage shared by every worker process on a host through a memory-mapped file,
+# selected with RATELIMIT_STORAGE_URI=mmap:///path/to/file. Counters live in a fixed-size open
+# addressing table, so memory stays bounded however many client addresses are seen: expired slots
+# are reused and, when a key's probe window is full, the slot closest to expiry is evicted.
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+from limits.storage import Storage
+
+SLOT = struct.Struct('<QQd')  # key hash, counter, expiry (epoch seconds)
+DEFAULT_SLOTS = 65536
+PROBE_LIMIT = 32
+
+class MmapStorage(Storage):
+    STORAGE_SCHEME = ['mmap']
+
+    def __init__(self, uri, wrap_exceptions=False, slots=DEFAULT_SLOTS, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = urlparse(uri).path or '/tmp/project4-ratelimit'
+        self.slots = int(slots)
+        self.size = self.slots * SLOT.size
+        self._thread_lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    # flock is tied to the open file description, so every process (including forked workers)
+    # needs its own descriptor for the lock to exclude the others
+    def _ensure_open(self):
+        if self._pid == os.getpid():
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < self.size:
+                os.ftruncate(fd, self.size)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self.size)
+        self._pid = os.getpid()
+
+    def _locked(self, fn, *args):
+        with self._thread_lock:
+            self._ensure_open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                return fn(*args)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _key_hash(self, key):
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+    def _read(self, slot):
+        return SLOT.unpack_from(self._map, slot * SLOT.size)
+
+    def _write(self, slot, key_hash, count, expiry):
+        SLOT.pack_into(self._map, slot * SLOT.size, key_hash, count, expiry)
+
+    def _probe(self, key_hash):
+        start = key_hash % self.slots
+        return [(start + offset) % self.slots for offset in range(PROBE_LIMIT)]
+
+    def _find(self, key_hash, now):
+        for slot in self._probe(key_hash):
+            slot_hash, count, expiry = self._read(slot)
+            if slot_hash == key_hash and expiry > now:
+                return slot, count, expiry
+        return None, 0, now
+
+    def _incr(self, key, expiry, elastic_expiry, amount):
+        key_hash = self._key_hash(key)
+        now = time.time()
+        candidate = None
+        candidate_expiry = None
+
+        for slot in self._probe(key_hash):
+            slot_hash, count, slot_expiry = self._read(slot)
+            if slot_hash == key_hash:
+                if slot_expiry <= now:
+                    count, slot_expiry = 0, now + expiry
+                count += amount
+                if elastic_expiry:
+                    slot_expiry = now + expiry
+                self._write(slot, key_hash, count, slot_expiry)
+                return count
+            # free or expired slots first, otherwise the one expiring soonest
+            if candidate_expiry is None or slot_expiry < candidate_expiry:
+                candidate, candidate_expiry = slot, slot_expiry
+
+        self._write(candidate, key_hash, amount, now + expiry)
+        return amount
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        return self._locked(self._incr, key, expiry, elastic_expiry, amount)
+
+    def get(self, key):
+        return self._locked(lambda: self._find(self._key_hash(key), time.time())[1])
+
+    def get_expiry(self, key):
+        return self._locked(lambda: self._find(self._key_hash(key), time.time())[2])
+
+    def check(self):
+        try:
+            self._locked(lambda: None)
+            return True
+        except OSError:
+            return False
+
+    def _clear(self, key):
+        slot, _, _ = self._find(self._key_hash(key), time.time())
+        if slot is not None:
+            self._write(slot, 0, 0, 0)
+
+    def clear(self, key):
+        self._locked(self._clear, key)
+
+    def _reset(self):
+        cleared = sum(1 for slot in range(self.slots) if self._read(slot)[0])
+        self._map[:] = bytes(self.size)
+        return cleared
+
+    def reset(self):
+        return self._locked(self._reset)
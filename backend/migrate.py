@@ -0,0 +1,49 @@
+# Applies pending schema migrations in backend/migrations, in filename order.
+# Run after project4_sql_create_file.sql: python -m backend.migrate
+import os
+import psycopg
+from dotenv import load_dotenv
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+
+def get_migrations():
+    return sorted(filename for filename in os.listdir(MIGRATIONS_DIR) if filename.endswith('.sql'))
+
+def migrate(conninfo):
+    applied_now = []
+
+    with psycopg.connect(conninfo) as conn:
+        conn.execute("""
+                     CREATE TABLE IF NOT EXISTS schema_migrations (
+                         version varchar(255) PRIMARY KEY NOT NULL,
+                         applied_date timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+                     )
+                     """)
+        conn.commit()
+
+        applied = { row[0] for row in conn.execute("SELECT version FROM schema_migrations") }
+        conn.commit()
+
+        for version in get_migrations():
+            if version in applied:
+                continue
+
+            with open(os.path.join(MIGRATIONS_DIR, version)) as f:
+                sql = f.read()
+
+            # each migration is applied atomically together with its schema_migrations row
+            with conn.transaction():
+                conn.execute(sql)
+                conn.execute("INSERT INTO schema_migrations(version) VALUES (%s)", (version,))
+            applied_now.append(version)
+
+    return applied_now
+
+if __name__ == '__main__':
+    load_dotenv()
+    applied_now = migrate(os.getenv('DATABASE_URL') or 'dbname=project4 user=db_user')
+
+    for version in applied_now:
+        print(f'applied {version}')
+    if not applied_now:
+        print('database is up to date')
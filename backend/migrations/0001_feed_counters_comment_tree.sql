@@ -0,0 +1,38 @@
+-- Registration counter on circles, kept up to date by /circles/register and /circles/registrations/bulk
+ALTER TABLE circles ADD COLUMN IF NOT EXISTS registration_count int NOT NULL DEFAULT 0;
+
+UPDATE circles
+SET registration_count = counts.registration_count
+FROM (
+	SELECT circle_id, COUNT(*) AS registration_count FROM circles_registrations
+	GROUP BY circle_id
+) counts
+WHERE circles.id = counts.circle_id;
+
+-- Explore carousel: upcoming circles ranked by circles.registration_count
+CREATE INDEX IF NOT EXISTS circles_upcoming_popularity_idx ON circles(registration_count DESC, start_date)
+	WHERE NOT is_live AND NOT is_ended;
+
+-- Comment tree levels are read in (created_date, id) order per parent by /comments/tree
+CREATE INDEX IF NOT EXISTS comments_thread_root_idx ON comments(thread_id, created_date, id) WHERE parent_id IS NULL;
+CREATE INDEX IF NOT EXISTS comments_parent_idx ON comments(parent_id, created_date, id);
+
+-- Precomputed "Following" feed, populated on write by backend/feed.py
+CREATE TABLE IF NOT EXISTS home_feed (
+	user_id int NOT NULL,
+	circle_id int NOT NULL,
+	host_id int NOT NULL,
+	start_date timestamp NOT NULL,
+	PRIMARY KEY (user_id, start_date, circle_id),
+	CONSTRAINT fk_user_id FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+	CONSTRAINT fk_circle_id FOREIGN KEY(circle_id) REFERENCES circles(id) ON DELETE CASCADE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS home_feed_user_circle_idx ON home_feed(user_id, circle_id);
+CREATE INDEX IF NOT EXISTS home_feed_circle_idx ON home_feed(circle_id);
+CREATE INDEX IF NOT EXISTS home_feed_user_host_idx ON home_feed(user_id, host_id);
+
+INSERT INTO home_feed(user_id, circle_id, host_id, start_date)
+SELECT follow_relationships.follower_id, circles.id, circles.host_id, circles.start_date FROM circles
+JOIN follow_relationships ON follow_relationships.user_id = circles.host_id
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,26 @@
+-- Indexes for the lookups made by the controllers (primary keys only cover the leading column)
+
+-- auth: login / duplicate checks by username or email
+CREATE INDEX IF NOT EXISTS users_username_idx ON users(username);
+CREATE INDEX IF NOT EXISTS users_email_idx ON users(email);
+
+-- follow_rs: accounts followed by a user
+CREATE INDEX IF NOT EXISTS follow_relationships_follower_idx ON follow_relationships(follower_id, user_id);
+
+-- circles: keyset pages of all circles and of a host's circles
+CREATE INDEX IF NOT EXISTS circles_start_date_idx ON circles(start_date, id);
+CREATE INDEX IF NOT EXISTS circles_host_start_date_idx ON circles(host_id, start_date, id);
+
+-- circles: live and upcoming sections of Explore
+CREATE INDEX IF NOT EXISTS circles_live_idx ON circles(start_date, id) WHERE is_live AND NOT is_ended;
+CREATE INDEX IF NOT EXISTS circles_upcoming_idx ON circles(start_date, id) WHERE NOT is_live AND NOT is_ended;
+
+-- circles: registrations of a circle
+CREATE INDEX IF NOT EXISTS circles_registrations_circle_idx ON circles_registrations(circle_id, user_id);
+
+-- circles: circles with a tag
+CREATE INDEX IF NOT EXISTS circle_tags_tag_idx ON circle_tags(tag, circle_id);
+
+-- threads and comments of a circle / thread
+CREATE INDEX IF NOT EXISTS threads_circle_idx ON threads(circle_id);
+CREATE INDEX IF NOT EXISTS comments_thread_idx ON comments(thread_id, parent_id, created_date);
@@ -0,0 +1,17 @@
+-- Per-user counters shown on the profile page, maintained by the follow and circle add/delete paths
+CREATE TABLE IF NOT EXISTS user_stats (
+	user_id int NOT NULL,
+	circles_hosted int NOT NULL DEFAULT 0,
+	followers int NOT NULL DEFAULT 0,
+	following int NOT NULL DEFAULT 0,
+	PRIMARY KEY (user_id),
+	CONSTRAINT fk_user_id FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+INSERT INTO user_stats(user_id, circles_hosted, followers, following)
+SELECT users.id,
+	(SELECT COUNT(*) FROM circles WHERE circles.host_id = users.id),
+	(SELECT COUNT(*) FROM follow_relationships WHERE follow_relationships.user_id = users.id),
+	(SELECT COUNT(*) FROM follow_relationships WHERE follow_relationships.follower_id = users.id)
+FROM users
+ON CONFLICT (user_id) DO NOTHING;
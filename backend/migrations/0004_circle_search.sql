@@ -0,0 +1,35 @@
+-- Full-text search over circle title, description and host username for /circles/search.
+-- Kept out of circles itself so that circles.* payloads don't carry the tsvector.
+CREATE TABLE IF NOT EXISTS circle_search (
+	circle_id int NOT NULL,
+	search_vector tsvector NOT NULL,
+	PRIMARY KEY (circle_id),
+	CONSTRAINT fk_circle_id FOREIGN KEY(circle_id) REFERENCES circles(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS circle_search_vector_idx ON circle_search USING GIN (search_vector);
+
+CREATE OR REPLACE FUNCTION circle_search_vector(title text, description text, username text) RETURNS tsvector AS $$
+	SELECT setweight(to_tsvector('english', COALESCE(title, '')), 'A') ||
+		setweight(to_tsvector('simple', COALESCE(username, '')), 'B') ||
+		setweight(to_tsvector('english', COALESCE(description, '')), 'C');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION circle_search_update() RETURNS trigger AS $$
+BEGIN
+	INSERT INTO circle_search(circle_id, search_vector)
+	SELECT NEW.id, circle_search_vector(NEW.title, NEW.description, users.username) FROM users
+	WHERE users.id = NEW.host_id
+	ON CONFLICT (circle_id) DO UPDATE SET search_vector = EXCLUDED.search_vector;
+	RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS circle_search_trigger ON circles;
+CREATE TRIGGER circle_search_trigger AFTER INSERT OR UPDATE OF title, description, host_id ON circles
+	FOR EACH ROW EXECUTE FUNCTION circle_search_update();
+
+INSERT INTO circle_search(circle_id, search_vector)
+SELECT circles.id, circle_search_vector(circles.title, circles.description, users.username) FROM circles
+JOIN users ON circles.host_id = users.id
+ON CONFLICT (circle_id) DO NOTHING;
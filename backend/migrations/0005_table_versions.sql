@@ -0,0 +1,23 @@
+-- Version stamps bumped by a statement-level trigger whenever a tracked table changes,
+-- so in-process caches can tell whether their copy is still current with a single row lookup
+CREATE TABLE IF NOT EXISTS table_versions (
+	table_name varchar(63) NOT NULL,
+	version bigint NOT NULL DEFAULT 1,
+	updated_date timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+	PRIMARY KEY (table_name)
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+	INSERT INTO table_versions(table_name) VALUES (TG_TABLE_NAME)
+	ON CONFLICT (table_name) DO UPDATE
+	SET version = table_versions.version + 1, updated_date = CURRENT_TIMESTAMP;
+	RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+INSERT INTO table_versions(table_name) VALUES ('tags') ON CONFLICT DO NOTHING;
+
+DROP TRIGGER IF EXISTS tags_version_trigger ON tags;
+CREATE TRIGGER tags_version_trigger AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON tags
+	FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
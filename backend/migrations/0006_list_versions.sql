@@ -0,0 +1,20 @@
+-- Version stamps for the tables behind /circles/all, /circles/registered and /threads/get,
+-- used to answer conditional requests (ETag / Last-Modified) without running the list query
+INSERT INTO table_versions(table_name) VALUES ('users'), ('circles'), ('circles_registrations'), ('threads')
+ON CONFLICT DO NOTHING;
+
+DROP TRIGGER IF EXISTS users_version_trigger ON users;
+CREATE TRIGGER users_version_trigger AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+	FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS circles_version_trigger ON circles;
+CREATE TRIGGER circles_version_trigger AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON circles
+	FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS circles_registrations_version_trigger ON circles_registrations;
+CREATE TRIGGER circles_registrations_version_trigger AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON circles_registrations
+	FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS threads_version_trigger ON threads;
+CREATE TRIGGER threads_version_trigger AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON threads
+	FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
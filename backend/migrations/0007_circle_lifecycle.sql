@@ -0,0 +1,10 @@
+-- Scheduled lifecycle of circles, driven by backend/lifecycle.py:
+-- auto_start circles go live at start_date, live circles end at end_date (or after the maximum
+-- live duration) and circles whose host never went live are archived after a grace period.
+-- The scans use circles_upcoming_idx and circles_live_idx from 0002.
+ALTER TABLE circles ADD COLUMN IF NOT EXISTS auto_start boolean NOT NULL DEFAULT false;
+ALTER TABLE circles ADD COLUMN IF NOT EXISTS end_date timestamp;
+ALTER TABLE circles ADD COLUMN IF NOT EXISTS started_date timestamp;
+
+UPDATE circles SET started_date = start_date
+WHERE started_date IS NULL AND (is_live OR is_ended);
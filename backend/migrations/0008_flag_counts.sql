@@ -0,0 +1,22 @@
+-- Per-circle flag summary behind the admin moderation queue, maintained by the flag add/remove/clear
+-- paths, and the hidden state of circles whose flag count reached FLAG_HIDE_THRESHOLD.
+-- Hidden states are applied by the reconciliation job (python -m backend.moderation), since the
+-- threshold is application configuration.
+CREATE TABLE IF NOT EXISTS flag_counts (
+	circle_id int NOT NULL,
+	flag_count int NOT NULL DEFAULT 0,
+	last_flagged_date timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+	PRIMARY KEY (circle_id),
+	CONSTRAINT fk_circle_id FOREIGN KEY(circle_id) REFERENCES circles(id) ON DELETE CASCADE
+);
+
+-- moderation queue: most flagged first, then most recently flagged
+CREATE INDEX IF NOT EXISTS flag_counts_queue_idx ON flag_counts(flag_count DESC, last_flagged_date DESC, circle_id DESC)
+WHERE flag_count > 0;
+
+ALTER TABLE circles ADD COLUMN IF NOT EXISTS is_hidden boolean NOT NULL DEFAULT false;
+
+INSERT INTO flag_counts(circle_id, flag_count, last_flagged_date)
+SELECT circle_id, COUNT(*), MAX(flagged_date) FROM flags
+GROUP BY circle_id
+ON CONFLICT (circle_id) DO NOTHING;
@@ -0,0 +1,9 @@
+-- Version stamp for circle_tags, which /circles/all and /circles/registered embed with ?include=tags,
+-- and timezone-aware stamps so Last-Modified comparisons don't depend on the server's timezone
+INSERT INTO table_versions(table_name) VALUES ('circle_tags') ON CONFLICT DO NOTHING;
+
+DROP TRIGGER IF EXISTS circle_tags_version_trigger ON circle_tags;
+CREATE TRIGGER circle_tags_version_trigger AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON circle_tags
+	FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+ALTER TABLE table_versions ALTER COLUMN updated_date TYPE timestamptz USING updated_date::timestamptz;
@@ -0,0 +1,50 @@
+-- Bump a table's version only when a statement actually changed rows. Statement-level triggers also
+-- fire for statements matching no rows (e.g. an idle lifecycle pass), which changed the list ETags
+-- without any change to the data. The rows are read from transition tables, which a trigger can only
+-- declare for a single event, so each tracked table gets one trigger per event.
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+	IF TG_OP = 'INSERT' OR TG_OP = 'UPDATE' THEN
+		PERFORM 1 FROM new_rows LIMIT 1;
+		IF NOT FOUND THEN
+			RETURN NULL;
+		END IF;
+	ELSIF TG_OP = 'DELETE' THEN
+		PERFORM 1 FROM old_rows LIMIT 1;
+		IF NOT FOUND THEN
+			RETURN NULL;
+		END IF;
+	END IF;
+
+	INSERT INTO table_versions(table_name) VALUES (TG_TABLE_NAME)
+	ON CONFLICT (table_name) DO UPDATE
+	SET version = table_versions.version + 1, updated_date = CURRENT_TIMESTAMP;
+	RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+	tracked text;
+BEGIN
+	FOREACH tracked IN ARRAY ARRAY['tags', 'users', 'circles', 'circles_registrations', 'threads', 'circle_tags'] LOOP
+		EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tracked || '_version_trigger', tracked);
+
+		EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tracked || '_version_insert_trigger', tracked);
+		EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows
+			FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()', tracked || '_version_insert_trigger', tracked);
+
+		EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tracked || '_version_update_trigger', tracked);
+		EXECUTE format('CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING NEW TABLE AS new_rows
+			FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()', tracked || '_version_update_trigger', tracked);
+
+		EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tracked || '_version_delete_trigger', tracked);
+		EXECUTE format('CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows
+			FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()', tracked || '_version_delete_trigger', tracked);
+
+		EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tracked || '_version_truncate_trigger', tracked);
+		EXECUTE format('CREATE TRIGGER %I AFTER TRUNCATE ON %I
+			FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()', tracked || '_version_truncate_trigger', tracked);
+	END LOOP;
+END
+$$;
@@ -0,0 +1,14 @@
+-- Home feed fan-outs still to be completed: recorded in the transaction that creates the circle,
+-- advanced with every batch of followers and removed with the last one, so that a fan-out which
+-- failed or was interrupted is replayed from last_follower_id (python -m backend.feed, also run by
+-- the lifecycle scheduler)
+CREATE TABLE IF NOT EXISTS pending_fanouts (
+	circle_id int NOT NULL,
+	last_follower_id int NOT NULL DEFAULT 0,
+	attempts int NOT NULL DEFAULT 0,
+	updated_date timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+	PRIMARY KEY (circle_id),
+	CONSTRAINT fk_circle_id FOREIGN KEY(circle_id) REFERENCES circles(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS pending_fanouts_updated_idx ON pending_fanouts(updated_date);
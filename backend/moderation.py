@@ -0,0 +1,44 @@
+# flag_counts summarises the flags of each circle for the admin moderation queue. The flag add, remove
+# and clear statements update it in the same statement as the flags, and hide a circle from the public
+# lists once its count reaches FLAG_HIDE_THRESHOLD, so neither the queue nor the threshold recounts flags.
+# reconcile_flag_counts() recounts in bulk (e.g. after flags removed with a deleted user) and re-applies
+# the threshold. Run the reconciliation job with: python -m backend.moderation
+import os
+import psycopg
+from dotenv import load_dotenv
+
+def reconcile_flag_counts(conn, threshold):
+    with conn.cursor() as cur:
+        cur.execute("""
+                    INSERT INTO flag_counts(circle_id, flag_count, last_flagged_date)
+                    SELECT circle_id, COUNT(*), MAX(flagged_date) FROM flags
+                    GROUP BY circle_id
+                    ON CONFLICT (circle_id) DO UPDATE
+                    SET flag_count = EXCLUDED.flag_count,
+                        last_flagged_date = EXCLUDED.last_flagged_date
+                    WHERE (flag_counts.flag_count, flag_counts.last_flagged_date)
+                          IS DISTINCT FROM (EXCLUDED.flag_count, EXCLUDED.last_flagged_date)
+                    """)
+        repaired = cur.rowcount
+
+        cur.execute("""
+                    DELETE FROM flag_counts
+                    WHERE NOT EXISTS (SELECT 1 FROM flags WHERE flags.circle_id = flag_counts.circle_id)
+                    """)
+        repaired += cur.rowcount
+
+        cur.execute("""
+                    UPDATE circles SET is_hidden = NOT circles.is_hidden
+                    WHERE circles.is_hidden IS DISTINCT FROM COALESCE(
+                        (SELECT flag_counts.flag_count >= %s FROM flag_counts WHERE flag_counts.circle_id = circles.id), false)
+                    """, (threshold,))
+        changed = cur.rowcount
+    conn.commit()
+    return repaired, changed
+
+if __name__ == '__main__':
+    load_dotenv()
+    threshold = int(os.getenv('FLAG_HIDE_THRESHOLD') or 5) or None
+    with psycopg.connect(os.getenv('DATABASE_URL') or 'dbname=project4 user=db_user') as conn:
+        repaired, changed = reconcile_flag_counts(conn, threshold)
+    print(f'repaired flag_counts for {repaired} circles, changed visibility of {changed} circles')
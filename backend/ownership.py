@@ -0,0 +1,36 @@
+# Edits and deletes of rows owned by a user (circles by host_id, threads and comments by author_id)
+# in a single statement: the ownership/admin check is part of the UPDATE/DELETE's WHERE clause,
+# so there is no SELECT round trip before the write and no window for the row to change between
+# the check and the write. Supplied fields are applied with COALESCE, so None leaves a column as is.
+#
+# Both return (found, row): found is False when no row has that id, and row is None when the row
+# exists but the user may not change it. Otherwise row is the updated (or deleted) row.
+from .queries import execute
+
+def get_owned_row_result(cur):
+    result = cur.fetchone()
+    if result is None:
+        return False, None
+    return True, result if result['id'] is not None else None
+
+def update_owned_row(cur, table, row_id, user_id, values, owner_column='author_id', is_admin=False,
+                     assignments=None):
+    params = { f'value_{column}': value for column, value in values.items() }
+    params.update({ 'row_id': row_id, 'user_id': user_id, 'is_admin': is_admin })
+
+    set_clause = [f'{column} = COALESCE(%(value_{column})s, {column})' for column in values]
+    set_clause.extend(assignments or [])
+
+    execute(cur, 'ownership.update_owned_row', params, table=table, owner_column=owner_column,
+            set_clause=', '.join(set_clause))
+    return get_owned_row_result(cur)
+
+# Only sends the DELETE, so that its commit can go out in the same pipeline; the result is then
+# read with get_owned_row_result
+def send_delete_owned_row(cur, table, row_id, user_id, owner_column='author_id', is_admin=False):
+    execute(cur, 'ownership.delete_owned_row', { 'row_id': row_id, 'user_id': user_id, 'is_admin': is_admin },
+            table=table, owner_column=owner_column)
+
+def delete_owned_row(cur, table, row_id, user_id, owner_column='author_id', is_admin=False):
+    send_delete_owned_row(cur, table, row_id, user_id, owner_column, is_admin)
+    return get_owned_row_result(cur)
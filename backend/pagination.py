@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import datetime
+from flask import Response, current_app, jsonify, request, stream_with_context
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+STREAM_ITERSIZE = 500
+DEFAULT_KEY_COLUMNS = ('circles.start_date', 'circles.id')
+FEED_KEY_COLUMNS = ('home_feed.start_date', 'home_feed.circle_id')
+
+# Cursors are opaque to clients: base64 encoded keyset values of the last row on the page
+def encode_keyset(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('utf-8')
+
+def decode_keyset(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+
+# [timestamp, id] cursors used by the date ordered lists
+def encode_cursor(row, date_key='start_date'):
+    return encode_keyset(row[date_key].isoformat(), row['id'])
+
+def decode_cursor(cursor):
+    start_date, row_id = decode_keyset(cursor)
+    return datetime.fromisoformat(start_date), int(row_id)
+
+def get_page_args():
+    limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    stream = request.args.get('format') == 'ndjson'
+    return limit, decode_cursor(cursor) if cursor else None, stream
+
+# query must select from a FROM/WHERE clause and leave room for the keyset condition, e.g.
+# "SELECT ... FROM circles JOIN users ON ... WHERE circles.host_id = %s {keyset} ORDER BY {order}"
+# With after_cursor, the two values of the cursor follow the query's own params.
+def format_page_query(query, key_columns, after_cursor):
+    keyset = f"AND ({', '.join(key_columns)}) > (%s, %s)" if after_cursor else ''
+    return query.format(keyset=keyset, order=', '.join(key_columns))
+
+# Without ?limit= or ?cursor= the whole list is returned in the original { status, msg, data } shape,
+# so existing clients keep working; pages (with next_cursor) are opt-in.
+def paginated_response(conn, query, params, msg, key_columns=DEFAULT_KEY_COLUMNS):
+    limit, cursor, stream = get_page_args()
+
+    if cursor:
+        params = (*params, *cursor)
+    sql = format_page_query(query, key_columns, cursor is not None)
+
+    if stream:
+        return Response(stream_with_context(stream_rows(conn, sql, params)), mimetype='application/x-ndjson')
+
+    if 'limit' not in request.args and cursor is None:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            data = cur.fetchall()
+        return jsonify({ 'status': 'ok', 'msg': msg, 'data': data }), 200
+
+    with conn.cursor() as cur:
+        cur.execute(sql + ' LIMIT %s', (*params, limit + 1))
+        data = cur.fetchall()
+
+    next_cursor = None
+    if len(data) > limit:
+        data = data[:limit]
+        next_cursor = encode_cursor(data[-1])
+
+    return jsonify({ 'status': 'ok', 'msg': msg, 'data': data, 'next_cursor': next_cursor }), 200
+
+# Streams every remaining row through a server-side cursor, one JSON document per line
+def stream_rows(conn, sql, params):
+    with conn.cursor(name='paginated_stream') as cur:
+        cur.itersize = STREAM_ITERSIZE
+        cur.execute(sql, params)
+        for row in cur:
+            yield current_app.json.dumps(row) + '\n'
+    conn.commit()
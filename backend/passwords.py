@@ -0,0 +1,69 @@
+# Password hashing and verification run on a dedicated, size-limited process pool so that bcrypt
+# bursts (e.g. many logins at once) cannot pin every request thread on CPU. Callers wait at most
+# PASSWORD_HASH_QUEUE_TIMEOUT seconds for a slot before PasswordHasherBusy is raised.
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+
+class PasswordHasherBusy(Exception):
+    pass
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def check_password(password_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+def get_rounds(password_hash):
+    # bcrypt hashes look like $2b$<rounds>$<salt and checksum>
+    return int(password_hash.split('$')[2])
+
+class PasswordHasher:
+    def __init__(self):
+        self.rounds = 12
+        self.workers = 2
+        self.timeout = 2
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._executor = None
+
+    # The executor is created with the app, but starts its worker processes only on the first submit.
+    # They are started from a forkserver (spawn where unavailable) rather than forked from this process,
+    # which by then runs threads (connection pool, event listener, lifecycle scheduler) whose held
+    # locks a forked child would inherit.
+    def configure(self, rounds, workers, queue_size, timeout):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method))
+
+    def run(self, fn, *args):
+        slots = self._slots
+        if not slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy()
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future.result()
+
+    def generate_password_hash(self, password):
+        return self.run(hash_password, password, self.rounds)
+
+    def check_password_hash(self, password_hash, password):
+        return self.run(check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return get_rounds(password_hash) != self.rounds
+
+password_hasher = PasswordHasher()
+
+def init_password_hasher(app):
+    password_hasher.configure(app.config['BCRYPT_LOG_ROUNDS'], app.config['PASSWORD_HASH_WORKERS'],
+                              app.config['PASSWORD_HASH_QUEUE_SIZE'], app.config['PASSWORD_HASH_QUEUE_TIMEOUT'])
@@ -0,0 +1,490 @@
+# Query registry: every statement issued while serving a request, by name: the controllers' and those
+# of the helpers they call (ownership checks, feed fan-out, profile counters, version stamps, events).
+# Background jobs and scripts (lifecycle scheduler, reconciliation jobs, migrations) keep their own SQL.
+# Pooled connections prepare statements server side once they have run DB_PREPARE_THRESHOLD times (0: on first use), so a
+# registered statement is parsed and planned once per connection instead of on every execute.
+# Fragments that vary per request (included columns, keyset conditions, search filters, comment
+# tree anchors) are registered here too and spliced in by the caller; each combination is a
+# separate prepared statement.
+import threading
+import weakref
+from collections import OrderedDict
+
+# stemmed (english) or exact (simple, e.g. usernames) matches of the search terms
+SEARCH_QUERY = "(websearch_to_tsquery('english', %(q)s) || websearch_to_tsquery('simple', %(q)s))"
+SEARCH_RANK = f"ts_rank_cd(circle_search.search_vector, {SEARCH_QUERY})"
+
+SEARCH_CONDITIONS = {
+    'tags': 'AND EXISTS (SELECT 1 FROM circle_tags WHERE circle_tags.circle_id = circles.id AND circle_tags.tag = ANY(%(tags)s))',
+    'from': 'AND circles.start_date >= %(from)s',
+    'to': 'AND circles.start_date < %(to)s',
+    # ordered by rank then id, both descending
+    'cursor': f'AND ({SEARCH_RANK}, circles.id) < (CAST(%(rank)s AS real), %(id)s)',
+}
+
+# Optional fields embedded into circle payloads with ?include=tags,viewer so that circle cards
+# don't need a /circles/tags or /circles/registrations call each (registration_count is always present)
+INCLUDE_COLUMNS = {
+    'tags': ("""
+             , (SELECT COALESCE(array_agg(circle_tags.tag ORDER BY circle_tags.tag), ARRAY[]::varchar[])
+                FROM circle_tags WHERE circle_tags.circle_id = circles.id) AS tags
+             """, False),
+    'viewer': ("""
+               , EXISTS (SELECT 1 FROM circles_registrations
+                         WHERE circles_registrations.circle_id = circles.id AND circles_registrations.user_id = %s) AS is_registered
+               """, True),
+}
+
+# next page of the moderation queue, ordered by flag count, last flagged date and circle id, all descending
+FLAG_QUEUE_KEYSET = ('AND (flag_counts.flag_count, flag_counts.last_flagged_date, flag_counts.circle_id) '
+                     '< (%(flag_count)s, %(last_flagged_date)s, %(id)s)')
+
+# first level of /comments/tree: a single comment, the replies to a comment or a thread's top-level comments
+TREE_ANCHORS = {
+    'comment': 'c.id = %s',
+    'parent': 'c.parent_id = %s',
+    'thread': 'c.thread_id = %s AND c.parent_id IS NULL',
+    'cursor': ' AND (c.created_date, c.id) > (%s, %s)',
+}
+
+QUERIES = {
+    'auth.find_user': """
+                      SELECT * FROM users
+                      WHERE username=%s OR email=%s
+                      """,
+    'auth.register_admin': """
+                           INSERT INTO users(username, email, hash, date_of_birth, bio, role)
+                           VALUES (%s, %s, %s, CAST(%s AS DATE), %s, 'admin')
+                           """,
+    'auth.register': """
+                     INSERT INTO users(username, email, hash, date_of_birth, bio)
+                     VALUES (%s, %s, %s, CAST(%s AS DATE), %s)
+                     """,
+    'auth.rehash_password': """
+                            UPDATE users
+                            SET hash = %s
+                            WHERE id = %s
+                            """,
+    'auth.get_user_details': """
+                             SELECT username, email, date_of_birth, bio FROM users
+                             WHERE id = %s
+                             """,
+
+    'follow_rs.add_follow': """
+                            INSERT INTO follow_relationships(user_id, follower_id)
+                            VALUES (CAST(%s AS INTEGER), CAST(%s AS INTEGER))
+                            """,
+    'follow_rs.delete_follow': """
+                               DELETE FROM follow_relationships
+                               WHERE user_id=CAST(%s AS INTEGER) AND follower_id=CAST(%s AS INTEGER)
+                               """,
+    'follow_rs.get_followers': """
+                               SELECT users.id, users.username FROM users
+                               JOIN follow_relationships ON users.id = follow_relationships.follower_id
+                               WHERE follow_relationships.user_id = %s;
+                               """,
+    'follow_rs.get_following': """
+                               SELECT users.id, users.username FROM users
+                               JOIN follow_relationships ON users.id = follow_relationships.user_id
+                               WHERE follow_relationships.follower_id = %s;
+                               """,
+    'follow_rs.get_profile_summary': """
+                                     SELECT users.id AS user_id, COALESCE(user_stats.circles_hosted, 0) AS circles_hosted,
+                                            COALESCE(user_stats.followers, 0) AS followers, COALESCE(user_stats.following, 0) AS following
+                                     FROM users
+                                     LEFT JOIN user_stats ON user_stats.user_id = users.id
+                                     WHERE users.id = %s
+                                     """,
+
+    'circles.get_all_circles': """
+                               SELECT circles.*, users.username{columns} FROM circles
+                               JOIN users ON circles.host_id = users.id
+                               WHERE NOT circles.is_hidden {keyset}
+                               ORDER BY {order}
+                               """,
+    'circles.get_circle_by_id': """
+                                SELECT circles.*, users.username{columns} FROM circles
+                                JOIN users ON circles.host_id = users.id
+                                WHERE circles.id = %s
+                                """,
+    'circles.explore_popular': """
+                               SELECT circles.*, users.username FROM circles
+                               JOIN users ON circles.host_id = users.id
+                               WHERE NOT circles.is_live AND NOT circles.is_ended AND circles.start_date >= NOW()
+                                     AND NOT circles.is_hidden
+                               ORDER BY circles.registration_count DESC, circles.start_date
+                               LIMIT %s
+                               """,
+    'circles.explore_live': """
+                            SELECT circles.*, users.username FROM circles
+                            JOIN users ON circles.host_id = users.id
+                            WHERE circles.is_live AND NOT circles.is_ended AND NOT circles.is_hidden
+                            ORDER BY circles.start_date, circles.id
+                            LIMIT %s
+                            """,
+    'circles.explore_upcoming': """
+                                SELECT circles.*, users.username FROM circles
+                                JOIN users ON circles.host_id = users.id
+                                WHERE NOT circles.is_live AND NOT circles.is_ended AND circles.start_date >= NOW()
+                                      AND NOT circles.is_hidden
+                                ORDER BY circles.start_date, circles.id
+                                LIMIT %s
+                                """,
+    'circles.search_circles': f"""
+                              SELECT circles.*, users.username, {SEARCH_RANK} AS rank
+                              FROM circle_search
+                              JOIN circles ON circle_search.circle_id = circles.id
+                              JOIN users ON circles.host_id = users.id
+                              WHERE circle_search.search_vector @@ {SEARCH_QUERY} AND NOT circles.is_hidden
+                              {{conditions}}
+                              ORDER BY rank DESC, circles.id DESC
+                              LIMIT %(limit)s
+                              """,
+    'circles.get_following_circles': """
+                                     SELECT circles.*, users.username{columns} FROM home_feed
+                                     JOIN circles ON home_feed.circle_id = circles.id
+                                     JOIN users ON circles.host_id = users.id
+                                     WHERE home_feed.user_id = %s AND NOT circles.is_hidden {keyset}
+                                     ORDER BY {order}
+                                     """,
+    'circles.get_circles_by_user': """
+                                   SELECT circles.*, users.username{columns} FROM circles
+                                   JOIN users ON circles.host_id = users.id
+                                   WHERE circles.host_id = %s {keyset}
+                                   ORDER BY {order}
+                                   """,
+    'circles.add_circle': """
+                          INSERT INTO circles(host_id, title, description, participants_limit, start_date, auto_start, end_date)
+                          VALUES (%s, %s, %s, %s, %s, %s, %s)
+                          RETURNING *
+                          """,
+    'circles.register': """
+                        INSERT INTO circles_registrations(circle_id, user_id)
+                        VALUES (%s, %s)
+                        """,
+    'circles.increment_registration_count': """
+                                            UPDATE circles
+                                            SET registration_count = registration_count + 1
+                                            WHERE id = %s
+                                            """,
+    'circles.deregister': """
+                          DELETE FROM circles_registrations
+                          WHERE circle_id = %s AND user_id = %s
+                          """,
+    'circles.decrement_registration_count': """
+                                            UPDATE circles
+                                            SET registration_count = registration_count - 1
+                                            WHERE id = %s
+                                            """,
+    'circles.get_circle_host': """
+                               SELECT host_id FROM circles
+                               WHERE id = %s
+                               """,
+    'circles.bulk_register_users': """
+                                   WITH inserted AS (
+                                       INSERT INTO circles_registrations(circle_id, user_id)
+                                       SELECT %s, users.id FROM users
+                                       WHERE users.id = ANY(%s)
+                                       ON CONFLICT DO NOTHING
+                                       RETURNING user_id
+                                   )
+                                   UPDATE circles
+                                   SET registration_count = registration_count + (SELECT COUNT(*) FROM inserted)
+                                   WHERE id = %s
+                                   RETURNING (SELECT COUNT(*) FROM inserted) AS registered_count
+                                   """,
+    'circles.get_registered_users': """
+                                    SELECT users.id, users.username FROM circles_registrations
+                                    JOIN users ON circles_registrations.user_id = users.id
+                                    WHERE circles_registrations.circle_id = %s
+                                    """,
+    'circles.get_registered_circles': """
+                                      SELECT circles.*, users.username{columns} FROM circles_registrations
+                                      JOIN circles ON circles_registrations.circle_id = circles.id
+                                      JOIN users ON circles.host_id = users.id
+                                      WHERE circles_registrations.user_id = %s {keyset}
+                                      ORDER BY {order}
+                                      """,
+    'circles.get_tags_by_circle': """
+                                  SELECT tag FROM circle_tags
+                                  WHERE circle_id = %s
+                                  """,
+    'circles.get_circles_by_any_tag': """
+                                      SELECT circles.*, users.username{columns} FROM circles
+                                      JOIN users ON circles.host_id = users.id
+                                      WHERE circles.id IN (
+                                          SELECT circle_id FROM circle_tags
+                                          WHERE tag = ANY(%s)
+                                      ) AND NOT circles.is_hidden {keyset}
+                                      ORDER BY {order}
+                                      """,
+    'circles.get_circles_by_all_tags': """
+                                       SELECT circles.*, users.username{columns} FROM circles
+                                       JOIN users ON circles.host_id = users.id
+                                       WHERE circles.id IN (
+                                           SELECT circle_id FROM circle_tags
+                                           WHERE tag = ANY(%s)
+                                           GROUP BY circle_id
+                                           HAVING COUNT(*) = %s
+                                       ) AND NOT circles.is_hidden {keyset}
+                                       ORDER BY {order}
+                                       """,
+    'circles.add_tags': """
+                        INSERT INTO circle_tags(circle_id, tag)
+                        SELECT circles.id, tag FROM circles
+                        CROSS JOIN unnest(CAST(%s AS varchar[])) AS tag
+                        WHERE circles.id = %s AND circles.host_id = %s
+                        ON CONFLICT DO NOTHING
+                        """,
+    'circles.delete_tags': """
+                           DELETE FROM circle_tags
+                           USING circles
+                           WHERE circle_tags.circle_id = %s AND circle_tags.tag = ANY(%s)
+                                 AND circles.id = circle_tags.circle_id AND circles.host_id = %s
+                           """,
+    # the summary row is updated in the same statement as the flag, and the circle is hidden once
+    # the new count reaches the threshold (NULL: never)
+    'circles.add_flag': """
+                        WITH flagged AS (
+                            INSERT INTO flags(circle_id, flag_user_id)
+                            VALUES (%(circle_id)s, %(user_id)s)
+                            RETURNING circle_id, flagged_date
+                        ), counted AS (
+                            INSERT INTO flag_counts(circle_id, flag_count, last_flagged_date)
+                            SELECT circle_id, 1, flagged_date FROM flagged
+                            ON CONFLICT (circle_id) DO UPDATE
+                            SET flag_count = flag_counts.flag_count + 1,
+                                last_flagged_date = GREATEST(flag_counts.last_flagged_date, EXCLUDED.last_flagged_date)
+                            RETURNING circle_id, flag_count
+                        )
+                        UPDATE circles SET is_hidden = true
+                        FROM counted
+                        WHERE circles.id = counted.circle_id AND counted.flag_count >= %(threshold)s AND NOT circles.is_hidden
+                        """,
+    'circles.get_flags_by_circle': """
+                                   SELECT * FROM flags
+                                   WHERE circle_id = %s
+                                   """,
+    # last_flagged_date is left as is, so a circle keeps its place among equally flagged ones
+    'circles.delete_flag_by_user': """
+                                   WITH unflagged AS (
+                                       DELETE FROM flags
+                                       WHERE circle_id = %(circle_id)s AND flag_user_id = %(user_id)s
+                                       RETURNING circle_id
+                                   ), counted AS (
+                                       UPDATE flag_counts SET flag_count = flag_counts.flag_count - 1
+                                       FROM unflagged
+                                       WHERE flag_counts.circle_id = unflagged.circle_id
+                                       RETURNING flag_counts.circle_id, flag_counts.flag_count
+                                   )
+                                   UPDATE circles SET is_hidden = false
+                                   FROM counted
+                                   WHERE circles.id = counted.circle_id AND counted.flag_count < %(threshold)s AND circles.is_hidden
+                                   """,
+    'circles.get_flagged_circles': """
+                                   SELECT circles.*, users.username, flag_counts.flag_count, flag_counts.last_flagged_date
+                                   FROM flag_counts
+                                   JOIN circles ON flag_counts.circle_id = circles.id
+                                   JOIN users ON circles.host_id = users.id
+                                   WHERE flag_counts.flag_count > 0 {keyset}
+                                   ORDER BY flag_counts.flag_count DESC, flag_counts.last_flagged_date DESC, flag_counts.circle_id DESC
+                                   LIMIT %(limit)s
+                                   """,
+    # marking a circle safe also shows it again
+    'circles.clear_flags': """
+                           WITH cleared AS (
+                               DELETE FROM flags
+                               WHERE circle_id = %(circle_id)s
+                           ), uncounted AS (
+                               DELETE FROM flag_counts
+                               WHERE circle_id = %(circle_id)s
+                           )
+                           UPDATE circles SET is_hidden = false
+                           WHERE id = %(circle_id)s AND is_hidden
+                           """,
+
+    'threads.get_threads_by_circle': """
+                                     SELECT * FROM threads
+                                     WHERE circle_id = %s
+                                     """,
+    'threads.add_thread': """
+                          INSERT INTO threads(circle_id, author_id, title)
+                          VALUES (%s, %s, %s)
+                          RETURNING *
+                          """,
+
+    'comments.get_comments_by_thread': """
+                                       SELECT * FROM comments
+                                       WHERE thread_id = %s
+                                       ORDER BY parent_id, created_date;
+                                       """,
+    'comments.get_comment_tree': """
+                                 WITH RECURSIVE tree AS (
+                                     SELECT level.*, 1 AS depth, ROW_NUMBER() OVER (ORDER BY level.created_date, level.id) AS sibling_rank
+                                     FROM (
+                                         SELECT c.*, EXISTS (SELECT 1 FROM comments r WHERE r.parent_id = c.id) AS has_replies
+                                         FROM comments c
+                                         WHERE {anchor}
+                                         ORDER BY c.created_date, c.id
+                                         LIMIT %s
+                                     ) level
+                                     UNION ALL
+                                     SELECT replies.* FROM tree
+                                     CROSS JOIN LATERAL (
+                                         SELECT level.*, tree.depth + 1 AS depth, ROW_NUMBER() OVER (ORDER BY level.created_date, level.id) AS sibling_rank
+                                         FROM (
+                                             SELECT c.*, EXISTS (SELECT 1 FROM comments r WHERE r.parent_id = c.id) AS has_replies
+                                             FROM comments c
+                                             WHERE c.parent_id = tree.id
+                                             ORDER BY c.created_date, c.id
+                                             LIMIT %s
+                                         ) level
+                                     ) replies
+                                     WHERE tree.has_replies AND tree.depth < %s AND tree.sibling_rank <= %s
+                                 )
+                                 SELECT * FROM tree
+                                 ORDER BY depth, created_date, id
+                                 """,
+    'comments.add_comment': """
+                            WITH new_comment AS (
+                                INSERT INTO comments(thread_id, parent_id, author_id, comment)
+                                VALUES (%s, %s, %s, %s)
+                                RETURNING *
+                            )
+                            SELECT new_comment.*, threads.circle_id FROM new_comment
+                            JOIN threads ON threads.id = new_comment.thread_id
+                            """,
+
+    'ownership.update_owned_row': """
+                                  WITH updated AS (
+                                      UPDATE {table}
+                                      SET {set_clause}
+                                      WHERE id = %(row_id)s AND ({owner_column} = %(user_id)s OR %(is_admin)s)
+                                      RETURNING {table}.*
+                                  )
+                                  SELECT updated.* FROM {table}
+                                  LEFT JOIN updated ON true
+                                  WHERE {table}.id = %(row_id)s
+                                  """,
+    'ownership.delete_owned_row': """
+                                  WITH deleted AS (
+                                      DELETE FROM {table}
+                                      WHERE id = %(row_id)s AND ({owner_column} = %(user_id)s OR %(is_admin)s)
+                                      RETURNING {table}.*
+                                  )
+                                  SELECT deleted.* FROM {table}
+                                  LEFT JOIN deleted ON true
+                                  WHERE {table}.id = %(row_id)s
+                                  """,
+
+    'feed.fan_out_circle': """
+                           WITH batch AS (
+                               SELECT follower_id FROM follow_relationships
+                               WHERE user_id = %s AND follower_id > %s
+                               ORDER BY follower_id
+                               LIMIT %s
+                           ), inserted AS (
+                               INSERT INTO home_feed(user_id, circle_id, host_id, start_date)
+                               SELECT follower_id, %s, %s, %s FROM batch
+                               ON CONFLICT DO NOTHING
+                           )
+                           SELECT MAX(follower_id) AS last_follower_id, COUNT(*) AS batch_size FROM batch
+                           """,
+    'feed.add_pending_fanout': """
+                               INSERT INTO pending_fanouts(circle_id) VALUES (%s)
+                               ON CONFLICT DO NOTHING
+                               """,
+    'feed.advance_pending_fanout': """
+                                   UPDATE pending_fanouts
+                                   SET last_follower_id = %s, updated_date = CURRENT_TIMESTAMP
+                                   WHERE circle_id = %s
+                                   """,
+    'feed.delete_pending_fanout': """
+                                  DELETE FROM pending_fanouts
+                                  WHERE circle_id = %s
+                                  """,
+    'feed.backfill_follow': """
+                            INSERT INTO home_feed(user_id, circle_id, host_id, start_date)
+                            SELECT CAST(%s AS INTEGER), id, host_id, start_date FROM circles
+                            WHERE host_id = CAST(%s AS INTEGER)
+                            ON CONFLICT DO NOTHING
+                            """,
+    'feed.prune_follow': """
+                         DELETE FROM home_feed
+                         WHERE user_id = CAST(%s AS INTEGER) AND host_id = CAST(%s AS INTEGER)
+                         """,
+    'feed.update_circle_start_date': """
+                                     UPDATE home_feed
+                                     SET start_date = %s
+                                     WHERE circle_id = %s AND start_date <> %s
+                                     """,
+
+    'user_stats.adjust_user_stats': """
+                                    INSERT INTO user_stats(user_id, circles_hosted, followers, following)
+                                    VALUES (CAST(%s AS INTEGER), %s, %s, %s)
+                                    ON CONFLICT (user_id) DO UPDATE
+                                    SET circles_hosted = user_stats.circles_hosted + EXCLUDED.circles_hosted,
+                                        followers = user_stats.followers + EXCLUDED.followers,
+                                        following = user_stats.following + EXCLUDED.following
+                                    """,
+
+    'conditional.get_table_versions': """
+                                      SELECT table_name, version, updated_date FROM table_versions
+                                      WHERE table_name = ANY(%s)
+                                      ORDER BY table_name
+                                      """,
+    'tag_catalogue.get_version': """
+                                 SELECT version FROM table_versions
+                                 WHERE table_name = 'tags'
+                                 """,
+    'tag_catalogue.get_tags': """
+                              SELECT tag FROM tags ORDER BY tag
+                              """,
+    'events.publish_event': """
+                            SELECT pg_notify(%s, %s)
+                            """,
+}
+
+def execute(cur, name, params=None, **fragments):
+    query = QUERIES[name].format(**fragments) if fragments else QUERIES[name]
+    return cur.execute(query, params)
+
+# Mirrors psycopg's per-connection prepared statement cache (same threshold and LRU size) to count
+# executions that reused a statement already prepared on the connection, by endpoint
+class PreparedStatementStats:
+    def __init__(self):
+        self.threshold = 0
+        self.max_size = 100
+        self.counts = {}
+        self._connections = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def configure(self, threshold, max_size):
+        self.threshold = threshold
+        self.max_size = max_size
+
+    def observe(self, conn, query, endpoint):
+        if self.threshold is None:
+            return
+
+        with self._lock:
+            executions = self._connections.setdefault(conn, OrderedDict())
+            count = executions.pop(query, 0)
+            executions[query] = count + 1
+            if len(executions) > self.max_size:
+                executions.popitem(last=False)
+
+            key = (endpoint, 'hit' if count > self.threshold else 'miss')
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def render(self):
+        lines = [
+            '# HELP project4_prepared_statements_total Executions that reused (hit) or had to parse and plan (miss) a statement on their connection',
+            '# TYPE project4_prepared_statements_total counter',
+        ]
+        with self._lock:
+            for (endpoint, result), total in sorted(self.counts.items()):
+                lines.append(f'project4_prepared_statements_total{{endpoint="{endpoint}",result="{result}"}} {total}')
+        return lines
+
+prepared_statement_stats = PreparedStatementStats()
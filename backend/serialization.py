@@ -0,0 +1,120 @@
+# Response bodies: a pluggable JSON encoder (orjson when installed, the stdlib otherwise) that
+# keeps Flask's wire format for dates and decimals, an optional MessagePack body for clients that
+# ask for it, and gzip/brotli compression of large bodies negotiated from Accept-Encoding.
+import dataclasses
+import decimal
+import gzip
+import json
+import uuid
+from datetime import date
+from flask import current_app, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+from .instrumentation import timed_phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MSGPACK_MIMETYPES = ['application/msgpack', 'application/x-msgpack']
+COMPRESSIBLE_MIMETYPES = ['application/json', 'application/msgpack', 'text/plain', 'text/html']
+
+# Same conversions as Flask's default provider, so switching encoders does not change the payload
+def encode_default(obj):
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+def get_json_encoder(name):
+    if name == 'orjson' and orjson is not None:
+        # datetimes are passed through to encode_default to keep the HTTP date format
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+        return lambda obj: orjson.dumps(obj, default=encode_default, option=options)
+    return lambda obj: json.dumps(obj, default=encode_default, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def wants_msgpack():
+    if msgpack is None or not has_request_context():
+        return False
+    best = request.accept_mimetypes.best_match(['application/json'] + MSGPACK_MIMETYPES)
+    return best in MSGPACK_MIMETYPES
+
+class FastJSONProvider(DefaultJSONProvider):
+    def __init__(self, app):
+        super().__init__(app)
+        self.encoder_name = app.config.get('JSON_ENCODER') or 'orjson'
+        self.encode = get_json_encoder(self.encoder_name)
+
+    def dumps(self, obj, **kwargs):
+        with timed_phase('serialize'):
+            if kwargs:
+                return super().dumps(obj, **kwargs)
+            return self.encode(obj).decode('utf-8')
+
+    def encode_response(self, obj):
+        if wants_msgpack():
+            return msgpack.packb(obj, default=encode_default, datetime=False), 'application/msgpack'
+        return self.encode(obj) + b'\n', self.mimetype
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with timed_phase('serialize'):
+            body, mimetype = self.encode_response(obj)
+        response = self._app.response_class(body, mimetype=mimetype)
+        if msgpack is not None:
+            response.vary.add('Accept')
+        return response
+
+def negotiate_encoding():
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    with timed_phase('compress'):
+        if encoding == 'br':
+            body = brotli.compress(body, quality=current_app.config['COMPRESS_BROTLI_QUALITY'])
+        else:
+            body = gzip.compress(body, compresslevel=current_app.config['COMPRESS_GZIP_LEVEL'], mtime=0)
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_serialization(app):
+    app.json = FastJSONProvider(app)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+    app.after_request(compress_response)
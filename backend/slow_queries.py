@@ -0,0 +1,108 @@
+# Slow-query log: controller queries slower than SLOW_QUERY_THRESHOLD_MS are kept in a bounded ring
+# buffer with their normalized SQL, parameter shape and endpoint. A sampled fraction of slow reads
+# (SELECTs, and WITH queries without data-modifying statements such as the recursive comment tree)
+# is re-run out of band with EXPLAIN (ANALYZE, BUFFERS) in a read-only transaction to capture the plan.
+import random
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from psycopg import sql
+from psycopg_pool import PoolTimeout
+
+class SlowQueryLog:
+    def __init__(self):
+        self.threshold = 0.2
+        self.sample_rate = 0.1
+        self.pool = None
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=200)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+        # at most one plan capture queued or running at a time, further samples are skipped
+        self._explaining = threading.Semaphore(1)
+
+    def configure(self, threshold_ms, sample_rate, size, pool):
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.pool = pool
+        with self._lock:
+            self._entries = deque(self._entries, maxlen=size)
+
+    def observe(self, cur, query, params, duration, endpoint):
+        if duration < self.threshold:
+            return
+
+        if isinstance(query, sql.Composable):
+            query = query.as_string(cur)
+        elif isinstance(query, bytes):
+            query = query.decode('utf-8')
+        normalized = normalize_sql(query)
+
+        entry = {
+            'sql': normalized,
+            'params_shape': params_shape(params),
+            'endpoint': endpoint,
+            'duration_ms': round(duration * 1000, 2),
+            'rows': cur.rowcount,
+            'recorded_at': datetime.now().isoformat(),
+            'plan': None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+        if (self.pool is not None and is_read_only(normalized)
+                and random.random() < self.sample_rate and self._explaining.acquire(blocking=False)):
+            self._executor.submit(self.explain, entry, query, params)
+
+    def explain(self, entry, query, params):
+        try:
+            conn = self.pool.getconn(timeout=1)
+        except PoolTimeout:
+            self._explaining.release()
+            return
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION READ ONLY")
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+                plan = cur.fetchone()
+            with self._lock:
+                entry['plan'] = next(iter(plan.values()))
+        except Exception as error:
+            with self._lock:
+                entry['plan'] = { 'error': str(error) }
+        finally:
+            conn.rollback()
+            self.pool.putconn(conn)
+            self._explaining.release()
+
+    def get_entries(self, endpoint=None):
+        with self._lock:
+            return [dict(entry) for entry in self._entries if endpoint is None or entry['endpoint'] == endpoint]
+
+slow_query_log = SlowQueryLog()
+
+def normalize_sql(query):
+    return re.sub(r'\s+', ' ', query).strip()
+
+WRITE_KEYWORDS = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE)\b', re.IGNORECASE)
+
+# a wrongly classified statement is still only explained inside a read-only transaction
+def is_read_only(normalized):
+    keyword = normalized.split(' ', 1)[0].upper()
+    if keyword == 'SELECT':
+        return True
+    return keyword == 'WITH' and not WRITE_KEYWORDS.search(normalized)
+
+def params_shape(params):
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return { key: type(value).__name__ for key, value in params.items() }
+    return [f'{type(value).__name__}[{len(value)}]' if isinstance(value, (list, tuple)) else type(value).__name__
+            for value in params]
+
+def init_slow_query_log(app, pool):
+    slow_query_log.configure(app.config['SLOW_QUERY_THRESHOLD_MS'], app.config['SLOW_QUERY_SAMPLE_RATE'],
+                             app.config['SLOW_QUERY_LOG_SIZE'], pool)
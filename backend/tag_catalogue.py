@@ -0,0 +1,39 @@
+import threading
+import time
+from .queries import execute
+
+TAG_CATALOGUE_CHECK_INTERVAL = 60
+
+# In-process copy of the tags table. It is reloaded only when the 'tags' version in table_versions
+# has moved, and that version is itself checked at most once per TAG_CATALOGUE_CHECK_INTERVAL seconds.
+class TagCatalogue:
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self.tags = None
+        self.version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def is_stale(self):
+        return self.tags is None or time.monotonic() - self._checked_at > self.check_interval
+
+    # get_conn is only called when the catalogue needs checking, so fresh reads don't touch the db
+    def get(self, get_conn):
+        if self.is_stale():
+            self.refresh(get_conn())
+        return self.tags
+
+    def refresh(self, conn):
+        with self._lock:
+            with conn.cursor() as cur:
+                execute(cur, 'tag_catalogue.get_version')
+                row = cur.fetchone()
+                version = row['version'] if row else None
+
+                if self.tags is None or version != self.version:
+                    execute(cur, 'tag_catalogue.get_tags')
+                    self.tags = [row['tag'] for row in cur.fetchall()]
+                    self.version = version
+            self._checked_at = time.monotonic()
+
+tag_catalogue = TagCatalogue(TAG_CATALOGUE_CHECK_INTERVAL)
@@ -0,0 +1,83 @@
+# Fixtures for tests that call the app against a migrated database whose data may be changed:
+# TEST_DATABASE_URL="dbname=project4_test user=db_user" python -m pytest backend/tests
+import os
+import uuid
+import pytest
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+@pytest.fixture(scope='session')
+def app():
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL not set')
+    pytest.importorskip('flask')
+
+    # read by backend.app at import, before load_dotenv (which keeps variables already set)
+    os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+    os.environ['LIFECYCLE_SCHEDULER_ENABLED'] = 'false'
+    os.environ['RATELIMIT_STORAGE_URI'] = 'memory://'
+    os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+    os.environ.setdefault('JWT_SECRET_KEY', 'test-secret')
+
+    from backend.app import app
+    app.config['TESTING'] = True
+    return app
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    # Talisman redirects plain http requests to https
+    client.environ_base['HTTP_X_FORWARDED_PROTO'] = 'https'
+    return client
+
+@pytest.fixture
+def db():
+    psycopg = pytest.importorskip('psycopg')
+    from psycopg.rows import dict_row
+
+    with psycopg.connect(TEST_DATABASE_URL, row_factory=dict_row, autocommit=True) as conn:
+        yield conn
+
+# creates users (deleted with everything they own afterwards) and signs access tokens for them
+@pytest.fixture
+def make_user(app, db):
+    from flask_jwt_extended import create_access_token
+
+    created = []
+
+    def make_user(role='user', hash=''):
+        username = f'test_{uuid.uuid4().hex[:12]}'
+        user = db.execute("""
+                          INSERT INTO users(username, email, hash, date_of_birth, bio, role)
+                          VALUES (%s, %s, %s, '2000-01-01', '', %s)
+                          RETURNING id, username, role
+                          """, (username, f'{username}@example.com', hash, role)).fetchone()
+        created.append(user['id'])
+
+        with app.app_context():
+            user['token'] = create_access_token(identity=username, additional_claims={
+                'id': user['id'],
+                'role': role,
+                'username': username
+            })
+        user['headers'] = { 'Authorization': f"Bearer {user['token']}" }
+        return user
+
+    yield make_user
+
+    for user_id in created:
+        db.execute("DELETE FROM users WHERE id = %s", (user_id,))
+
+@pytest.fixture
+def make_circle(db):
+    def make_circle(host_id, **columns):
+        columns = { 'title': 'test circle', 'description': '', **columns }
+        names = ', '.join(columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        return db.execute(f"""
+                          INSERT INTO circles(host_id, {names})
+                          VALUES (%s, {placeholders})
+                          RETURNING *
+                          """, (host_id, *columns.values())).fetchone()
+
+    return make_circle
@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+
+pytest.importorskip('a2wsgi')
+from limits import parse
+
+CLIENT = '203.0.113.9'
+DEFAULT_LIMIT = parse('1000 per 15 minutes')
+
+@pytest.fixture
+def asgi(app):
+    from backend import asgi
+    return asgi
+
+def call(asgi_app, path, query_string=b''):
+    messages = []
+
+    async def receive():
+        return { 'type': 'http.disconnect' }
+
+    async def send(message):
+        messages.append(message)
+
+    scope = { 'type': 'http', 'method': 'GET', 'path': path, 'query_string': query_string,
+              'headers': [], 'client': (CLIENT, 50000) }
+    asyncio.run(asgi_app(scope, receive, send))
+    return messages[0]['status']
+
+def test_events_stream_shares_the_route_rate_limit(asgi):
+    from backend.extensions import limiter
+    limiter.reset()
+    # the budget already used up through the Flask route
+    limiter.limiter.hit(DEFAULT_LIMIT, CLIENT, asgi.EVENTS_ENDPOINT, cost=DEFAULT_LIMIT.amount)
+
+    assert call(asgi.app, asgi.EVENTS_PATH, b'circle_id=1') == 429
+
+def test_events_stream_counts_rejected_requests(asgi):
+    from backend.extensions import limiter
+    limiter.reset()
+
+    # no token, rejected after the rate limit check
+    assert call(asgi.app, asgi.EVENTS_PATH, b'circle_id=1') == 401
+    assert limiter.limiter.get_window_stats(DEFAULT_LIMIT, CLIENT, asgi.EVENTS_ENDPOINT).remaining == DEFAULT_LIMIT.amount - 1
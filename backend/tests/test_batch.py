@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip('flask')
+from limits import parse
+from backend.extensions import limiter
+from backend.controllers.batch import ConnectionBudget
+
+CALLER = '203.0.113.7'
+DEFAULT_LIMIT = parse('1000 per 15 minutes')
+
+def get_hits(address, endpoint):
+    remaining = limiter.limiter.get_window_stats(DEFAULT_LIMIT, address, endpoint).remaining
+    return DEFAULT_LIMIT.amount - remaining
+
+def run_batch(client, user, sub_requests):
+    return client.post('/batch', json={ 'requests': sub_requests }, headers=user['headers'],
+                       environ_base={ 'REMOTE_ADDR': CALLER })
+
+def test_sub_requests_count_against_callers_limit(client, make_user):
+    limiter.reset()
+    user = make_user()
+
+    response = run_batch(client, user, [{ 'method': 'POST', 'path': '/circles/tags', 'body': { 'circle_id': 0 } }])
+
+    assert response.status_code == 200
+    assert get_hits(CALLER, 'circles.get_tags_by_circle') == 1
+    assert get_hits('127.0.0.1', 'circles.get_tags_by_circle') == 0
+
+def test_parallel_sub_requests_count_against_callers_limit(client, make_user):
+    limiter.reset()
+    user = make_user()
+    sub_request = { 'method': 'POST', 'path': '/circles/tags', 'body': { 'circle_id': 0 } }
+
+    response = run_batch(client, user, [sub_request] * 3)
+
+    assert [result['status'] for result in response.get_json()['data']] == [200] * 3
+    assert get_hits(CALLER, 'circles.get_tags_by_circle') == 3
+    assert get_hits('127.0.0.1', 'circles.get_tags_by_circle') == 0
+
+def test_connection_budget_grants_up_to_limit():
+    budget = ConnectionBudget()
+
+    assert budget.acquire(5, 4) == 4
+    assert budget.acquire(5, 4) == 1
+    assert budget.acquire(5, 4) == 0
+
+    budget.release(4)
+    assert budget.acquire(5, 2) == 2
+    assert budget.in_use == 3
+
+def test_connection_budget_never_goes_negative_when_limit_shrinks():
+    budget = ConnectionBudget()
+    budget.acquire(5, 5)
+
+    assert budget.acquire(2, 1) == 0
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip('flask')
+
+def get_all_circles(client, user, **headers):
+    return client.get('/circles/all', headers={ **user['headers'], **headers })
+
+def test_unchanged_list_is_not_modified(client, make_user):
+    user = make_user()
+    etag = get_all_circles(client, user).headers['ETag']
+
+    response = get_all_circles(client, user, **{ 'If-None-Match': etag })
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+def test_statement_changing_no_rows_keeps_etag(client, db, make_user):
+    user = make_user()
+    etag = get_all_circles(client, user).headers['ETag']
+
+    db.execute("UPDATE circles SET is_hidden = true WHERE false")
+    db.execute("DELETE FROM circle_tags WHERE false")
+
+    assert get_all_circles(client, user, **{ 'If-None-Match': etag }).status_code == 304
+
+def test_changed_list_is_sent_with_new_etag(client, make_user, make_circle):
+    user = make_user()
+    etag = get_all_circles(client, user).headers['ETag']
+
+    make_circle(user['id'])
+    response = get_all_circles(client, user, **{ 'If-None-Match': etag })
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_etag_differs_per_query_string(client, make_user):
+    user = make_user()
+    etag = get_all_circles(client, user).headers['ETag']
+
+    response = client.get('/circles/all?include=tags', headers={ **user['headers'], 'If-None-Match': etag })
+
+    assert response.status_code == 200
+
+def test_unmodified_since_last_change(client, make_user):
+    user = make_user()
+    last_modified = get_all_circles(client, user).headers['Last-Modified']
+
+    assert get_all_circles(client, user, **{ 'If-Modified-Since': last_modified }).status_code == 304
+
+def test_post_is_not_answered_conditionally(client, make_user):
+    user = make_user()
+    response = client.post('/threads/get', json={ 'circle_id': 0 }, headers={ **user['headers'], 'If-None-Match': '*' })
+
+    assert response.status_code != 304
+    assert 'ETag' not in response.headers
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import pytest
+
+pytest.importorskip('psycopg')
+from backend.events import EventHub, publish_event, render_events, stream_events
+
+CIRCLE_ID = 1
+
+def circle_event(**data):
+    return { 'circle_id': CIRCLE_ID, 'type': 'circle', 'data': { 'id': CIRCLE_ID, **data } }
+
+def comment_event(comment_id):
+    return { 'circle_id': CIRCLE_ID, 'type': 'comment', 'data': { 'id': comment_id } }
+
+@pytest.fixture
+def hub():
+    hub = EventHub()
+    hub.queue_size = 3
+    # no LISTEN connection: events are dispatched by the test
+    hub._listener = object()
+    return hub
+
+def test_circle_state_events_are_coalesced(hub):
+    subscription = hub.subscribe(CIRCLE_ID)
+
+    hub.dispatch(circle_event(is_live=True))
+    hub.dispatch(circle_event(is_live=False, is_ended=True))
+
+    assert [event['data'] for event in subscription.drain()] == [{ 'id': CIRCLE_ID, 'is_live': False, 'is_ended': True }]
+
+def test_comment_events_are_kept_per_comment(hub):
+    subscription = hub.subscribe(CIRCLE_ID)
+
+    for comment_id in (1, 2, 1):
+        hub.dispatch(comment_event(comment_id))
+
+    assert [event['data']['id'] for event in subscription.drain()] == [1, 2]
+
+def test_events_only_reach_their_circle(hub):
+    subscription = hub.subscribe(CIRCLE_ID)
+    other = hub.subscribe(CIRCLE_ID + 1)
+
+    hub.dispatch(circle_event())
+
+    assert len(subscription.drain()) == 1
+    assert other.drain() == []
+
+def test_slow_subscriber_is_dropped(hub):
+    slow, fast = hub.subscribe(CIRCLE_ID), hub.subscribe(CIRCLE_ID)
+
+    for comment_id in range(hub.queue_size):
+        hub.dispatch(comment_event(comment_id))
+        fast.drain()
+    hub.dispatch(comment_event(hub.queue_size))
+
+    assert slow.dropped and not fast.dropped
+    assert hub.get_stats() == { 'topics': 1, 'subscribers': 1, 'delivered': 2 * hub.queue_size + 1, 'dropped': 1 }
+    # the pending events are still sent, followed by the 'dropped' event telling the client to refetch
+    chunk = render_events(slow, slow.drain())
+    assert chunk.count('event: comment') == hub.queue_size
+    assert chunk.endswith('event: dropped\ndata: {}\n\n')
+
+def test_stream_ends_and_unsubscribes_once_dropped(hub, monkeypatch):
+    monkeypatch.setattr('backend.events.event_hub', hub)
+    subscription = hub.subscribe(CIRCLE_ID)
+    for comment_id in range(hub.queue_size + 1):
+        hub.dispatch(comment_event(comment_id))
+
+    chunks = list(stream_events(subscription))
+
+    assert chunks[0].startswith('retry:')
+    assert 'event: dropped' in chunks[-1]
+    assert hub.get_stats()['subscribers'] == 0
+
+def test_idle_stream_sends_keep_alive(hub):
+    subscription = hub.subscribe(CIRCLE_ID)
+
+    assert render_events(subscription, subscription.wait(0.01)) == ': keep-alive\n\n'
+
+def test_async_subscriber_is_woken_by_dispatch(hub):
+    async def receive():
+        subscription = hub.subscribe(CIRCLE_ID, asyncio.get_running_loop())
+        asyncio.get_running_loop().call_soon(hub.dispatch, circle_event(is_live=True))
+        return await subscription.next(5)
+
+    assert [event['type'] for event in asyncio.run(receive())] == ['circle']
+
+def test_published_payload_keeps_only_event_fields():
+    class RecordingCursor:
+        def execute(self, query, params=None):
+            self.params = params
+
+    cur = RecordingCursor()
+    publish_event(cur, CIRCLE_ID, 'comment', { 'id': 5, 'thread_id': 2, 'author_id': 3, 'body': 'x' * 10000 })
+
+    payload = json.loads(cur.params[1])
+    assert payload == { 'circle_id': CIRCLE_ID, 'type': 'comment', 'data': { 'id': 5, 'thread_id': 2, 'author_id': 3 } }
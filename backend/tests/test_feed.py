@@ -0,0 +1,100 @@
+from datetime import timedelta
+import pytest
+
+pytest.importorskip('flask')
+
+@pytest.fixture
+def follow(db):
+    def follow(user, follower):
+        db.execute("INSERT INTO follow_relationships(user_id, follower_id) VALUES (%s, %s)", (user['id'], follower['id']))
+    return follow
+
+@pytest.fixture
+def conn(app):
+    from backend import db
+    with db.pool.connection() as conn:
+        yield conn
+
+def add_circle(client, host):
+    response = client.put('/circles/add', headers=host['headers'], json={
+        'host_id': host['id'], 'title': 'test circle', 'description': 'fan-out',
+        'start_date': '2030-01-01 10:00:00', 'participants_limit': 10
+    })
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+def get_feed_users(db, circle):
+    rows = db.execute("SELECT user_id FROM home_feed WHERE circle_id = %s ORDER BY user_id", (circle['id'],)).fetchall()
+    return [row['user_id'] for row in rows]
+
+def get_pending(db, circle):
+    return db.execute("SELECT * FROM pending_fanouts WHERE circle_id = %s", (circle['id'],)).fetchone()
+
+def test_completed_fan_out_is_not_pending(client, db, make_user, follow):
+    host, follower = make_user(), make_user()
+    follow(host, follower)
+
+    circle = add_circle(client, host)
+
+    assert get_feed_users(db, circle) == [follower['id']]
+    assert get_pending(db, circle) is None
+
+def test_failed_fan_out_is_replayed(client, db, conn, make_user, follow, monkeypatch):
+    from backend.feed import replay_pending_fanouts
+    host, follower = make_user(), make_user()
+    follow(host, follower)
+
+    def failing(conn, circle):
+        raise RuntimeError('fan-out failed')
+    monkeypatch.setattr('backend.controllers.circles.fan_out_circle', failing)
+
+    circle = add_circle(client, host)
+
+    assert get_feed_users(db, circle) == []
+    assert get_pending(db, circle)['last_follower_id'] == 0
+
+    assert replay_pending_fanouts(conn, timedelta(0)) >= 1
+    assert get_feed_users(db, circle) == [follower['id']]
+    assert get_pending(db, circle) is None
+
+def test_interrupted_fan_out_resumes_from_last_follower(client, db, conn, make_user, follow, monkeypatch):
+    from backend import feed
+    host, first, second = make_user(), make_user(), make_user()
+    follow(host, first)
+    follow(host, second)
+    monkeypatch.setattr(feed, 'FANOUT_BATCH_SIZE', 1)
+
+    # the first batch is committed, then the fan-out fails
+    batches = []
+    original_execute = feed.execute
+    def execute(cur, name, params=None, **fragments):
+        if name == 'feed.fan_out_circle':
+            batches.append(params)
+            if len(batches) == 2:
+                raise RuntimeError('fan-out interrupted')
+        return original_execute(cur, name, params, **fragments)
+    monkeypatch.setattr(feed, 'execute', execute)
+
+    circle = add_circle(client, host)
+
+    assert get_feed_users(db, circle) == [first['id']]
+    assert get_pending(db, circle)['last_follower_id'] == first['id']
+
+    monkeypatch.setattr(feed, 'execute', original_execute)
+    feed.replay_pending_fanouts(conn, timedelta(0))
+
+    assert get_feed_users(db, circle) == [first['id'], second['id']]
+    assert get_pending(db, circle) is None
+
+def test_failing_replay_is_tried_once_per_pass(db, conn, make_user, make_circle, monkeypatch):
+    from backend import feed
+    circle = make_circle(make_user()['id'], start_date='2030-01-01')
+    db.execute("INSERT INTO pending_fanouts(circle_id) VALUES (%s)", (circle['id'],))
+
+    def failing(conn, circle, last_follower_id=0):
+        raise RuntimeError('fan-out failed')
+    monkeypatch.setattr(feed, 'fan_out_circle', failing)
+
+    feed.replay_pending_fanouts(conn, timedelta(0))
+
+    assert get_pending(db, circle)['attempts'] == 1
@@ -0,0 +1,102 @@
+# Runs against a migrated database whose data may be changed: TEST_DATABASE_URL=dbname=project4_test
+import os
+from datetime import timedelta
+import pytest
+
+psycopg = pytest.importorskip('psycopg')
+from psycopg.rows import dict_row
+from backend.lifecycle import apply_transitions
+
+# records the statements run through it, to tell which writes a pass issued
+class RecordingCursor(psycopg.Cursor):
+    def execute(self, query, params=None, **kwargs):
+        self.connection.statements.append(str(query))
+        return super().execute(query, params, **kwargs)
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+MAX_LIVE = timedelta(hours=6)
+GRACE = timedelta(hours=24)
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL not set')
+
+@pytest.fixture
+def host():
+    with psycopg.connect(TEST_DATABASE_URL, row_factory=dict_row) as conn:
+        user = conn.execute("""
+                            INSERT INTO users(username, email, hash, date_of_birth, bio)
+                            VALUES ('lifecycle_test', 'lifecycle_test@example.com', '', '2000-01-01', '')
+                            RETURNING id
+                            """).fetchone()
+        conn.commit()
+        try:
+            yield conn, user['id']
+        finally:
+            conn.rollback()
+            conn.execute("DELETE FROM users WHERE id = %s", (user['id'],))
+            conn.commit()
+
+def add_live_circle(conn, host_id, scheduled_ago, live_ago):
+    circle = conn.execute("""
+                          INSERT INTO circles(host_id, title, description, start_date, is_live, started_date)
+                          VALUES (%s, 'lifecycle test', '', NOW() - %s, true, NOW() - %s)
+                          RETURNING id
+                          """, (host_id, scheduled_ago, live_ago)).fetchone()
+    conn.commit()
+    return circle['id']
+
+def get_circle(conn, circle_id):
+    circle = conn.execute("SELECT is_live, is_ended FROM circles WHERE id = %s", (circle_id,)).fetchone()
+    conn.commit()
+    return circle
+
+def test_late_go_live_keeps_full_live_duration(host):
+    conn, host_id = host
+    # scheduled 10 hours ago but only went live an hour ago
+    circle_id = add_live_circle(conn, host_id, timedelta(hours=10), timedelta(hours=1))
+
+    apply_transitions(conn, 500, MAX_LIVE, GRACE)
+
+    assert get_circle(conn, circle_id) == { 'is_live': True, 'is_ended': False }
+
+def test_live_circle_ends_max_live_after_going_live(host):
+    conn, host_id = host
+    circle_id = add_live_circle(conn, host_id, timedelta(hours=10), timedelta(hours=7))
+
+    apply_transitions(conn, 500, MAX_LIVE, GRACE)
+
+    assert get_circle(conn, circle_id) == { 'is_live': False, 'is_ended': True }
+
+def test_long_description_does_not_block_transitions(host):
+    conn, host_id = host
+    circle_id = add_live_circle(conn, host_id, timedelta(hours=10), timedelta(hours=7))
+    conn.execute("UPDATE circles SET description = repeat('x', 20000) WHERE id = %s", (circle_id,))
+    conn.commit()
+
+    apply_transitions(conn, 500, MAX_LIVE, GRACE)
+
+    assert get_circle(conn, circle_id) == { 'is_live': False, 'is_ended': True }
+
+def test_pass_with_nothing_due_does_not_update_circles(host):
+    conn, host_id = host
+    # drains anything left due by other data in the test database
+    apply_transitions(conn, 500, MAX_LIVE, GRACE)
+
+    with psycopg.connect(TEST_DATABASE_URL, row_factory=dict_row, cursor_factory=RecordingCursor) as recording_conn:
+        recording_conn.statements = []
+        changed = apply_transitions(recording_conn, 500, MAX_LIVE, GRACE)
+
+    assert changed == 0
+    assert not [statement for statement in recording_conn.statements if 'UPDATE circles' in statement]
+
+def test_only_due_transitions_are_applied(host):
+    conn, host_id = host
+    apply_transitions(conn, 500, MAX_LIVE, GRACE)
+    circle_id = add_live_circle(conn, host_id, timedelta(hours=10), timedelta(hours=7))
+
+    with psycopg.connect(TEST_DATABASE_URL, row_factory=dict_row, cursor_factory=RecordingCursor) as recording_conn:
+        recording_conn.statements = []
+        changed = apply_transitions(recording_conn, 500, MAX_LIVE, GRACE)
+
+    assert changed == 1
+    assert len([statement for statement in recording_conn.statements if 'UPDATE circles' in statement]) == 1
+    assert get_circle(conn, circle_id) == { 'is_live': False, 'is_ended': True }
@@ -0,0 +1,62 @@
+import time
+import pytest
+
+pytest.importorskip('limits')
+from limits.storage import storage_from_string
+from backend.limiter_storage import MmapStorage, PROBE_LIMIT
+
+@pytest.fixture
+def uri(tmp_path):
+    return f"mmap://{tmp_path / 'ratelimit'}"
+
+def test_counter_increments_until_expiry(uri):
+    storage = MmapStorage(uri, slots=64)
+
+    assert storage.incr('client', 60) == 1
+    assert storage.incr('client', 60, amount=2) == 3
+    assert storage.get('client') == 3
+    assert storage.get_expiry('client') > time.time()
+
+def test_expired_counter_starts_over(uri):
+    storage = MmapStorage(uri, slots=64)
+    storage.incr('client', 0.05, amount=5)
+
+    time.sleep(0.1)
+
+    assert storage.get('client') == 0
+    assert storage.incr('client', 60) == 1
+
+def test_counters_are_shared_through_file(uri):
+    # a second instance opens its own descriptor, like another worker process would
+    MmapStorage(uri, slots=64).incr('client', 60)
+
+    assert MmapStorage(uri, slots=64).incr('client', 60) == 2
+
+def test_full_probe_window_evicts_slot_closest_to_expiry(uri):
+    # with as many slots as the probe window, every key competes for the same slots
+    storage = MmapStorage(uri, slots=PROBE_LIMIT)
+    storage.incr('expires-first', 30)
+    for index in range(PROBE_LIMIT - 1):
+        storage.incr(f'client-{index}', 60)
+
+    assert storage.incr('newcomer', 60) == 1
+    assert storage.get('expires-first') == 0
+    assert all(storage.get(f'client-{index}') == 1 for index in range(PROBE_LIMIT - 1))
+
+def test_clear_and_reset(uri):
+    storage = MmapStorage(uri, slots=64)
+    storage.incr('client', 60)
+    storage.incr('other', 60)
+
+    storage.clear('client')
+
+    assert storage.get('client') == 0
+    assert storage.get('other') == 1
+    assert storage.reset() == 1
+    assert storage.get('other') == 0
+
+def test_selected_by_storage_uri(uri):
+    storage = storage_from_string(uri)
+
+    assert isinstance(storage, MmapStorage)
+    assert storage.check()
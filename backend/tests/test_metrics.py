@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip('flask')
+
+def test_metrics_need_authentication(client):
+    assert client.get('/metrics').status_code == 401
+
+def test_metrics_are_not_served_to_users(client, make_user):
+    assert client.get('/metrics', headers=make_user()['headers']).status_code == 403
+
+def test_metrics_are_served_to_admins(client, make_user):
+    response = client.get('/metrics', headers=make_user(role='admin')['headers'])
+
+    assert response.status_code == 200
+    assert 'project4_request_duration_seconds' in response.get_data(as_text=True)
+
+def test_metrics_are_served_to_scraper_token(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'scrape-token')
+
+    assert client.get('/metrics', headers={ 'Authorization': 'Bearer scrape-token' }).status_code == 200
+    # any other bearer token is verified as an access token, and rejected
+    assert client.get('/metrics', headers={ 'Authorization': 'Bearer other-token' }).status_code == 422
+
+def test_token_verification_is_timed(client, make_user):
+    from backend.instrumentation import request_metrics
+    user = make_user()
+    before = request_metrics.phases.get(('circles.get_tags_by_circle', 'jwt'), 0.0)
+
+    response = client.post('/circles/tags', json={ 'circle_id': 0 }, headers=user['headers'])
+
+    assert response.status_code == 200
+    assert 'jwt;dur=' in response.headers['Server-Timing']
+    assert request_metrics.phases[('circles.get_tags_by_circle', 'jwt')] > before
@@ -0,0 +1,97 @@
+import pytest
+
+pytest.importorskip('flask')
+from backend.moderation import reconcile_flag_counts
+
+@pytest.fixture
+def threshold(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'FLAG_HIDE_THRESHOLD', 2)
+    return 2
+
+def flag(client, user, circle):
+    assert client.put('/circles/flags', json={ 'circle_id': circle['id'] }, headers=user['headers']).status_code == 200
+
+def unflag(client, user, circle):
+    assert client.delete('/circles/flag', json={ 'circle_id': circle['id'] }, headers=user['headers']).status_code == 200
+
+def get_state(db, circle):
+    return db.execute("""
+                      SELECT circles.is_hidden, flag_counts.flag_count FROM circles
+                      LEFT JOIN flag_counts ON flag_counts.circle_id = circles.id
+                      WHERE circles.id = %s
+                      """, (circle['id'],)).fetchone()
+
+def is_listed(client, user, circle):
+    circles = client.get('/circles/all', headers=user['headers']).get_json()['data']
+    return circle['id'] in [listed['id'] for listed in circles]
+
+def test_circle_is_hidden_once_threshold_is_reached(client, db, make_user, make_circle, threshold):
+    viewer = make_user()
+    circle = make_circle(make_user()['id'], start_date='2030-01-01')
+
+    flag(client, make_user(), circle)
+    assert get_state(db, circle) == { 'is_hidden': False, 'flag_count': 1 }
+    assert is_listed(client, viewer, circle)
+
+    flag(client, make_user(), circle)
+    assert get_state(db, circle) == { 'is_hidden': True, 'flag_count': 2 }
+    assert not is_listed(client, viewer, circle)
+
+def test_circle_is_shown_again_below_threshold(client, db, make_user, make_circle, threshold):
+    circle = make_circle(make_user()['id'], start_date='2030-01-01')
+    flaggers = [make_user() for _ in range(threshold)]
+    for user in flaggers:
+        flag(client, user, circle)
+
+    unflag(client, flaggers[0], circle)
+
+    assert get_state(db, circle) == { 'is_hidden': False, 'flag_count': threshold - 1 }
+
+def test_zero_threshold_never_hides(client, db, app, make_user, make_circle, monkeypatch):
+    monkeypatch.setitem(app.config, 'FLAG_HIDE_THRESHOLD', 0)
+    circle = make_circle(make_user()['id'], start_date='2030-01-01')
+
+    flag(client, make_user(), circle)
+
+    assert get_state(db, circle)['is_hidden'] is False
+
+def test_admin_marking_safe_clears_flags_and_shows_circle(client, db, make_user, make_circle, threshold):
+    circle = make_circle(make_user()['id'], start_date='2030-01-01')
+    for _ in range(threshold):
+        flag(client, make_user(), circle)
+
+    response = client.delete('/circles/flags', json={ 'circle_id': circle['id'] }, headers=make_user(role='admin')['headers'])
+
+    assert response.status_code == 200
+    assert get_state(db, circle) == { 'is_hidden': False, 'flag_count': None }
+
+def test_moderation_queue_is_admin_only(client, make_user):
+    assert client.get('/circles/flags', headers=make_user()['headers']).status_code == 403
+
+def test_moderation_queue_pages_most_flagged_first(client, make_user, make_circle):
+    admin = make_user(role='admin')
+    host = make_user()
+    circles = [make_circle(host['id'], start_date='2030-01-01') for _ in range(2)]
+    # above any flag count of other data, so these two lead the queue
+    flaggers = [make_user() for _ in range(40)]
+    for user in flaggers:
+        flag(client, user, circles[1])
+    for user in flaggers[:39]:
+        flag(client, user, circles[0])
+
+    first = client.get('/circles/flags?limit=1', headers=admin['headers']).get_json()
+    second = client.get(f"/circles/flags?limit=1&cursor={first['next_cursor']}", headers=admin['headers']).get_json()
+
+    assert [circle['id'] for circle in first['data'] + second['data']] == [circles[1]['id'], circles[0]['id']]
+    assert [circle['flag_count'] for circle in first['data'] + second['data']] == [40, 39]
+
+def test_reconcile_repairs_counts_and_visibility(client, db, make_user, make_circle):
+    circle = make_circle(make_user()['id'], start_date='2030-01-01')
+    flag(client, make_user(), circle)
+    # drift the summary away from the flags
+    db.execute("UPDATE flag_counts SET flag_count = 9 WHERE circle_id = %s", (circle['id'],))
+    db.execute("UPDATE circles SET is_hidden = true WHERE id = %s", (circle['id'],))
+
+    reconcile_flag_counts(db, 5)
+
+    assert get_state(db, circle) == { 'is_hidden': False, 'flag_count': 1 }
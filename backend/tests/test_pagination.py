@@ -0,0 +1,62 @@
+import json
+from datetime import datetime
+import pytest
+
+pytest.importorskip('flask')
+from backend.pagination import encode_cursor, decode_cursor
+
+def test_cursor_round_trips_keyset():
+    start_date = datetime(2030, 1, 1, 10, 30)
+
+    assert decode_cursor(encode_cursor({ 'start_date': start_date, 'id': 7 })) == (start_date, 7)
+
+@pytest.fixture
+def host_circles(make_user, make_circle):
+    host = make_user()
+    # two circles share a start date, so the page boundary falls between them on id
+    circles = [make_circle(host['id'], start_date=start_date)
+               for start_date in ('2030-01-02', '2030-01-01', '2030-01-01', '2030-01-03')]
+    ordered = sorted(circles, key=lambda circle: (circle['start_date'], circle['id']))
+    return host, [circle['id'] for circle in ordered]
+
+def get_circles_by_user(client, host, query=''):
+    return client.post(f'/circles/user{query}', json={ 'host_id': host['id'] }, headers=host['headers'])
+
+def test_list_without_page_args_keeps_full_shape(client, host_circles):
+    host, circle_ids = host_circles
+
+    body = get_circles_by_user(client, host).get_json()
+
+    assert [circle['id'] for circle in body['data']] == circle_ids
+    assert 'next_cursor' not in body
+
+def test_cursor_pages_through_list_in_keyset_order(client, host_circles):
+    host, circle_ids = host_circles
+    seen = []
+
+    body = get_circles_by_user(client, host, '?limit=2').get_json()
+    while True:
+        seen.extend(circle['id'] for circle in body['data'])
+        if body['next_cursor'] is None:
+            break
+        body = get_circles_by_user(client, host, f"?limit=2&cursor={body['next_cursor']}").get_json()
+
+    assert seen == circle_ids
+
+def test_last_full_page_has_no_cursor(client, host_circles):
+    host, circle_ids = host_circles
+
+    body = get_circles_by_user(client, host, f'?limit={len(circle_ids)}').get_json()
+
+    assert len(body['data']) == len(circle_ids)
+    assert body['next_cursor'] is None
+
+def test_ndjson_streams_rows_after_cursor(client, host_circles):
+    host, circle_ids = host_circles
+    cursor = get_circles_by_user(client, host, '?limit=1').get_json()['next_cursor']
+
+    response = get_circles_by_user(client, host, f'?format=ndjson&cursor={cursor}')
+
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == circle_ids[1:]
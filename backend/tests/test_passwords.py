@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip('flask')
+from backend.passwords import PasswordHasher, PasswordHasherBusy, password_hasher, hash_password
+
+PASSWORD = 'correct horse battery staple'
+
+@pytest.fixture
+def outdated_user(app, make_user):
+    # the tests configure BCRYPT_LOG_ROUNDS=4, so a cost of 5 needs a rehash
+    return make_user(hash=hash_password(PASSWORD, 5))
+
+def login(client, user):
+    return client.post('/auth/login', json={ 'username': user['username'], 'password': PASSWORD })
+
+def get_hash(db, user):
+    return db.execute("SELECT hash FROM users WHERE id = %s", (user['id'],)).fetchone()['hash']
+
+def test_login_upgrades_outdated_hash(client, db, outdated_user):
+    response = login(client, outdated_user)
+
+    assert response.status_code == 200
+    assert get_hash(db, outdated_user).startswith('$2b$04$')
+
+def test_login_succeeds_when_rehash_finds_hasher_busy(client, db, outdated_user, monkeypatch):
+    def busy(password):
+        raise PasswordHasherBusy()
+    monkeypatch.setattr(password_hasher, 'generate_password_hash', busy)
+
+    response = login(client, outdated_user)
+
+    assert response.status_code == 200
+    assert 'access_token' in response.get_json()['data']
+    assert get_hash(db, outdated_user).startswith('$2b$05$')
+
+def test_login_is_503_when_check_finds_hasher_busy(client, outdated_user, monkeypatch):
+    def busy(password_hash, password):
+        raise PasswordHasherBusy()
+    monkeypatch.setattr(password_hasher, 'check_password_hash', busy)
+
+    assert login(client, outdated_user).status_code == 503
+
+def test_hasher_is_busy_once_workers_and_queue_are_taken():
+    hasher = PasswordHasher()
+    hasher.configure(4, 1, 1, 0.1)
+
+    # the worker and queue slots are both taken, so the next caller times out
+    assert hasher._slots.acquire(timeout=0) and hasher._slots.acquire(timeout=0)
+    with pytest.raises(PasswordHasherBusy):
+        hasher.generate_password_hash(PASSWORD)
+
+    hasher._slots.release()
+    assert hasher.check_password_hash(hash_password(PASSWORD, 4), PASSWORD)
+
+def test_hasher_workers_start_from_forkserver():
+    hasher = PasswordHasher()
+    hasher.configure(4, 1, 0, 5)
+
+    assert hasher._executor._mp_context.get_start_method() == 'forkserver'
+    assert hasher.check_password_hash(hasher.generate_password_hash(PASSWORD), PASSWORD)
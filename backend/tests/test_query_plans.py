@@ -0,0 +1,176 @@
+# EXPLAINs the registered controller statements of backend/queries.py, with every optional fragment
+# spliced in, on a generated dataset (backend.benchmarks.generate_data, which truncates the existing
+# data) with the planner's normal settings, and fails if any of them reads a hot table with a
+# sequential scan, or if a registered statement has no sample params to check it with.
+import os
+from argparse import Namespace
+from datetime import datetime
+import pytest
+
+psycopg = pytest.importorskip('psycopg')
+pytest.importorskip('flask')
+from backend.benchmarks.generate_data import generate
+from backend.pagination import DEFAULT_KEY_COLUMNS, FEED_KEY_COLUMNS, format_page_query
+from backend.queries import QUERIES, INCLUDE_COLUMNS, SEARCH_CONDITIONS, FLAG_QUEUE_KEYSET, TREE_ANCHORS
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL not set')
+
+# big enough that the planner prefers an index for selective lookups over scanning the table
+# and flat enough that the home feed (circles of a host times their followers) stays small
+DATASET = Namespace(users=5000, avg_follows=20, circles_per_user=2, avg_registrations=10, threads_per_circle=1,
+                    comments_per_thread=20, flagged_circles=0.5, alpha=0.5, bcrypt_rounds=4, seed=42)
+
+HOT_TABLES = {
+    'users', 'follow_relationships', 'circles', 'circles_registrations', 'circle_tags',
+    'flags', 'flag_counts', 'threads', 'comments', 'home_feed', 'circle_search',
+}
+
+NOW = datetime(2024, 1, 1)
+# ids of the generated dataset with typical popularity (low ids are the most followed and registered)
+USER_ID = 2500
+OTHER_USER_ID = 2501
+CIRCLE_ID = 5000
+THREAD_ID = 5000
+COMMENT_ID = 100000
+PAGE_LIMIT = 51
+
+# Sample params of each registered statement that is checked. Inserts without lookups are not.
+SAMPLE_PARAMS = {
+    'auth.find_user': ('user', 'user@example.com'),
+    'auth.rehash_password': ('hash', USER_ID),
+    'auth.get_user_details': (USER_ID,),
+    'follow_rs.delete_follow': (USER_ID, OTHER_USER_ID),
+    'follow_rs.get_followers': (USER_ID,),
+    'follow_rs.get_following': (USER_ID,),
+    'follow_rs.get_profile_summary': (USER_ID,),
+    'circles.explore_popular': (5,),
+    'circles.explore_live': (50,),
+    'circles.explore_upcoming': (50,),
+    'circles.increment_registration_count': (CIRCLE_ID,),
+    'circles.deregister': (CIRCLE_ID, USER_ID),
+    'circles.decrement_registration_count': (CIRCLE_ID,),
+    'circles.get_circle_host': (CIRCLE_ID,),
+    'circles.bulk_register_users': (CIRCLE_ID, [USER_ID, OTHER_USER_ID], CIRCLE_ID),
+    'circles.get_registered_users': (CIRCLE_ID,),
+    'circles.get_tags_by_circle': (CIRCLE_ID,),
+    'circles.add_tags': (['MUSIC'], CIRCLE_ID, USER_ID),
+    'circles.delete_tags': (CIRCLE_ID, ['MUSIC'], USER_ID),
+    'circles.get_flags_by_circle': (CIRCLE_ID,),
+    'circles.add_flag': { 'circle_id': CIRCLE_ID, 'user_id': USER_ID, 'threshold': 5 },
+    'circles.delete_flag_by_user': { 'circle_id': CIRCLE_ID, 'user_id': USER_ID, 'threshold': 5 },
+    'circles.clear_flags': { 'circle_id': CIRCLE_ID },
+    'threads.get_threads_by_circle': (CIRCLE_ID,),
+    'comments.get_comments_by_thread': (THREAD_ID,),
+    'feed.fan_out_circle': (USER_ID, 0, 1000, CIRCLE_ID, USER_ID, NOW),
+    'feed.backfill_follow': (OTHER_USER_ID, USER_ID),
+    'feed.prune_follow': (OTHER_USER_ID, USER_ID),
+    'feed.update_circle_start_date': (NOW, CIRCLE_ID, NOW),
+    'feed.advance_pending_fanout': (USER_ID, CIRCLE_ID),
+    'feed.delete_pending_fanout': (CIRCLE_ID,),
+    'user_stats.adjust_user_stats': (USER_ID, 1, 0, 0),
+    'conditional.get_table_versions': (['circles', 'users'],),
+    'tag_catalogue.get_version': (),
+    'tag_catalogue.get_tags': (),
+}
+
+# Tables checked with the ownership statements: (owner column, edited column)
+OWNED_TABLES = {
+    'circles': ('host_id', 'title'),
+    'threads': ('author_id', 'title'),
+    'comments': ('author_id', 'comment'),
+}
+
+# Keyset paginated statements, with their own params and key columns
+PAGINATED_PARAMS = {
+    'circles.get_all_circles': ((), DEFAULT_KEY_COLUMNS),
+    'circles.get_following_circles': ((USER_ID,), FEED_KEY_COLUMNS),
+    'circles.get_circles_by_user': ((USER_ID,), DEFAULT_KEY_COLUMNS),
+    'circles.get_registered_circles': ((USER_ID,), DEFAULT_KEY_COLUMNS),
+    'circles.get_circles_by_any_tag': ((['MUSIC'],), DEFAULT_KEY_COLUMNS),
+    'circles.get_circles_by_all_tags': ((['MUSIC', 'COMEDY'], 2), DEFAULT_KEY_COLUMNS),
+}
+
+# Not checked: plain inserts and statements without tables
+UNCHECKED = {
+    'auth.register_admin', 'auth.register', 'follow_rs.add_follow', 'circles.add_circle', 'circles.register',
+    'threads.add_thread', 'comments.add_comment', 'events.publish_event', 'feed.add_pending_fanout',
+}
+
+# every ?include= column, the viewer's ones taking the viewer's id
+def include_all_columns(query, params):
+    columns = ''.join(column for column, _ in INCLUDE_COLUMNS.values())
+    viewer_params = [USER_ID for _, needs_viewer in INCLUDE_COLUMNS.values() if needs_viewer]
+    return query.replace('{columns}', columns), (*viewer_params, *params)
+
+def get_controller_queries():
+    controller_queries = { name: (QUERIES[name], params) for name, params in SAMPLE_PARAMS.items() }
+
+    for name, (params, key_columns) in PAGINATED_PARAMS.items():
+        query, params = include_all_columns(QUERIES[name], params)
+        controller_queries[name] = (format_page_query(query, key_columns, True) + ' LIMIT %s',
+                                    (*params, NOW, CIRCLE_ID, PAGE_LIMIT))
+
+    query, params = include_all_columns(QUERIES['circles.get_circle_by_id'], (CIRCLE_ID,))
+    controller_queries['circles.get_circle_by_id'] = (query, params)
+
+    controller_queries['circles.search_circles'] = (
+        QUERIES['circles.search_circles'].format(conditions=' '.join(SEARCH_CONDITIONS.values())),
+        { 'q': 'music', 'tags': ['MUSIC'], 'from': NOW, 'to': NOW, 'rank': 0.5, 'id': CIRCLE_ID, 'limit': PAGE_LIMIT })
+
+    controller_queries['circles.get_flagged_circles'] = (
+        QUERIES['circles.get_flagged_circles'].format(keyset=FLAG_QUEUE_KEYSET),
+        { 'flag_count': 1, 'last_flagged_date': NOW, 'id': CIRCLE_ID, 'limit': PAGE_LIMIT })
+
+    ownership_params = { 'row_id': CIRCLE_ID, 'user_id': USER_ID, 'is_admin': False, 'value': 'edited' }
+    for table, (owner_column, column) in OWNED_TABLES.items():
+        set_clause = f'{column} = COALESCE(%(value)s, {column})'
+        controller_queries[f'ownership.update_owned_row.{table}'] = (
+            QUERIES['ownership.update_owned_row'].format(table=table, owner_column=owner_column, set_clause=set_clause),
+            ownership_params)
+        controller_queries[f'ownership.delete_owned_row.{table}'] = (
+            QUERIES['ownership.delete_owned_row'].format(table=table, owner_column=owner_column), ownership_params)
+
+    tree_params = (21, 21, 3, 20)
+    for anchor, anchor_params in [('comment', (COMMENT_ID,)), ('parent', (COMMENT_ID,)), ('thread', (THREAD_ID,))]:
+        controller_queries[f'comments.get_comment_tree.{anchor}'] = (
+            QUERIES['comments.get_comment_tree'].format(anchor=TREE_ANCHORS[anchor]), (*anchor_params, *tree_params))
+    controller_queries['comments.get_comment_tree.thread_cursor'] = (
+        QUERIES['comments.get_comment_tree'].format(anchor=TREE_ANCHORS['thread'] + TREE_ANCHORS['cursor']),
+        (THREAD_ID, NOW, COMMENT_ID, *tree_params))
+
+    return controller_queries
+
+# registered statements without sample params, which fail the check until they are added
+def get_unchecked_statements(controller_queries):
+    checked = { '.'.join(name.split('.')[:2]) for name in controller_queries }
+    return sorted(set(QUERIES) - checked - UNCHECKED)
+
+def find_seq_scans(plan):
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in HOT_TABLES:
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found.extend(find_seq_scans(child))
+    return found
+
+CONTROLLER_QUERIES = get_controller_queries()
+
+@pytest.fixture(scope='module')
+def dataset():
+    with psycopg.connect(TEST_DATABASE_URL) as conn:
+        generate(conn, DATASET)
+        yield conn
+
+def test_every_registered_statement_is_checked():
+    assert get_unchecked_statements(CONTROLLER_QUERIES) == []
+
+@pytest.mark.parametrize('name', CONTROLLER_QUERIES)
+def test_query_plan_has_no_sequential_scan(dataset, name):
+    sql, params = CONTROLLER_QUERIES[name]
+
+    plan = dataset.execute("EXPLAIN (FORMAT JSON) " + sql, params).fetchone()[0][0]['Plan']
+    dataset.rollback()
+
+    assert find_seq_scans(plan) == []
@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip('psycopg_pool')
+from backend.queries import QUERIES, TREE_ANCHORS
+from backend.slow_queries import SlowQueryLog, is_read_only, normalize_sql
+
+COMMENT_TREE = QUERIES['comments.get_comment_tree'].format(anchor=TREE_ANCHORS['thread'])
+
+@pytest.mark.parametrize('name', ['circles.get_registered_users', 'comments.get_comment_tree'])
+def test_reads_are_read_only(name):
+    assert is_read_only(normalize_sql(QUERIES[name]))
+
+@pytest.mark.parametrize('name', ['circles.bulk_register_users', 'feed.fan_out_circle', 'auth.rehash_password',
+                                  'circles.add_circle'])
+def test_writes_are_not_read_only(name):
+    assert not is_read_only(normalize_sql(QUERIES[name]))
+
+def test_column_names_containing_write_keywords_are_read_only():
+    assert is_read_only('WITH recent AS (SELECT updated_date FROM comments) SELECT * FROM recent')
+
+def test_slow_comment_tree_is_explained(app):
+    from backend import db
+
+    log = SlowQueryLog()
+    log.configure(0, 1, 10, db.pool)
+    params = (1, 21, 21, 3, 20)
+
+    with db.pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(COMMENT_TREE, params)
+            log.observe(cur, COMMENT_TREE, params, 1, 'comments.get_comment_tree')
+    log._executor.shutdown(wait=True)
+
+    plan = log.get_entries()[0]['plan']
+    assert plan[0]['Plan']['Node Type']
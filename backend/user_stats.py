@@ -0,0 +1,47 @@
+# user_stats holds the profile counters (circles hosted, followers, following). Controllers adjust them
+# in the same transaction as the change they count; reconcile_user_stats() repairs any drift in bulk.
+# Run the reconciliation job with: python -m backend.user_stats
+import os
+import psycopg
+from dotenv import load_dotenv
+from .queries import execute
+
+def adjust_user_stats(cur, user_id, circles_hosted=0, followers=0, following=0):
+    execute(cur, 'user_stats.adjust_user_stats', (user_id, circles_hosted, followers, following))
+
+def reconcile_user_stats(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+                    WITH hosted AS (
+                        SELECT host_id AS user_id, COUNT(*) AS circles_hosted FROM circles
+                        GROUP BY host_id
+                    ), followers AS (
+                        SELECT user_id, COUNT(*) AS followers FROM follow_relationships
+                        GROUP BY user_id
+                    ), following AS (
+                        SELECT follower_id AS user_id, COUNT(*) AS following FROM follow_relationships
+                        GROUP BY follower_id
+                    )
+                    INSERT INTO user_stats(user_id, circles_hosted, followers, following)
+                    SELECT users.id, COALESCE(hosted.circles_hosted, 0), COALESCE(followers.followers, 0),
+                           COALESCE(following.following, 0)
+                    FROM users
+                    LEFT JOIN hosted ON hosted.user_id = users.id
+                    LEFT JOIN followers ON followers.user_id = users.id
+                    LEFT JOIN following ON following.user_id = users.id
+                    ON CONFLICT (user_id) DO UPDATE
+                    SET circles_hosted = EXCLUDED.circles_hosted,
+                        followers = EXCLUDED.followers,
+                        following = EXCLUDED.following
+                    WHERE (user_stats.circles_hosted, user_stats.followers, user_stats.following)
+                          IS DISTINCT FROM (EXCLUDED.circles_hosted, EXCLUDED.followers, EXCLUDED.following)
+                    """)
+        repaired = cur.rowcount
+    conn.commit()
+    return repaired
+
+if __name__ == '__main__':
+    load_dotenv()
+    with psycopg.connect(os.getenv('DATABASE_URL') or 'dbname=project4 user=db_user') as conn:
+        repaired = reconcile_user_stats(conn)
+    print(f'repaired user_stats for {repaired} users')
@@ -2,6 +2,7 @@ from flask import Flask, jsonify, request
 from functools import wraps
 from wtforms import Form, StringField, DateField, TextAreaField, PasswordField, validators
 import wtforms_json
+from ..instrumentation import timed_phase
 
 wtforms_json.init()
 
@@ -23,7 +24,8 @@ def validate_registration(request):
 def registration_middleware(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        validation_result = validate_registration(request)
+        with timed_phase('validation'):
+            validation_result = validate_registration(request)
         if validation_result is not None:
             return validation_result
         return f(*args, **kwargs)
@@ -2,6 +2,7 @@ from flask import Flask, jsonify, request
 from functools import wraps
 from wtforms import Form, StringField, DateTimeField, IntegerField, TextAreaField, validators
 import wtforms_json
+from ..instrumentation import timed_phase
 
 wtforms_json.init()
 
@@ -11,6 +12,7 @@ def validate_add_circle(request):
         description = TextAreaField('description', [validators.InputRequired(message=('field required'))])
         participants_limit = IntegerField('participants_limit', [validators.NumberRange(min=0, max=250, message=('invalid participants limit'))])
         start_date = DateTimeField('start_date', [validators.InputRequired(message=('input required'))])
+        end_date = DateTimeField('end_date', [validators.Optional()])
     
     form = AddCircleForm.from_json(request.json)
 
@@ -22,7 +24,8 @@ def validate_add_circle(request):
 def add_circle_middleware(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        validation_result = validate_add_circle(request)
+        with timed_phase('validation'):
+            validation_result = validate_add_circle(request)
         if validation_result is not None:
             return validation_result
         return f(*args, **kwargs)
@@ -32,6 +35,7 @@ def validate_update_circle(request):
     class UpdateCircleForm(Form):
         title = StringField('title', [validators.Length(max=100, message=('exceeds character limit for title'))])
         participants_limit = IntegerField('participants_limit', [validators.Optional(), validators.NumberRange(min=0, max=250, message=('invalid participants limit'))])
+        end_date = DateTimeField('end_date', [validators.Optional()])
     
     form = UpdateCircleForm.from_json(request.json)
 
@@ -43,7 +47,8 @@ def validate_update_circle(request):
 def update_circle_middleware(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        validation_result = validate_update_circle(request)
+        with timed_phase('validation'):
+            validation_result = validate_update_circle(request)
         if validation_result is not None:
             return validation_result
         return f(*args, **kwargs)
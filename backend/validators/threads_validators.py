@@ -2,6 +2,7 @@ from flask import Flask, jsonify, request
 from functools import wraps
 from wtforms import Form, StringField, validators
 import wtforms_json
+from ..instrumentation import timed_phase
 
 wtforms_json.init()
 
@@ -19,7 +20,8 @@ def validate_thread(request):
 def validate_thread_middleware(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        validation_result = validate_thread(request)
+        with timed_phase('validation'):
+            validation_result = validate_thread(request)
         if validation_result is not None:
             return validation_result
         return f(*args, **kwargs)